@@ -1,25 +1,40 @@
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass
 from functools import lru_cache
 import re
 from collections import defaultdict
 from itertools import chain, groupby, zip_longest
+import subprocess
+import threading
+import time
 import unicodedata
 
 import sublime
-from sublime_plugin import EventListener
+from sublime_plugin import EventListener, TextCommand
 
 from .navigate import GsNavigate
 from ..fns import filter_
-from ..git_mixins.history import CommitInfo, LogEntry, is_dynamic_ref
-from ..runtime import enqueue_on_ui, enqueue_on_worker, on_worker, run_as_text_command, throttled
+from ..git_command import DECODE_ERROR_MESSAGE, GitCommand, GitSavvyError
+from ..git_mixins.history import CommitInfo, LogEntry
+from ..runtime import (
+    enqueue_on_ui,
+    enqueue_on_worker,
+    on_worker,
+    run_as_text_command,
+    run_new_daemon_thread,
+    run_on_new_thread,
+    run_when_worker_is_idle,
+    throttled
+)
+from ..ui__busy_spinner import busy_indicator
 from ..ui_mixins.quick_panel import PanelCommandMixin, show_log_panel
 from ..types import FullHash, FullPath, LineNo, Row, ShortHash
 from ..view import scroll_to_pt, y_offset, Position
 from ...common import util
 from GitSavvy.core.base_commands import GsTextCommand
-from GitSavvy.core.caches import cached
-from GitSavvy.core.utils import flash, focus_view
+from GitSavvy.core.caches import Cache
+from GitSavvy.core.utils import flash, focus_view, try_kill_proc
 from GitSavvy.core.view import replace_view_content
 
 
@@ -27,6 +42,7 @@ __all__ = (
     "gs_blame",
     "gs_blame_open_log",
     "gs_blame_refresh",
+    "gs_blame_prefetch",
     "gs_blame_action",
     "gs_blame_open_commit",
     "gs_blame_open_previous_commit",
@@ -47,16 +63,17 @@ __all__ = (
 )
 
 
-from typing import DefaultDict, Dict, Literal, Iterator, NamedTuple
+from typing import Callable, DefaultDict, Dict, Iterable, Literal, Iterator, NamedTuple
 from typing_extensions import TypeAlias
 
 
 """
 Blame data flows through three shapes:
 
-Parse `git blame --porcelain` into a list of `BlamedLine` records,
-one for each line (1..EOF) in the source file we blame, plus a
-commit metadata table (`_CommitsByHash`).
+Parse `git blame --porcelain` into a compact `ParsedBlame`: the contents
+of each line (1..EOF) in the source file we blame, a parallel array
+pointing into the commit metadata table, and that table itself.  For
+rendering we expand it into `BlamedLine` records.
 
 Render those parsed records into verbose blame text.  The rendered view
 can have more rows than the source file because commit metadata appears on
@@ -80,6 +97,24 @@ class BlamedLine(NamedTuple):
 
 _CommitInfo: TypeAlias = DefaultDict[str, str]
 _CommitsByHash: TypeAlias = DefaultDict[FullHash, _CommitInfo]
+
+
+class ParsedBlame(NamedTuple):
+    contents: list[str]
+    #: For each line the index of its commit in `commits`
+    line_commits: array[int]
+    commits: list[_CommitInfo]
+
+    def blamed_lines(self) -> list[BlamedLine]:
+        short_hashes = [commit["short_hash"] for commit in self.commits]
+        return [
+            BlamedLine(contents, short_hashes[index], lineno)  # type: ignore[arg-type]
+            for lineno, (contents, index) in enumerate(
+                zip(self.contents, self.line_commits), start=1
+            )
+        ]
+
+
 _RenderedCommitInfo: TypeAlias = "list[str]"
 _CompactBlameFormat: TypeAlias = 'Literal["hash", "message", "date", "author"]'
 _BlameFormat: TypeAlias = 'Literal["hash", "message", "date", "author", "verbose"]'
@@ -129,6 +164,224 @@ class RenderResult(NamedTuple):
 class GsBlameController(EventListener):
     def on_close(self, view: sublime.View) -> None:
         _navigation_info_by_view_id.pop(view.id(), None)
+        _last_cursor_commit_by_view_id.pop(view.id(), None)
+        cancel_progressive_blame(view)
+
+    def on_selection_modified_async(self, view: sublime.View) -> None:
+        if not view.settings().get("git_savvy.blame_view"):
+            return
+        cursor_commit = commit_under_cursor(view)
+        if _last_cursor_commit_by_view_id.get(view.id()) != cursor_commit:
+            _last_cursor_commit_by_view_id[view.id()] = cursor_commit
+            view.run_command("gs_blame_prefetch")
+
+
+class RunningBlame:
+    def __init__(self) -> None:
+        self.cancelled = False
+        self.proc: subprocess.Popen | None = None
+
+    def remember_proc(self, proc: subprocess.Popen) -> None:
+        self.proc = proc
+        if self.cancelled:
+            try_kill_proc(proc)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        try_kill_proc(self.proc)
+
+
+def cancel_progressive_blame(view: sublime.View) -> None:
+    running_blame = _running_blames.pop(view.id(), None)
+    if running_blame:
+        running_blame.cancel()
+    # Every foreground blame also stops a speculative one.
+    cancel_prefetch()
+
+
+BlameCacheKey: TypeAlias = "tuple[FullHash, str, str, bool, str | None]"
+blame_cache: Cache = Cache(maxsize=64)
+blobs_at_commit: Cache = Cache(maxsize=512)
+# Speculative results live in their own, small cache so that they never
+# evict blames the user actually looked at.
+prefetched_blames: Cache = Cache(maxsize=4)
+_prefetch_lock = threading.Lock()
+
+
+def blame_cache_key(
+    git: GitCommand,
+    blamed_path: FullPath,
+    commit_hash: ShortHash | None,
+    ignore_whitespace: bool,
+    detect_options: str | None
+) -> BlameCacheKey | None:
+    """Identify a blame by its starting commit and the blob we blame.
+
+    For the working tree, that is HEAD and the blob of the file on disk.
+    If the file is unchanged, the working tree blame is then the same as
+    the blame of HEAD, and both share one cache entry.
+    """
+    short_path = git.to_short_path(blamed_path).replace("\\", "/")
+    try:
+        if commit_hash:
+            memo_key = (git.repo_path, commit_hash, short_path)
+            try:
+                commit, blob = blobs_at_commit[memo_key]
+            except KeyError:
+                commit, blob = blobs_at_commit[memo_key] = git.git_throwing_silently(
+                    "rev-parse", f"{commit_hash}^{{commit}}", f"{commit_hash}:{short_path}"
+                ).split()
+        else:
+            commit = git.git_throwing_silently("rev-parse", "HEAD").strip()
+            blob = git.git_throwing_silently("hash-object", "--", blamed_path).strip()
+    except (GitSavvyError, ValueError):
+        return None
+    return (FullHash(commit), blob, short_path, ignore_whitespace, detect_options)
+
+
+def cached_blame(key: BlameCacheKey | None) -> ParsedBlame | None:
+    if key is None:
+        return None
+    try:
+        return blame_cache[key]
+    except KeyError:
+        pass
+    try:
+        result = prefetched_blames.pop(key)
+    except KeyError:
+        return None
+    blame_cache[key] = result
+    return result
+
+
+DETECT_MOVE_OR_COPY_OPTIONS = {
+    "file": "-M",
+    "commit": "-C",
+    "all_commits": "-CCC"
+}
+
+
+def blame_options(git: GitCommand, view: sublime.View) -> tuple[bool, str | None]:
+    settings = view.settings()
+    within_what = settings.get("git_savvy.blame_view.detect_move_or_copy_within")
+    if not within_what:
+        within_what = git.savvy_settings.get("blame_detect_move_or_copy_within")
+    return (
+        settings.get("git_savvy.ignore_whitespace", False),
+        DETECT_MOVE_OR_COPY_OPTIONS[within_what]
+    )
+
+
+def blame_args(
+    blamed_path: FullPath,
+    commit_hash: ShortHash | None,
+    ignore_whitespace: bool,
+    detect_options: str | None
+) -> tuple[str | None, ...]:
+    return (
+        "blame", "-p", '-w' if ignore_whitespace else None, detect_options,
+        commit_hash, "--", blamed_path,
+    )
+
+
+def schedule_prefetch(git: GitCommand, view: sublime.View) -> None:
+    run_when_worker_is_idle(throttled(prefetch_neighbor_blames, git, view))
+
+
+def prefetch_neighbor_blames(git: GitCommand, view: sublime.View) -> None:
+    """Blame the revisions the user will most likely step to next.
+
+    These are the revision before the current one, and the one before
+    the commit under the cursor.  We only start when the worker is
+    idle, and keep the results in a small, separate cache.  Starting a
+    foreground blame kills a running prefetch.
+    """
+    if (
+        not view.is_valid()
+        or _running_blames
+        or len(navigation_info_for_view(view).by_row) > PREFETCH_MAX_LINES
+    ):
+        return
+    settings = view.settings()
+    file_path: FullPath = settings.get("git_savvy.file_path")
+    # Mirror `open_blame_neighbor` and `gs_blame_open_commit_before_cursor_commit`.
+    commit_hash = settings.get("git_savvy.commit_hash")
+    cursor_commit = commit_under_cursor(view)
+    base_commits = [commit_hash]
+    if cursor_commit and cursor_commit != commit_hash:
+        base_commits.append(cursor_commit)
+    ignore_whitespace, detect_options = blame_options(git, view)
+
+    def prefetch() -> None:
+        global _running_prefetch
+        if not _prefetch_lock.acquire(blocking=False):
+            return
+        running_prefetch = _running_prefetch = RunningBlame()
+
+        def still_relevant() -> bool:
+            return (
+                not running_prefetch.cancelled
+                and view.is_valid()
+                and not _running_blames
+                and settings.get("git_savvy.commit_hash") == commit_hash
+            )
+
+        try:
+            for base_commit in base_commits:
+                if not still_relevant():
+                    return
+                previous_commit = git.previous_commit(base_commit, file_path, follow=True)
+                if previous_commit and still_relevant():
+                    prefetch_blame(
+                        git, running_prefetch,
+                        file_path, previous_commit, ignore_whitespace, detect_options
+                    )
+        except GitSavvyError:
+            pass
+        finally:
+            if _running_prefetch is running_prefetch:
+                _running_prefetch = None
+            _prefetch_lock.release()
+
+    run_new_daemon_thread(prefetch)
+
+
+def prefetch_blame(
+    git: GitCommand,
+    running_prefetch: RunningBlame,
+    file_path: FullPath,
+    commit_hash: ShortHash,
+    ignore_whitespace: bool,
+    detect_options: str | None
+) -> None:
+    blamed_path = git.filename_at_commit(file_path, commit_hash)
+    key = blame_cache_key(git, blamed_path, commit_hash, ignore_whitespace, detect_options)
+    if key is None or cached_blame(key) is not None:
+        return
+    proc = git.git(
+        *blame_args(blamed_path, commit_hash, ignore_whitespace, detect_options),
+        just_the_proc=True
+    )
+    running_prefetch.remember_proc(proc)
+    with proc:
+        stdout, _ = proc.communicate()
+    if running_prefetch.cancelled or proc.returncode != 0:
+        return
+    try:
+        prefetched_blames[key] = parse_porcelain_blame(stdout, git.strict_decode, git.to_short_hash)
+    except UnicodeDecodeError:
+        pass
+
+
+def cancel_prefetch() -> None:
+    running_prefetch = _running_prefetch
+    if running_prefetch:
+        running_prefetch.cancel()
+
+
+def remember_blame(key: BlameCacheKey | None, result: ParsedBlame) -> None:
+    if key is not None:
+        blame_cache[key] = result
 
 
 BLAME_NAVIGATION_INFO_KEY = "git_savvy.blame_navigation_info"
@@ -136,8 +389,19 @@ BLAME_FORMAT_SETTING = "git_savvy.blame_view.format"
 COMPACT_BLAME_FORMATS: tuple[_CompactBlameFormat, ...] = ("hash", "date", "message", "author")
 DEFAULT_BLAME_FORMAT: _CompactBlameFormat = COMPACT_BLAME_FORMATS[0]
 NOT_COMMITED_HASH = "0000000000000000000000000000000000000000"
+PENDING_HASH = FullHash("pending")
+PENDING_COMMIT = ShortHash("...")
+PROGRESSIVE_BLAME_REDRAW_INTERVAL = 0.1
+# A redraw formats and replaces the whole file.  For big files we wait
+# this many times as long as formatting the previous redraw took.
+PROGRESSIVE_BLAME_REDRAW_COST_FACTOR = 4
+MIN_VIEWPORT_LINES = 50
+PREFETCH_MAX_LINES = 20_000
 BLAME_TITLE = "BLAME: {}{}"
 _navigation_info_by_view_id: Dict[sublime.ViewId, NavigationInfo] = {}
+_running_blames: Dict[sublime.ViewId, RunningBlame] = {}
+_running_prefetch: RunningBlame | None = None
+_last_cursor_commit_by_view_id: Dict[sublime.ViewId, BlamedCommit] = {}
 _last_blame_format: _BlameFormat = DEFAULT_BLAME_FORMAT
 _last_compact_blame_format: _CompactBlameFormat = DEFAULT_BLAME_FORMAT
 
@@ -365,7 +629,7 @@ class gs_blame_open_log(GsTextCommand):
         else:
             branch_hint = None
 
-        entries = self.log_generator(
+        entries = self.iter_log(
             file_path=file_path,
             branch=branch_hint,
             follow=True,
@@ -437,11 +701,6 @@ class gs_blame_refresh(GsTextCommand):
     _highlighted_count = 0  # to be implemented
     _original_color_scheme = None  # to be implemented
     _theme = None  # to be implemented
-    _detect_move_or_copy_dict = {
-        "file": "-M",
-        "commit": "-C",
-        "all_commits": "-CCC"
-    }
 
     def run(self, edit, scroll_to: tuple[int, float | None] | None = None) -> None:
         settings = self.view.settings()
@@ -450,20 +709,43 @@ class gs_blame_refresh(GsTextCommand):
 
         enqueue_on_worker(self.update_commit_details, commit_hash, file_path)
 
-        within_what = settings.get("git_savvy.blame_view.detect_move_or_copy_within")
-        if not within_what:
-            within_what = self.savvy_settings.get("blame_detect_move_or_copy_within")
-
         blame_format = blame_format_for_view(self.view)
         remember_blame_format(blame_format)
 
+        ignore_whitespace, detect_options = blame_options(self, self.view)
+
+        # A new refresh supersedes a still running progressive blame,
+        # e.g. because the user switched to another commit.
+        cancel_progressive_blame(self.view)
+        if self.savvy_settings.get("blame_progressive"):
+            running_blame = _running_blames[self.view.id()] = RunningBlame()
+            run_on_new_thread(
+                self.run_progressive_blame,
+                running_blame,
+                file_path,
+                commit_hash,
+                blame_format,
+                ignore_whitespace,
+                detect_options,
+                scroll_to
+            )
+            return
+
         rendered_blame = self.render_blame(
             file_path,
             commit_hash,
             blame_format,
-            ignore_whitespace=settings.get("git_savvy.ignore_whitespace", False),
-            detect_options=self._detect_move_or_copy_dict[within_what]
+            ignore_whitespace=ignore_whitespace,
+            detect_options=detect_options
         )
+        self.draw(rendered_blame, scroll_to)
+        schedule_prefetch(self, self.view)
+
+    def draw(
+        self,
+        rendered_blame: RenderResult,
+        scroll_to: tuple[int, float | None] | None = None
+    ) -> None:
         content = rendered_blame.content
         remember_navigation_info(self.view, rendered_blame.navigation_info)
 
@@ -555,35 +837,236 @@ class gs_blame_refresh(GsTextCommand):
         ignore_whitespace=False,
         detect_options=None
     ) -> RenderResult:
-        blamed_lines, commits = self._run_blame_and_parse(
+        parsed_blame = self._run_blame_and_parse(
             file_path, commit_hash, ignore_whitespace, detect_options
         )
+        return self.format_blame(blame_format, commit_hash, parsed_blame)
+
+    def format_blame(
+        self,
+        blame_format: _BlameFormat,
+        commit_hash: ShortHash | None,
+        parsed_blame: ParsedBlame
+    ) -> RenderResult:
+        blamed_lines = parsed_blame.blamed_lines()
+        commits = parsed_blame.commits
         if blame_format == "verbose":
             return self._verbose_format_blame(commit_hash, blamed_lines, commits)
         return self._compact_format_blame(blame_format, commit_hash, blamed_lines, commits)
 
-    @cached(not_if={"commit_hash": is_dynamic_ref})
     def _run_blame_and_parse(
         self,
         file_path: FullPath,
         commit_hash: ShortHash | None,
         ignore_whitespace=False,
         detect_options=None
-    ):
-        if commit_hash:
-            file_path = self.filename_at_commit(file_path, commit_hash)
-
-        blame_porcelain = self.git(
-            "blame", "-p", '-w' if ignore_whitespace else None, detect_options,
-            commit_hash, "--", file_path
+    ) -> ParsedBlame:
+        blamed_path = (
+            self.filename_at_commit(file_path, commit_hash)
+            if commit_hash
+            else file_path
         )
-        blame_porcelain = unicodedata.normalize('NFC', blame_porcelain)
-        return self.parse_blame(blame_porcelain.split('\n'))
+        key = blame_cache_key(self, blamed_path, commit_hash, ignore_whitespace, detect_options)
+        result = cached_blame(key)
+        if result is not None:
+            return result
+
+        result = self.blame_file(blamed_path, commit_hash, ignore_whitespace, detect_options)
+        remember_blame(key, result)
+        return result
+
+    def blame_file(
+        self,
+        blamed_path: FullPath,
+        commit_hash: ShortHash | None,
+        ignore_whitespace: bool,
+        detect_options: str | None,
+        show_panel_on_error: bool = True
+    ) -> ParsedBlame:
+        args = blame_args(blamed_path, commit_hash, ignore_whitespace, detect_options)
+        blame_porcelain = self.git(*args, decode=False, show_panel_on_error=show_panel_on_error)
+        try:
+            return parse_porcelain_blame(blame_porcelain, self.strict_decode, self.to_short_hash)
+        except UnicodeDecodeError:
+            # Fail like `self.git` does for output it cannot decode.
+            stdout = blame_porcelain.decode("utf-8", "replace")
+            raise GitSavvyError(
+                "$ {}\n{}{}".format(util.debug.pretty_git_command(args), DECODE_ERROR_MESSAGE, stdout),
+                cmd=list(filter_(args)),
+                stdout=stdout,
+                show_panel=show_panel_on_error,
+                window=self.some_window()
+            )
+
+    def run_progressive_blame(
+        self,
+        running_blame: RunningBlame,
+        file_path: FullPath,
+        commit_hash: ShortHash | None,
+        blame_format: _BlameFormat,
+        ignore_whitespace: bool,
+        detect_options: str | None,
+        scroll_to: tuple[int, float | None] | None
+    ) -> None:
+        """Stream `git blame --incremental` into the view.
+
+        All lines start with a placeholder annotation which we resolve
+        as git emits its chunks.  The lines around `scroll_to` are blamed
+        first, the rest of the file after that.
+        """
+        view = self.view
+        try:
+            blamed_path = (
+                self.filename_at_commit(file_path, commit_hash)
+                if commit_hash
+                else file_path
+            )
+            key = blame_cache_key(self, blamed_path, commit_hash, ignore_whitespace, detect_options)
+            parsed_blame = cached_blame(key)
+            if parsed_blame is not None:
+                if not running_blame.cancelled and view.is_valid():
+                    self.draw_unless_cancelled(
+                        running_blame,
+                        self.format_blame(blame_format, commit_hash, parsed_blame),
+                        scroll_to
+                    )
+                    schedule_prefetch(self, self.view)
+                return
+
+            contents = self.read_blamed_contents(blamed_path, commit_hash)
+            if not contents:
+                self.draw_unless_cancelled(running_blame, self.render_blame(
+                    file_path,
+                    commit_hash,
+                    blame_format,
+                    ignore_whitespace=ignore_whitespace,
+                    detect_options=detect_options
+                ), scroll_to)
+                return
+
+            # The placeholder commit is always the first one in the table.
+            pending_commit: _CommitInfo = defaultdict(str)
+            pending_commit["short_hash"] = PENDING_COMMIT
+            pending_commit["long_hash"] = PENDING_HASH
+            commits: list[_CommitInfo] = [pending_commit]
+            commits_by_hash: _CommitsByHash = defaultdict(lambda: defaultdict(str))
+            index_by_hash: dict[FullHash, int] = {}
+            line_commits = array("i", [0]) * len(contents)
+
+            def draw(parsed_blame: ParsedBlame, scroll_to_: tuple[int, float | None] | None) -> None:
+                if not running_blame.cancelled and view.is_valid():
+                    self.draw_unless_cancelled(
+                        running_blame,
+                        without_pending_commits(
+                            self.format_blame(blame_format, commit_hash, parsed_blame)
+                        ),
+                        scroll_to_
+                    )
+
+            def current_position() -> tuple[int, float | None] | None:
+                # In the compact formats the rows of the view do not move
+                # while we fill in the commits, but in the verbose format
+                # they do.
+                if blame_format != "verbose":
+                    return None
+                return (current_lineno(view), y_offset(view, cursor_pos(view)))
+
+            lineno = scroll_to[0] if scroll_to and scroll_to[0] else 1
+            with busy_indicator(view):
+                draw_start = time.perf_counter()
+                draw(ParsedBlame(contents, line_commits, commits), scroll_to)
+                last_draw = time.perf_counter()
+                redraw_interval = next_redraw_interval(last_draw - draw_start)
+                for range_args in viewport_first_ranges(
+                    len(contents), lineno, visible_line_count(view)
+                ):
+                    lines = self.git_streaming(
+                        "blame", "--incremental", "-w" if ignore_whitespace else None,
+                        detect_options, *range_args, commit_hash, "--", blamed_path,
+                        got_proc=running_blame.remember_proc
+                    )
+                    for chunk in parse_incremental_blame(lines, commits_by_hash):
+                        if running_blame.cancelled or not view.is_valid():
+                            running_blame.cancel()
+                            return
+
+                        index = index_by_hash.get(chunk.commit_hash)
+                        if index is None:
+                            commit = commits_by_hash[chunk.commit_hash]
+                            commit["short_hash"] = (
+                                ""
+                                if chunk.commit_hash == NOT_COMMITED_HASH
+                                else self.to_short_hash(chunk.commit_hash)
+                            )
+                            index = index_by_hash[chunk.commit_hash] = len(commits)
+                            commits.append(commit)
+                        start = chunk.lineno - 1
+                        end = min(start + chunk.num_lines, len(line_commits))
+                        line_commits[start:end] = array("i", [index]) * (end - start)
+
+                        now = time.perf_counter()
+                        if now - last_draw > redraw_interval:
+                            draw(ParsedBlame(contents, line_commits, commits), current_position())
+                            last_draw = time.perf_counter()
+                            redraw_interval = next_redraw_interval(last_draw - now)
+
+                if running_blame.cancelled:
+                    return
+                if 0 in line_commits:
+                    draw(ParsedBlame(contents, line_commits, commits), current_position())
+                    return
+
+                parsed_blame = ParsedBlame(
+                    contents,
+                    array("i", (index - 1 for index in line_commits)),
+                    commits[1:]
+                )
+                draw(parsed_blame, current_position())
+                remember_blame(key, parsed_blame)
+        finally:
+            if _running_blames.get(view.id()) is running_blame:
+                del _running_blames[view.id()]
+        if not running_blame.cancelled:
+            schedule_prefetch(self, self.view)
+
+    def draw_unless_cancelled(
+        self,
+        running_blame: RunningBlame,
+        rendered_blame: RenderResult,
+        scroll_to: tuple[int, float | None] | None
+    ) -> None:
+        # Newer refreshes cancel us on the UI thread.  Checking there as
+        # well ensures that a superseded blame never paints over them.
+        def draw() -> None:
+            if not running_blame.cancelled and self.view.is_valid():
+                self.draw(rendered_blame, scroll_to)
+
+        enqueue_on_ui(draw)
+
+    def read_blamed_contents(self, file_path: FullPath, commit_hash: ShortHash | None) -> list[str]:
+        # `--incremental` does not include the contents of the lines.
+        if commit_hash:
+            contents = self.get_file_content_at_commit(file_path, commit_hash)
+        else:
+            # Read the file as git sees it, t.i. after its clean filters and
+            # line ending conversion (`core.autocrlf`), so that the lines
+            # match the porcelain blame sharing our cache key.
+            try:
+                blob = self.git_throwing_silently("hash-object", "-w", "--", file_path).strip()
+                contents = self.lax_decode(
+                    self.git_throwing_silently("cat-file", "blob", blob, decode=False)
+                )
+            except GitSavvyError:
+                return []
+        lines = unicodedata.normalize('NFC', contents).split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        return lines
 
     def _verbose_format_blame(self, commit_hash: ShortHash | None, blamed_lines, commits) -> RenderResult:
         commit_infos = {
             commit["short_hash"]: self.short_commit_info(commit, current_commit_hash=commit_hash)
-            for commit in commits.values()
+            for commit in commits
         }
 
         blame_chunks = tuple(self.group_consecutive_lines(blamed_lines))
@@ -652,7 +1135,7 @@ class gs_blame_refresh(GsTextCommand):
             commit["short_hash"]: self.compact_commit_info(
                 commit, blame_format, current_commit_hash=commit_hash
             )
-            for commit in commits.values()
+            for commit in commits
         }
         blame_chunks = tuple(self.group_consecutive_lines(blamed_lines))
         line_number_width = line_number_width_for_blame_chunks(blame_chunks)
@@ -690,57 +1173,6 @@ class gs_blame_refresh(GsTextCommand):
             NavigationInfo(source_column, blame_info_by_row)
         )
 
-    def parse_blame(
-        self,
-        blame_porcelain: list[str]
-    ) -> tuple[list[BlamedLine], _CommitsByHash]:
-        if blame_porcelain[-1] == '':
-            blame_porcelain = blame_porcelain[:-1]
-
-        lines_iter = iter(blame_porcelain)
-
-        blamed_lines: list[BlamedLine] = []
-        commits: _CommitsByHash = defaultdict(lambda: defaultdict(str))
-
-        for line in lines_iter:
-            match = re.match(
-                r"(?P<commit>[0-9a-f]{40}) \d+ (?P<lineno>\d+)(?: \d+)?",
-                line
-            )
-            assert match
-            commit_hash = FullHash(match["commit"])
-            lineno = int(match["lineno"])
-            short_hash: BlamedCommit = (
-                ""
-                if commit_hash == NOT_COMMITED_HASH
-                else self.to_short_hash(commit_hash)
-            )
-            commits[commit_hash]["short_hash"] = short_hash
-            commits[commit_hash]["long_hash"] = commit_hash
-
-            next_line = next(lines_iter)
-            while not next_line.startswith("\t"):
-                # Iterate through header keys and values.
-                try:
-                    k, v = next_line.split(" ", 1)
-                except ValueError:
-                    # Sometimes git-blame includes keys without values;
-                    # since we don't care about these, simply discard.
-                    print("Skipping blame line: " + repr(next_line))
-                commits[commit_hash][k] = v
-                next_line = next(lines_iter)
-
-            # If `next_lines` starts with a tab (and breaks out of the above
-            # while loop), it is an actual line of code.  The line following
-            # that will be a new header or the end of the file.
-            blamed_lines.append(BlamedLine(
-                # Strip tab character.
-                contents=next_line[1:],
-                commit_hash=short_hash,
-                lineno=lineno))
-
-        return blamed_lines, commits
-
     def group_consecutive_lines(
         self,
         blamed_lines: list[BlamedLine]
@@ -755,6 +1187,8 @@ class gs_blame_refresh(GsTextCommand):
     ) -> _RenderedCommitInfo:
         if commit["long_hash"] == NOT_COMMITED_HASH:
             return ["Not committed yet"]
+        if commit["long_hash"] == PENDING_HASH:
+            return [PENDING_COMMIT]
 
         summary = truncate_commit_info(commit["summary"])
         author_info = commit["author"] + " " + commit["author-mail"]
@@ -775,6 +1209,8 @@ class gs_blame_refresh(GsTextCommand):
     ) -> str:
         if commit["long_hash"] == NOT_COMMITED_HASH:
             return "Not committed yet"
+        if commit["long_hash"] == PENDING_HASH:
+            return PENDING_COMMIT
 
         if blame_format == "hash":
             commit_hash = commit["short_hash"]
@@ -825,6 +1261,146 @@ class gs_blame_refresh(GsTextCommand):
         return lines, blame_info_by_row
 
 
+PORCELAIN_HEADER = re.compile(rb"([0-9a-f]{40}) \d+ \d+(?: \d+)?$")
+
+
+def parse_porcelain_blame(
+    porcelain: bytes,
+    decode: Callable[[bytes], str],
+    to_short_hash: Callable[[FullHash], ShortHash]
+) -> ParsedBlame:
+    """Parse the output of `git blame --porcelain`.
+
+    Git lists the headers of a commit only the first time it blames a
+    line to it.  We create one record per commit, and decode its values
+    and compute its short hash just once.
+    """
+    commits: list[_CommitInfo] = []
+    index_by_hash: dict[bytes, int] = {}
+    line_commits = array("i")
+    content_lines: list[bytes] = []
+    current: _CommitInfo | None = None
+    current_index = -1
+    expect_header = True
+
+    for line in porcelain.split(b"\n"):
+        if expect_header:
+            match = PORCELAIN_HEADER.match(line)
+            if not match:
+                continue
+            expect_header = False
+            raw_hash = match.group(1)
+            try:
+                current_index = index_by_hash[raw_hash]
+            except KeyError:
+                commit_hash = FullHash(raw_hash.decode("ascii"))
+                current = defaultdict(str)
+                current["long_hash"] = commit_hash
+                current["short_hash"] = (
+                    "" if commit_hash == NOT_COMMITED_HASH else to_short_hash(commit_hash)
+                )
+                current_index = index_by_hash[raw_hash] = len(commits)
+                commits.append(current)
+            else:
+                current = None
+
+        elif line[:1] == b"\t":
+            content_lines.append(line[1:])
+            line_commits.append(current_index)
+            expect_header = True
+
+        elif current is not None:
+            key, _, value = line.partition(b" ")
+            current[key.decode("ascii", "replace")] = (
+                unicodedata.normalize("NFC", decode(value)) if value else ""
+            )
+
+    contents = (
+        unicodedata.normalize("NFC", decode(b"\n".join(content_lines))).split("\n")
+        if content_lines
+        else []
+    )
+    return ParsedBlame(contents, line_commits, commits)
+
+
+class BlameChunk(NamedTuple):
+    commit_hash: FullHash
+    lineno: LineNo
+    num_lines: int
+
+
+INCREMENTAL_HEADER = re.compile(r"(?P<commit>[0-9a-f]{40}) \d+ (?P<lineno>\d+) (?P<num_lines>\d+)$")
+
+
+def parse_incremental_blame(lines: Iterable[str], commits: _CommitsByHash) -> Iterator[BlameChunk]:
+    """Parse the output of `git blame --incremental` while it streams in.
+
+    Git emits the headers of a commit only the first time it reports
+    that commit.  We collect them in `commits` and yield each chunk as
+    soon as it is complete.
+    """
+    chunk: BlameChunk | None = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if chunk is None:
+            match = INCREMENTAL_HEADER.match(line)
+            if match:
+                chunk = BlameChunk(
+                    FullHash(match["commit"]),
+                    int(match["lineno"]),
+                    int(match["num_lines"])
+                )
+                commits[chunk.commit_hash]["long_hash"] = chunk.commit_hash
+            continue
+
+        key, _, value = line.partition(" ")
+        if key == "filename":
+            yield chunk
+            chunk = None
+        else:
+            commits[chunk.commit_hash][key] = value
+
+
+def viewport_first_ranges(line_count: int, lineno: LineNo, context: int) -> list[list[str]]:
+    """Return `-L` arguments to blame the lines around `lineno` first, then the rest."""
+    start = max(1, lineno - context)
+    end = min(line_count, lineno + context)
+    if start <= 1 and end >= line_count:
+        return [[]]
+
+    rest = []
+    if start > 1:
+        rest += ["-L", f"1,{start - 1}"]
+    if end < line_count:
+        rest += ["-L", f"{end + 1},{line_count}"]
+    return [["-L", f"{start},{end}"], rest]
+
+
+def next_redraw_interval(draw_duration: float) -> float:
+    return max(PROGRESSIVE_BLAME_REDRAW_INTERVAL, PROGRESSIVE_BLAME_REDRAW_COST_FACTOR * draw_duration)
+
+
+def visible_line_count(view: sublime.View) -> int:
+    _, height = view.viewport_extent()
+    return max(MIN_VIEWPORT_LINES, int(height / (view.line_height() or 1)) + 1)
+
+
+def without_pending_commits(rendered_blame: RenderResult) -> RenderResult:
+    # Cursor commands must not treat the placeholder as a commit.
+    navigation_info = rendered_blame.navigation_info
+    return RenderResult(rendered_blame.content, NavigationInfo(
+        navigation_info.source_start_column,
+        {
+            row: (
+                blame_info._replace(commit_hash="")
+                if blame_info.commit_hash == PENDING_COMMIT
+                else blame_info
+            )
+            for row, blame_info in navigation_info.by_row.items()
+        }
+    ))
+
+
 def source_column_for_left_pad(left_pad: int, line_number_width: int) -> int:
     return left_pad + len(" | ") + line_number_width + len(" ")
 
@@ -836,8 +1412,8 @@ def line_number_width_for_blame_chunks(blame_chunks: tuple[list[BlamedLine], ...
     )
 
 
-def default_compact_blame_left_pad(commits: _CommitsByHash) -> int:
-    return max(len(commit["short_hash"]) for commit in commits.values()) + len(" (CURRENT)")
+def default_compact_blame_left_pad(commits: list[_CommitInfo]) -> int:
+    return max(len(commit["short_hash"]) for commit in commits) + len(" (CURRENT)")
 
 
 def truncate_commit_info(text: str, max_length: int = 40) -> str:
@@ -846,6 +1422,11 @@ def truncate_commit_info(text: str, max_length: int = 40) -> str:
     return text[:max_length - 4] + " ..."
 
 
+class gs_blame_prefetch(TextCommand, GitCommand):
+    def run(self, edit) -> None:
+        schedule_prefetch(self, self.view)
+
+
 class gs_blame_open_commit(GsTextCommand):
     def run(self, edit) -> None:
         commit_hash = commit_under_cursor(self.view)
@@ -5,7 +5,9 @@ from ..view import replace_view_content
 from GitSavvy.core.base_commands import GsWindowCommand
 
 
-from typing import Iterable, List
+from typing import Dict, Iterable, List
+from GitSavvy.core.git_mixins.history import as_log_entry, CommitDetails, split_along_first_parents
+from GitSavvy.core.types import FullHash, ShortHash
 
 
 REF_PROMPT = "Ref or commit hash:"
@@ -30,25 +32,15 @@ class GsGenerateChangeLogCommand(GsWindowCommand):
         show_single_line_input_panel(REF_PROMPT, self.get_last_local_semver_tag() or "", self.on_done)
 
     def on_done(self, ref):
-        merge_entries = self.log(
-            start_end=(ref, "HEAD"),
-            first_parent=True,
-            merges=True
-        )
-
-        ancestor = {}
-        for merge in merge_entries:
-            merge_commits = self.commits_of_merge(merge.long_hash)
-            if len(merge_commits) > 1:
-                for entry in merge_commits:
-                    ancestor[entry] = merge.short_hash
-
-        entries = self.log(
-            start_end=(ref, "HEAD"),
-            no_merges=True,
-            topo_order=True,
-            reverse=True
-        )
+        commits = self.commit_details_log("--topo-order", "{}..HEAD".format(ref))
+        ancestor = self.merge_ancestry(ref, commits)
+        # `git log --no-merges --reverse` picks the newest 6000 commits
+        # (the default `limit` of `log()`) before reversing them.
+        entries = [
+            as_log_entry(commit)
+            for commit in commits
+            if len(commit.parents) < 2
+        ][:6000][::-1]
 
         contributors = set()
         messages = []
@@ -84,6 +76,36 @@ class GsGenerateChangeLogCommand(GsWindowCommand):
         view.set_scratch(True)
         replace_view_content(view, changelog)
 
+    def merge_ancestry(self, ref, commits):
+        # type: (str, List[CommitDetails]) -> Dict[FullHash, ShortHash]
+        """
+        Map the commits merged into HEAD to the short hash of their merge.
+
+        Only merges on the first-parent line which brought in more than one
+        commit count, t.i. a commit of `M~1..M` is attributed to `M` if
+        that range has more than two commits.  `commits` is the topo-ordered
+        range `ref..HEAD`.
+        """
+        ancestor = {}  # type: Dict[FullHash, ShortHash]
+        chain = split_along_first_parents(commits)
+        merges = [part for part in chain if len(part.commit.parents) > 1][:6000]
+        unsure = {part.commit.long_hash for part in merges if len(part.owned) < 3 and part.left_range}
+        if unsure and chain[-1].commit.parents and self.is_ancestor_of(ref, chain[-1].commit.parents[0]):
+            # All commits outside the range are reachable from the first
+            # parent of the oldest commit on the line, hence from `M~1`.
+            unsure = set()
+
+        for part in merges:
+            if part.commit.long_hash in unsure:
+                # `M~1..M` may contain commits outside of `ref..HEAD`.
+                merge_commits = self.commits_of_merge(part.commit.long_hash)
+            else:
+                merge_commits = part.owned[1:]
+            if len(merge_commits) > 1:
+                for entry in merge_commits:
+                    ancestor[entry] = part.commit.short_hash
+        return ancestor
+
     def get_message_groups(self, messages):
         # type: (List[str]) -> OrderedDict[str, Iterable[str]]
         grouped_msgs = OrderedDict()  # type: OrderedDict[str, List[str]]
@@ -14,10 +14,10 @@ __all__ = (
 
 class gs_cherry_pick(gs_log_by_branch):
 
-    def log(self, **kwargs):  # type: ignore[override]
+    def iter_log(self, **kwargs):  # type: ignore[override]
         kwargs["cherry"] = True
         kwargs["start_end"] = ("", kwargs["branch"])
-        return super().log(**kwargs)
+        return super().iter_log(**kwargs)
 
     @on_worker
     def do_action(self, commit_hash, **kwargs):
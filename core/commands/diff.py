@@ -4,9 +4,9 @@ current diff.
 """
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from bisect import insort
 from collections import defaultdict
 from contextlib import contextmanager
-import difflib
 from functools import partial
 from itertools import chain, count, groupby, takewhile
 import os
@@ -20,7 +20,9 @@ from . import intra_line_colorizer
 from . import multi_selector
 from . import stage_hunk
 from .navigate import GsNavigate
+from ..caches import Cache
 from ..fns import head, filter_, flatten, pairwise, unique
+from ..line_matching import match_lines
 from ..parse_diff import SplittedDiff
 from ..git_command import GitCommand, GitSavvyError
 from ..runtime import ensure_on_ui, enqueue_on_worker, run_on_new_thread, throttled
@@ -41,6 +43,7 @@ __all__ = (
     "gs_diff_toggle_setting",
     "gs_diff_toggle_cached_mode",
     "gs_diff_toggle_all",
+    "gs_diff_expand_file",
     "gs_diff_switch_files",
     "gs_diff_grab_quick_panel_view",
     "gs_diff_zoom",
@@ -329,46 +332,93 @@ class gs_diff_refresh(TextCommand, GitCommand):
         show_diffstat = settings.get("git_savvy.diff_view.show_diffstat")
         disable_stage = settings.get("git_savvy.diff_view.disable_stage")
         context_lines = settings.get('git_savvy.diff_view.context_lines')
+        expanded_files = settings.get('git_savvy.diff_view.expanded_files') or []
 
-        def run_diff() -> bytes:
+        snapshot_key = (
+            repo_path, in_cached_mode, ignore_whitespace, context_lines, tuple(expanded_files)
+        )
+        fingerprints = (
+            None if file_path or base_commit or target_commit
+            else self.diff_fingerprints(in_cached_mode)
+        )
+        snapshot = diff_snapshots.get(view.id())
+
+        def run_diff(pathspecs: Sequence[str | None], stat: bool) -> bytes:
             return self.git(
                 "diff",
                 "--ignore-all-space" if ignore_whitespace else None,
                 "--unified={}".format(context_lines) if context_lines is not None else None,
-                "--stat" if show_diffstat else None,
+                "--stat" if stat else None,
                 "--patch",
                 "--no-color",
                 "--cached" if in_cached_mode else None,
                 base_commit,
                 target_commit,
                 "--",
-                file_path,
+                *pathspecs,
                 decode=False
             )
 
-        raw_diff = run_diff()
-        untracked_file = (
-            not raw_diff
-            and file_path
-            # Only check the cached value in `store` to not get expensive
-            # for the normal case of just checking a clean file.
-            and self.is_probably_untracked_file(file_path)
-        )
-        if untracked_file:
-            self.intent_to_add(file_path)
-            try:
-                raw_diff = run_diff()
-            finally:
-                self.undo_intent_to_add(file_path)
-
-        try:
-            diff = self.strict_decode(raw_diff)
-        except UnicodeDecodeError:
-            diff = DECODE_ERROR_MESSAGE
-            diff += "\n-- Partially decoded output follows; � denotes decoding errors --\n\n"
-            diff += raw_diff.decode("utf-8", "replace")
+        diff: str | None = None
+        stats: list[NumStat] | None = None
+        omitted_files: list[OmittedFile] = []
+        untracked_file = False
+        if fingerprints is not None and snapshot and snapshot.key == snapshot_key:
+            diff = self.diff_incrementally(snapshot, fingerprints, run_diff)
+
+        if diff is None:
+            stats = (
+                self.diff_numstat(ignore_whitespace, in_cached_mode, base_commit, target_commit, fingerprints)
+                if not file_path and (
+                    show_diffstat or self.savvy_settings.get("diff_view_large_diff_threshold")
+                )
+                else []
+            )
+            omitted_files = self.files_to_omit(stats, expanded_files)
+            excluded_paths = exclude_pathspecs(omitted_files, stats)
+            # A diff of all files gets the diffstat spliced in below.
+            raw_diff = run_diff([file_path, *(excluded_paths or [])], show_diffstat and bool(file_path))
+            untracked_file = bool(
+                not raw_diff
+                and file_path
+                # Only check the cached value in `store` to not get expensive
+                # for the normal case of just checking a clean file.
+                and self.is_probably_untracked_file(file_path)
+            )
+            if untracked_file:
+                self.intent_to_add(file_path)
+                try:
+                    raw_diff = run_diff([file_path], show_diffstat)
+                finally:
+                    self.undo_intent_to_add(file_path)
 
-        if not diff and settings.get("git_savvy.diff_view.just_hunked"):
+            try:
+                diff = self.strict_decode(raw_diff)
+            except UnicodeDecodeError:
+                diff = DECODE_ERROR_MESSAGE
+                diff += "\n-- Partially decoded output follows; � denotes decoding errors --\n\n"
+                diff += raw_diff.decode("utf-8", "replace")
+                fingerprints = None
+            if excluded_paths is None:
+                diff = drop_file_sections(diff, omitted_paths(omitted_files))
+
+        if fingerprints is not None and not omitted_files:
+            diff_snapshots[view.id()] = DiffSnapshot(snapshot_key, fingerprints, diff)
+        else:
+            diff_snapshots.pop(view.id(), None)
+
+        # Build the diffstat from the `--numstat` of each file, which is cached
+        # per fingerprint, so that the diff itself can refresh incrementally.
+        if diff and show_diffstat and not file_path:
+            if stats is None:
+                stats = self.diff_numstat(ignore_whitespace, in_cached_mode, base_commit, target_commit, fingerprints)
+            hidden_paths = omitted_paths(omitted_files)
+            diff = format_diffstat(sorted(
+                (stat for stat in stats if stat.path not in hidden_paths),
+                key=lambda stat: stat.path
+            )) + "\n" + diff
+
+        if not diff and not omitted_files and settings.get("git_savvy.diff_view.just_hunked"):
             history = self.view.settings().get("git_savvy.diff_view.history") or [[[]]]
             if history[-1][0][1:3] != ["-R", None]:  # not when discarding
                 view.run_command("gs_diff_toggle_cached_mode")
@@ -376,7 +426,7 @@ class gs_diff_refresh(TextCommand, GitCommand):
                 return
 
         if settings.get("git_savvy.just_committed"):
-            if diff:
+            if diff or omitted_files:
                 settings.set("git_savvy.just_committed", False)
             else:
                 if in_cached_mode:
@@ -392,7 +442,7 @@ class gs_diff_refresh(TextCommand, GitCommand):
         )
 
         if file_path:
-            is_untracked_folder = not raw_diff and file_path.endswith(("\\", "/"))
+            is_untracked_folder = not diff and file_path.endswith(("\\", "/"))
             rel_file_path = os.path.relpath(file_path, repo_path)
             if is_untracked_folder:
                 rel_folder_path = rel_file_path + os.sep
@@ -423,10 +473,428 @@ class gs_diff_refresh(TextCommand, GitCommand):
         if ignore_whitespace:
             prelude += "  IGNORING WHITESPACE\n"
 
+        if omitted_files:
+            prelude += "\n  LARGE DIFF: [e] shows the file under the cursor\n"
+            prelude += "".join(map(format_omitted_file, omitted_files))
+
         prelude += "\n--\n"
 
         ensure_on_ui(_draw, view, title, prelude, diff, match_position, preserve_history)
 
+    def diff_fingerprints(self, in_cached_mode: bool) -> dict[str, tuple]:
+        """Fingerprint every changed file by its blobs and, if not staged, its stat.
+
+        Whenever the fingerprint of a file is unchanged, its section of the
+        diff must be unchanged as well.
+        """
+        raw = self.git("diff", "--raw", "-z", "--no-abbrev", "--cached" if in_cached_mode else None)
+        fingerprints: dict[str, tuple] = {}
+        parts = iter(raw.split("\0"))
+        for meta in parts:
+            if not meta:
+                continue
+            _, _, old_hash, new_hash, status = meta.lstrip(":").split(" ")
+            paths = (next(parts), next(parts)) if status[0] in "RC" else (next(parts),)
+            fingerprint: tuple = (old_hash, new_hash, paths)
+            if not in_cached_mode:
+                fingerprint += (self.stat_fingerprint(paths[-1]),)
+            for path in paths:
+                fingerprints[path] = fingerprint
+        return fingerprints
+
+    def stat_fingerprint(self, path: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(os.path.join(self.repo_path, path))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def diff_incrementally(
+        self,
+        snapshot: DiffSnapshot,
+        fingerprints: dict[str, tuple],
+        run_diff: Callable[..., bytes],
+    ) -> str | None:
+        """Update the diff of the last draw by re-diffing only the changed files.
+
+        Return `None` if we can't, and the caller must fall back to a full diff.
+        """
+        changed_paths = {
+            path
+            for path in snapshot.fingerprints.keys() | fingerprints.keys()
+            if snapshot.fingerprints.get(path) != fingerprints.get(path)
+        }
+        if not changed_paths:
+            return snapshot.diff
+        if len(changed_paths) > MAX_INCREMENTALLY_REFRESHED_FILES:
+            return None
+
+        prelude, sections = split_diff_into_file_sections(snapshot.diff)
+        kept_sections = []
+        for section in sections:
+            paths = section_paths(section)
+            if paths is None:
+                return None
+            if changed_paths.isdisjoint(paths):
+                kept_sections.append((paths[-1], section))
+
+        try:
+            _, new_sections = split_diff_into_file_sections(self.strict_decode(run_diff(
+                [":(top,literal){}".format(path) for path in sorted(changed_paths)],
+                stat=False
+            )))
+        except UnicodeDecodeError:
+            return None
+
+        for section in new_sections:
+            paths = section_paths(section)
+            if paths is None:
+                return None
+            insort(kept_sections, (paths[-1], section))
+        return prelude + "".join(section for _, section in kept_sections)
+
+    def diff_numstat(
+        self,
+        ignore_whitespace: bool,
+        in_cached_mode: bool,
+        base_commit: str | None,
+        target_commit: str | None,
+        fingerprints: dict[str, tuple] | None,
+    ) -> list[NumStat]:
+        """Return the `--numstat` of the diff, one entry per changed file.
+
+        Given the `fingerprints` of the diff, the entries are cached per
+        fingerprint, and only the files which changed since are counted
+        again.
+        """
+        def numstat(pathspecs: list[str]) -> list[NumStat]:
+            return parse_numstat(self.git(
+                "diff",
+                "--ignore-all-space" if ignore_whitespace else None,
+                "--numstat",
+                "-z",
+                "--cached" if in_cached_mode else None,
+                base_commit,
+                target_commit,
+                "--",
+                *pathspecs
+            ))
+
+        if fingerprints is None:
+            return numstat([])
+
+        cache_key = (self.repo_path, ignore_whitespace, in_cached_mode)
+        stats = []
+        stale_fingerprints = []
+        for fingerprint in unique(fingerprints.values()):
+            try:
+                stat = numstat_cache[cache_key + (fingerprint,)]
+            except KeyError:
+                stale_fingerprints.append(fingerprint)
+            else:
+                if stat:
+                    stats.append(stat)
+        if not stale_fingerprints:
+            return stats
+
+        if not stats or len(stale_fingerprints) > MAX_INCREMENTALLY_REFRESHED_FILES:
+            stats, new_stats = [], numstat([])
+        else:
+            new_stats = numstat([
+                ":(top,literal){}".format(path)
+                for _, _, paths, *_ in stale_fingerprints
+                for path in paths
+            ])
+        # Files without an entry, e.g. with only whitespace changes, stay cached as such.
+        for fingerprint in stale_fingerprints:
+            numstat_cache[cache_key + (fingerprint,)] = None
+        for stat in new_stats:
+            if stat.path in fingerprints:
+                numstat_cache[cache_key + (fingerprints[stat.path],)] = stat
+        return stats + new_stats
+
+    def files_to_omit(self, stats: list[NumStat], expanded_files: list[str]) -> list[OmittedFile]:
+        """Estimate the size of the diff and pick the files we only list.
+
+        For a large diff, binary and generated files are skipped, and
+        files with many changed lines get collapsed, starting with the
+        biggest, until the rest is below the threshold again.  Files
+        the user explicitly expanded are always shown.
+        """
+        large_diff_threshold = self.savvy_settings.get("diff_view_large_diff_threshold")
+        collapse_threshold = self.savvy_settings.get("diff_view_collapse_file_threshold")
+        if not large_diff_threshold:
+            return []
+
+        total_lines = sum(stat.lines for stat in stats)
+        if total_lines <= large_diff_threshold:
+            return []
+
+        generated_files = self.generated_files([stat.path for stat in stats])
+        omitted_files = []
+        reason: Literal["binary", "generated", "collapsed"]
+        for stat in sorted(stats, key=lambda stat: -stat.lines):
+            if stat.path in expanded_files:
+                total_lines -= stat.lines
+                continue
+            if stat.binary:
+                reason = "binary"
+            elif stat.path in generated_files:
+                reason = "generated"
+            elif stat.lines > collapse_threshold or total_lines > large_diff_threshold:
+                reason = "collapsed"
+            else:
+                continue
+            omitted_files.append(OmittedFile(stat.path, stat.old_path, reason, stat.lines))
+            total_lines -= stat.lines
+        return sorted(omitted_files, key=lambda omitted_file: omitted_file.path)
+
+    def generated_files(self, paths: list[str]) -> set[str]:
+        """Return the paths marked with the `linguist-generated` attribute."""
+        if not paths:
+            return set()
+        try:
+            output = self.git_throwing_silently(
+                "check-attr", "-z", "--stdin", "linguist-generated",
+                stdin="\0".join(paths)
+            )
+        except GitSavvyError:
+            return set()
+        parts = output.split("\0")
+        return {
+            path
+            for path, _, value in zip(parts[0::3], parts[1::3], parts[2::3])
+            if value in ("set", "true")
+        }
+
+
+class DiffSnapshot(NamedTuple):
+    key: tuple
+    fingerprints: Dict[str, tuple]
+    diff: str
+
+
+diff_snapshots: dict[sublime.ViewId, DiffSnapshot] = {}
+MAX_INCREMENTALLY_REFRESHED_FILES = 100
+numstat_cache: Dict[tuple, Optional[NumStat]] = Cache(maxsize=8192)
+
+
+def section_paths(section: str) -> list[str] | None:
+    """Return the paths a `diff --git` section of a diff is about.
+
+    The last path is the one git sorts the section by.  Return `None` for
+    quoted paths we can't reliably parse.
+    """
+    header, _, rest = section.partition("\n")
+    names = header[len("diff --git "):]
+    if names.startswith('"'):
+        return None
+
+    paths = []
+    # For everything but renames and copies, the header reads "a/<path> b/<path>".
+    half = (len(names) - 1) // 2
+    if names[half] == " " and names[2:half] == names[half + 3:]:
+        paths.append(names[2:half])
+    for line in rest.splitlines():
+        if line.startswith(("rename from ", "rename to ", "copy from ", "copy to ")):
+            paths.append(line.split(" ", 2)[2])
+        elif line.startswith(("--- ", "@@", "Binary files ")):
+            break
+    return paths or None
+
+
+class NumStat(NamedTuple):
+    path: str
+    old_path: Optional[str]
+    added: int
+    deleted: int
+    binary: bool
+
+    @property
+    def lines(self) -> int:
+        return self.added + self.deleted
+
+
+def parse_numstat(output: str) -> list[NumStat]:
+    """Parse the output of `git diff --numstat -z`."""
+    stats = []
+    parts = iter(output.split("\0"))
+    for part in parts:
+        if not part:
+            continue
+        added, deleted, path = part.split("\t", 2)
+        old_path = None
+        if not path:
+            # A rename or copy: the two paths follow as separate fields
+            old_path, path = next(parts), next(parts)
+        binary = added == "-"
+        stats.append(
+            NumStat(path, old_path, 0, 0, True) if binary
+            else NumStat(path, old_path, int(added), int(deleted), False)
+        )
+    return stats
+
+
+DIFFSTAT_WIDTH = 80
+
+
+def format_diffstat(stats: list[NumStat]) -> str:
+    """Format `stats` like `git diff --stat` does for a terminal of `DIFFSTAT_WIDTH`."""
+    if not stats:
+        return ""
+    names = [diffstat_name(stat) for stat in stats]
+    max_change = max(stat.lines for stat in stats)
+    number_width = len(str(max_change))
+    if any(stat.binary for stat in stats):
+        number_width = max(number_width, len("Bin"))
+    name_width = max(map(len, names))
+    graph_width = max_change
+    if name_width + number_width + 6 + graph_width > DIFFSTAT_WIDTH:
+        if graph_width > DIFFSTAT_WIDTH * 3 // 8 - number_width - 6:
+            graph_width = max(DIFFSTAT_WIDTH * 3 // 8 - number_width - 6, 6)
+        if name_width > DIFFSTAT_WIDTH - number_width - 6 - graph_width:
+            name_width = DIFFSTAT_WIDTH - number_width - 6 - graph_width
+        else:
+            graph_width = DIFFSTAT_WIDTH - number_width - 6 - name_width
+
+    def scale(lines: int) -> int:
+        return 0 if not lines else 1 + lines * (graph_width - 1) // max_change
+
+    out = []
+    for stat, name in zip(stats, names):
+        prefix = ""
+        if len(name) > name_width:
+            prefix = "..."
+            name = name[len(name) - max(name_width - 3, 0):]
+            slash = name.find("/")
+            if slash != -1:
+                name = name[slash:]
+        name = (prefix + name).ljust(name_width)
+        if stat.binary:
+            out.append(" {} | {:>{}}\n".format(name, "Bin", number_width))
+            continue
+        added, deleted = stat.added, stat.deleted
+        if graph_width <= max_change:
+            total = scale(added + deleted)
+            if total < 2 and added and deleted:
+                total = 2
+            if added < deleted:
+                added = scale(added)
+                deleted = total - added
+            else:
+                deleted = scale(deleted)
+                added = total - deleted
+        out.append(" {} | {:>{}}{}{}{}\n".format(
+            name, stat.lines, number_width, " " if stat.lines else "", "+" * added, "-" * deleted
+        ))
+
+    insertions = sum(stat.added for stat in stats)
+    deletions = sum(stat.deleted for stat in stats)
+    out.append(" {} file{} changed".format(len(stats), "" if len(stats) == 1 else "s"))
+    if insertions or not deletions:
+        out.append(", {} insertion{}(+)".format(insertions, "" if insertions == 1 else "s"))
+    if deletions or not insertions:
+        out.append(", {} deletion{}(-)".format(deletions, "" if deletions == 1 else "s"))
+    out.append("\n")
+    return "".join(out)
+
+
+def diffstat_name(stat: NumStat) -> str:
+    """Name a file like `--stat` does, e.g. "src/{old => new}/file.py" for a rename."""
+    if stat.old_path is None:
+        return stat.path
+    a, b = stat.old_path, stat.path
+    prefix_length = 0
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            break
+        if x == "/":
+            prefix_length = i + 1
+
+    # A common suffix starts with a slash and may share that slash with the prefix.
+    suffix_length = 0
+    a_end, b_end = a + "\0", b + "\0"
+    i, j = len(a), len(b)
+    lower_bound = prefix_length - 1 if prefix_length else 0
+    while i >= lower_bound and j >= lower_bound and a_end[i] == b_end[j]:
+        if a_end[i] == "/":
+            suffix_length = len(a) - i
+        i, j = i - 1, j - 1
+
+    if not prefix_length + suffix_length:
+        return "{} => {}".format(a, b)
+    a_mid = a[prefix_length:max(len(a) - suffix_length, prefix_length)]
+    b_mid = b[prefix_length:max(len(b) - suffix_length, prefix_length)]
+    return "{}{{{} => {}}}{}".format(a[:prefix_length], a_mid, b_mid, a[len(a) - suffix_length:])
+
+
+class OmittedFile(NamedTuple):
+    path: str
+    old_path: Optional[str]
+    reason: Literal["binary", "generated", "collapsed"]
+    lines: int
+
+    def paths(self) -> list[str]:
+        return [self.path] if self.old_path is None else [self.old_path, self.path]
+
+
+MAX_EXCLUDED_PATHSPECS = 100
+
+
+def exclude_pathspecs(omitted_files: list[OmittedFile], stats: list[NumStat]) -> list[str] | None:
+    """Return the pathspecs which exclude the omitted files from a diff.
+
+    Many omitted files are excluded by their topmost directory without
+    a shown file in it, e.g. a whole folder of generated files.  Return
+    `None` if that still takes too many pathspecs for a command line.
+    """
+    excluded_paths = omitted_paths(omitted_files)
+    if len(excluded_paths) > MAX_EXCLUDED_PATHSPECS:
+        shown_dirs = {
+            directory
+            for stat in stats
+            for path in filter_((stat.path, stat.old_path))
+            if path not in excluded_paths
+            for directory in parent_directories(path)
+        }
+        excluded_paths = {
+            next((d for d in parent_directories(path) if d not in shown_dirs), path)
+            for path in excluded_paths
+        }
+        if len(excluded_paths) > MAX_EXCLUDED_PATHSPECS:
+            return None
+    return [":(top,literal,exclude){}".format(path) for path in sorted(excluded_paths)]
+
+
+def omitted_paths(omitted_files: list[OmittedFile]) -> set[str]:
+    return {path for omitted_file in omitted_files for path in omitted_file.paths()}
+
+
+def parent_directories(path: str) -> list[str]:
+    """Return the directories `path` is in, starting with the topmost."""
+    parts = path.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts))]
+
+
+def drop_file_sections(diff: str, paths: set[str]) -> str:
+    prelude, sections = split_diff_into_file_sections(diff)
+    return prelude + "".join(
+        section
+        for section in sections
+        if paths.isdisjoint(section_paths(section) or [])
+    )
+
+
+OMITTED_FILE_RE = re.compile(r"^    (?:BINARY|GENERATED|COLLAPSED) +(.+?)(?:  \(\d+ lines\))?$")
+
+
+def format_omitted_file(omitted_file: OmittedFile) -> str:
+    return "    {:<10} {}{}\n".format(
+        omitted_file.reason.upper(),
+        omitted_file.path,
+        "" if omitted_file.reason == "binary" else "  ({} lines)".format(omitted_file.lines)
+    )
+
 
 def _draw(
     view: sublime.View,
@@ -637,15 +1105,30 @@ def file_section_key(section: str) -> str:
 
 
 def _compute_reference_document_monolithic(a: str, b: str) -> str:
-    differ = difflib.Differ()
-    diff = differ.compare(b.splitlines(keepends=True), a.splitlines(keepends=True))
-    diff_ = [
-        line if line[2] in "+-" else f" {line[1:]}"
-        for line in diff
-        if line[0] in "- " or (line[0] == "+" and line[2] in "+-")
-    ]
-    a_ = "".join(difflib.restore(diff_, 2))
-    return a_
+    a_lines = a.splitlines(keepends=True)
+    b_lines = b.splitlines(keepends=True)
+    reference: list[str] = []
+    for tag, b_start, b_end, a_start, a_end in match_lines(b_lines, a_lines):
+        if tag == "equal":
+            reference.extend(b_lines[b_start:b_end])
+        else:
+            reference.extend(_merge_changed_block(b_lines[b_start:b_end], a_lines[a_start:a_end]))
+    return "".join(reference)
+
+
+def _merge_changed_block(b_lines: list[str], a_lines: list[str]) -> Iterator[str]:
+    # Keep the metadata and context lines of `b`, but put the changed patch
+    # lines of `a` where `b` has its changed lines.  Surplus lines of `a`
+    # go to the end of the block, surplus changed lines of `b` are dropped.
+    a_changes = (line for line in a_lines if line.startswith(("+", "-")))
+    for line in b_lines:
+        if line.startswith(("+", "-")):
+            replacement = next(a_changes, None)
+            if replacement is not None:
+                yield replacement
+        else:
+            yield line
+    yield from a_changes
 
 
 def find_header_for_filename(headers, filename):
@@ -795,6 +1278,30 @@ class gs_diff_toggle_all(TextCommand, GitCommand):
         return "from_diff", position, filename
 
 
+class gs_diff_expand_file(TextCommand):
+
+    """Show the diff of the collapsed or skipped file under the cursor."""
+
+    def run(self, edit: sublime.Edit) -> None:
+        view = self.view
+        diff_regions = view.find_by_selector("git-savvy.diff_view git-savvy.diff")
+        prelude_end = diff_regions[0].a if diff_regions else view.size()
+        paths = [
+            match.group(1)
+            for s in view.sel()
+            if s.b < prelude_end
+            if (match := OMITTED_FILE_RE.match(view.substr(view.line(s.b))))
+        ]
+        if not paths:
+            flash(view, "Not on a collapsed file.")
+            return
+
+        settings = view.settings()
+        expanded_files = settings.get("git_savvy.diff_view.expanded_files") or []
+        settings.set("git_savvy.diff_view.expanded_files", list(unique(expanded_files + paths)))
+        view.run_command("gs_diff_refresh")
+
+
 class gs_diff_switch_files(TextCommand, GitCommand):
     def run(self, edit, recursed=False, auto_close=False, forward=None):
         # type: (sublime.Edit, bool, bool | Literal["slow"], Optional[bool]) -> None
@@ -1170,6 +1677,7 @@ class GsDiffFocusEventListener(EventListener):
 
     def on_close(self, view):
         DIFF_HISTORY.pop(view.id(), None)
+        diff_snapshots.pop(view.id(), None)
 
 
 class gs_diff_stage_or_reset_hunk(TextCommand, GitCommand):
@@ -1307,7 +1815,12 @@ class gs_diff_stage_or_reset_hunk(TextCommand, GitCommand):
             zero_diff = self.view.settings().get('git_savvy.diff_view.context_lines') == 0
 
         else:
-            line_starts = selected_line_starts(self.view, frozen_sel)
+            # Bare cursors next to real selections still mean "this hunk", so
+            # that everything ends up in one patch (and one undo entry).
+            line_starts = (
+                selected_line_starts(self.view, [s for s in frozen_sel if not s.empty()])
+                | hunk_line_starts(diff, [s.a for s in frozen_sel if s.empty()])
+            )
             if apply_to_working_tree:
                 patch, error = compute_contextual_patch_for_sel(diff, line_starts, reset)
                 if error:
@@ -1425,6 +1938,12 @@ def selected_line_starts(view, sel):
     return set(line.a for line in selected_lines)
 
 
+def hunk_line_starts(diff, pts):
+    # type: (SplittedDiff, List[int]) -> Set[int]
+    hunks = unique(filter_(map(diff.hunk_for_pt, pts)))
+    return set(line.a for hunk in hunks for line in hunk.content().lines())
+
+
 def chunkby(it, predicate):
     # type: (Iterable[T], Callable[[T], bool]) -> Iterator[List[T]]
     return (list(items) for selected, items in groupby(it, key=predicate) if selected)
@@ -1446,8 +1965,9 @@ def compute_no_context_patch_for_sel(diff, line_starts, reverse):
     for hunk in hunks:
         header = diff.head_for_hunk(hunk)
         for chunk in chunkby(recount_lines(hunk), not_context):
-            selected_lines = list(filter(selected, chunk))
-            if selected_lines:
+            # Unselected lines within a chunk split it, as a hunk can only
+            # hold consecutive lines.
+            for selected_lines in chunkby(chunk, selected):
                 patches[header].append(form_patch(selected_lines))
 
     whole_patch = "".join(
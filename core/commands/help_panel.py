@@ -191,6 +191,7 @@ class gs_diff_help_panel(GsAbstractOpenHelpPanel):
     [m]            amend previous commit
     [f]            make fixup commit
     [a]            toggle all files / current file
+    [e]            show collapsed file of a large diff
 
     ### Navigation ###
     [o]            open hunk in working dir
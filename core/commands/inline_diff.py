@@ -8,10 +8,12 @@ from sublime_plugin import WindowCommand, TextCommand, EventListener
 
 from . import diff
 from . import show_file_at_commit
+from .intra_line_colorizer import view_has_changed_factory
 from .navigate import GsNavigate
+from ..fns import accumulate
 from ..git_command import GitCommand
 from ..parse_diff import SplittedDiff, UnsupportedCombinedDiff
-from ..runtime import enqueue_on_ui, enqueue_on_worker
+from ..runtime import cooperative_thread_hopper, enqueue_on_ui, enqueue_on_worker, AWAIT_WORKER, HopperR
 from ..utils import flash, focus_view
 from ..view import (
     apply_position, capture_cur_position, other_visible_views, place_view,
@@ -38,7 +40,7 @@ __all__ = (
 )
 
 
-from typing import Dict, Iterable, List, Literal, NamedTuple, Optional, Tuple
+from typing import Dict, Iterable, List, Literal, NamedTuple, Optional, Set, Tuple
 from ..types import LineNo, ColNo, Row, FullPath, ShortHash
 from GitSavvy.common.util.parse_diff import Hunk as InlineDiff_Hunk
 
@@ -88,6 +90,25 @@ def count_deleted_lines_before_line(hunks, line):
     )
 
 
+def zero_context_diff(short_path, hunks):
+    # type: (str, List[HunkReference]) -> Tuple[SplittedDiff, Dict[Row, int]]
+    """
+    Reassemble the `-U0` diff the inline view was drawn from, and map each
+    row of the view that shows a diff line to the start of that line in the
+    reassembled diff.
+    """
+    parts = [DIFF_HEADER.format(path=short_path)]
+    offset = len(parts[0])
+    line_starts = {}  # type: Dict[Row, int]
+    for hunk_ref in hunks:
+        for idx, line in enumerate(hunk_ref.hunk.raw_lines):
+            if idx > 0:
+                line_starts[hunk_ref.section_start + idx - 1] = offset
+            parts.append(line)
+            offset += len(line)
+    return SplittedDiff.from_string("".join(parts)), line_starts
+
+
 def real_saved_start(hunk):
     # For removal only hunks git reports a line decremented by one. We reverse
     # compensate here
@@ -482,7 +503,7 @@ class gs_inline_diff_refresh(TextCommand, GitCommand):
             elif navigate_to_first_hunk:
                 view.run_command("gs_inline_diff_navigate_hunk")
 
-            self.highlight_regions(hunks)
+            self.highlight_regions(hunks, inline_diff_contents)
 
     def get_inline_diff_contents(self, original_contents, diff):
         # type: (str, List[InlineDiff_Hunk]) -> Tuple[str, List[HunkReference]]
@@ -499,7 +520,10 @@ class gs_inline_diff_refresh(TextCommand, GitCommand):
         """
         lines = original_contents.splitlines(keepends=True)
         hunks = []  # type: List[HunkReference]
-        adjustment = 0
+        # Merge the original lines and the hunks in one pass.  `pos` points
+        # at the next original line not yet copied into `inline_lines`.
+        inline_lines = []  # type: List[str]
+        pos = 0
 
         for hunk in diff:
             # Git line-numbers are 1-indexed, lists are 0-indexed.
@@ -511,106 +535,152 @@ class gs_inline_diff_refresh(TextCommand, GitCommand):
 
             # Remove the `@@` header line.
             diff_lines = hunk.raw_lines[1:]
-
-            section_start = head_start + adjustment
-            section_end = section_start + len(diff_lines)
             line_types = [line[0] for line in diff_lines]
             raw_lines = [line[1:] for line in diff_lines]
 
+            inline_lines.extend(lines[pos:head_start])
+            section_start = len(inline_lines)
+            inline_lines.extend(raw_lines)
+            section_end = len(inline_lines)
+
             # Store information about this hunk, with proper references, so actions
             # can be taken when triggered by the user (e.g. stage line X in diff_view).
             hunks.append(HunkReference(
                 section_start, section_end, hunk, line_types, raw_lines
             ))
 
-            tail = lines[head_end + adjustment + (1 if line_types[-1] == "\\" else 0):]
-            lines = lines[:section_start] + raw_lines + tail
-            adjustment += len(diff_lines) - hunk.head_length
+            pos = head_end + (1 if line_types[-1] == "\\" else 0)
 
+        inline_lines.extend(lines[pos:])
         diff_view_hunks[self.view.id()] = hunks
-        return "".join(lines), hunks
+        return "".join(inline_lines), hunks
 
-    def highlight_regions(self, replaced_lines):
-        # type: (List[HunkReference]) -> None
+    def highlight_regions(self, replaced_lines, inline_diff_contents):
+        # type: (List[HunkReference], str) -> None
         """
         Given an array of tuples, where each tuple contains the start and end
         of an inlined diff hunk as well as an array of line-types (add/remove)
         for the lines in that hunk, highlight the added regions in green and
         the removed regions in red.
         """
-        add_regions = []  # type: List[sublime.Region]
-        add_bold_regions = []
-        remove_regions = []  # type: List[sublime.Region]
-        remove_bold_regions = []
-
-        for section_start, section_end, hunk, line_types, raw_lines in replaced_lines:
-            for line_type, lines_ in groupby(
-                range(section_start, section_end),
-                key=lambda line: line_types[line - section_start]
-            ):
-                lines = list(lines_)
-                start, end = lines[0], lines[-1]
-                start_line = self.view.full_line(self.view.text_point(start, 0))
-                end_line = (
-                    self.view.full_line(self.view.text_point(end, 0))
-                    if start != end
-                    else start_line
-                )
-                region = sublime.Region(start_line.begin(), end_line.end())
-                container = add_regions if line_type == "+" else remove_regions
-                container.append(region)
-
-            # For symmetric modifications show highlighting for the in-line changes
-            if sum(1 if t == "+" else -1 for t in line_types) == 0:
-                # Determine start of hunk/section.
-                section_start_idx = self.view.text_point(section_start, 0)
-
-                # Removed lines come first in a hunk.
-                remove_start = section_start_idx
-                first_added_line = line_types.index("+")
-                add_start = section_start_idx + len("".join(raw_lines[:first_added_line]))
-
-                removed_part = "".join(raw_lines[:first_added_line])
-                added_part = "".join(raw_lines[first_added_line:])
-                changes = util.diff_string.get_changes(removed_part, added_part)
-
-                for change in changes:
-                    if change.type in (util.diff_string.DELETE, util.diff_string.REPLACE):
-                        # Display bold color in removed hunk area.
-                        region_start = remove_start + change.old_start
-                        region_end = remove_start + change.old_end
-                        remove_bold_regions.append(sublime.Region(region_start, region_end))
-
-                    if change.type in (util.diff_string.INSERT, util.diff_string.REPLACE):
-                        # Display bold color in added hunk area.
-                        region_start = add_start + change.new_start
-                        region_end = add_start + change.new_end
-                        add_bold_regions.append(sublime.Region(region_start, region_end))
-
-        self.view.add_regions(
-            "git-savvy-added-lines",
-            add_regions,
-            scope="diff.inserted.git-savvy.inline-diff",
-            flags=sublime.RegionFlags.NO_UNDO
-        )
-        self.view.add_regions(
-            "git-savvy-removed-lines",
-            remove_regions,
-            scope="diff.deleted.git-savvy.inline-diff",
-            flags=sublime.RegionFlags.NO_UNDO
-        )
-        self.view.add_regions(
-            "git-savvy-added-bold",
-            add_bold_regions,
-            scope="diff.inserted.char.git-savvy.inline-diff",
-            flags=sublime.RegionFlags.NO_UNDO
-        )
-        self.view.add_regions(
-            "git-savvy-removed-bold",
-            remove_bold_regions,
-            scope="diff.deleted.char.git-savvy.inline-diff",
-            flags=sublime.RegionFlags.NO_UNDO
+        highlight_inline_diff(self.view, replaced_lines, inline_diff_contents)
+
+
+HighlightRegions = Tuple[
+    List[sublime.Region], List[sublime.Region], List[sublime.Region], List[sublime.Region]
+]
+
+
+@cooperative_thread_hopper
+def highlight_inline_diff(view, hunks, inline_diff_contents):
+    # type: (sublime.View, List[HunkReference], str) -> HopperR
+    # Highlight the hunks in the viewport synchronously, the rest on the
+    # worker.  All points are computed from the text we just drew, t.i.
+    # without calling into the view.
+    view_has_changed = view_has_changed_factory(view)
+    line_starts = list(accumulate(
+        map(len, inline_diff_contents.splitlines(keepends=True)), initial=0
+    ))
+    viewport = view.visible_region()
+    first_row, last_row = view.rowcol(viewport.a)[0], view.rowcol(viewport.b)[0]
+
+    in_viewport, others = [], []  # type: Tuple[List[HunkReference], List[HunkReference]]
+    for hunk in hunks:
+        container = (
+            in_viewport if hunk.section_end > first_row and hunk.section_start <= last_row
+            else others
         )
+        container.append(hunk)
+
+    regions = ([], [], [], [])  # type: HighlightRegions
+    for hunk in in_viewport:
+        _add_hunk_regions(regions, hunk, line_starts)
+    _draw_highlight_regions(view, regions)
+    if not others:
+        return
+
+    timer = yield AWAIT_WORKER
+    for hunk in others:
+        _add_hunk_regions(regions, hunk, line_starts)
+        if timer.exhausted_ui_budget():
+            if view_has_changed():
+                return
+            timer = yield AWAIT_WORKER
+
+    if view_has_changed():
+        return
+    _draw_highlight_regions(view, regions)
+
+
+def _add_hunk_regions(regions, hunk, line_starts):
+    # type: (HighlightRegions, HunkReference, List[int]) -> None
+    add_regions, add_bold_regions, remove_regions, remove_bold_regions = regions
+    section_start, section_end, _, line_types, raw_lines = hunk
+    for line_type, lines_ in groupby(
+        range(section_start, section_end),
+        key=lambda line: line_types[line - section_start]
+    ):
+        lines = list(lines_)
+        start, end = lines[0], lines[-1]
+        region = sublime.Region(line_starts[start], line_starts[end + 1])
+        container = add_regions if line_type == "+" else remove_regions
+        container.append(region)
+
+    # For symmetric modifications show highlighting for the in-line changes
+    if sum(1 if t == "+" else -1 for t in line_types) == 0:
+        # Determine start of hunk/section.
+        section_start_idx = line_starts[section_start]
+
+        # Removed lines come first in a hunk.
+        remove_start = section_start_idx
+        first_added_line = line_types.index("+")
+        add_start = section_start_idx + len("".join(raw_lines[:first_added_line]))
+
+        removed_part = "".join(raw_lines[:first_added_line])
+        added_part = "".join(raw_lines[first_added_line:])
+        changes = util.diff_string.get_changes(removed_part, added_part)
+
+        for change in changes:
+            if change.type in (util.diff_string.DELETE, util.diff_string.REPLACE):
+                # Display bold color in removed hunk area.
+                region_start = remove_start + change.old_start
+                region_end = remove_start + change.old_end
+                remove_bold_regions.append(sublime.Region(region_start, region_end))
+
+            if change.type in (util.diff_string.INSERT, util.diff_string.REPLACE):
+                # Display bold color in added hunk area.
+                region_start = add_start + change.new_start
+                region_end = add_start + change.new_end
+                add_bold_regions.append(sublime.Region(region_start, region_end))
+
+
+def _draw_highlight_regions(view, regions):
+    # type: (sublime.View, HighlightRegions) -> None
+    add_regions, add_bold_regions, remove_regions, remove_bold_regions = regions
+    view.add_regions(
+        "git-savvy-added-lines",
+        add_regions,
+        scope="diff.inserted.git-savvy.inline-diff",
+        flags=sublime.RegionFlags.NO_UNDO
+    )
+    view.add_regions(
+        "git-savvy-removed-lines",
+        remove_regions,
+        scope="diff.deleted.git-savvy.inline-diff",
+        flags=sublime.RegionFlags.NO_UNDO
+    )
+    view.add_regions(
+        "git-savvy-added-bold",
+        add_bold_regions,
+        scope="diff.inserted.char.git-savvy.inline-diff",
+        flags=sublime.RegionFlags.NO_UNDO
+    )
+    view.add_regions(
+        "git-savvy-removed-bold",
+        remove_bold_regions,
+        scope="diff.deleted.char.git-savvy.inline-diff",
+        flags=sublime.RegionFlags.NO_UNDO
+    )
 
 
 @contextmanager
@@ -755,21 +825,25 @@ class gs_inline_diff_stage_or_reset_base(TextCommand, GitCommand):
             if self.savvy_settings.get("inline_diff_ignore_eol_whitespaces", True)
             else None
         )
-        frozen_sel = [s for s in self.view.sel()]
-        if len(frozen_sel) != 1 or not frozen_sel[0].empty():
-            flash(self.view, "Only single cursors are supported.")
-            return
-
-        row, _ = self.view.rowcol(frozen_sel[0].begin())
-        diff_lines = self.get_diff_from_line(row, reset)
-        if not diff_lines:
+        # Combine all selected lines (or hunks) into one patch, so that we
+        # call `git apply` once and record one undo entry for all of them.
+        rows = {
+            self.view.rowcol(line.begin())[0]
+            for region in self.view.sel()
+            for line in self.view.lines(region)
+        }
+        hunks = diff_view_hunks[self.view.id()]
+        assert self.file_path
+        zero_diff, line_starts = zero_context_diff(self.to_short_path(self.file_path), hunks)
+        full_diff = diff.compute_no_context_patch_for_sel(
+            zero_diff,
+            {line_starts[row] for row in self.rows_to_apply(hunks, rows) if row in line_starts},
+            reset or in_cached_mode
+        )
+        if not full_diff:
             flash(self.view, "Not on a hunk.")
             return
 
-        assert self.file_path
-        header = DIFF_HEADER.format(path=self.to_short_path(self.file_path))
-        full_diff = header + diff_lines + "\n"
-
         # The three argument combinations below result from the following
         # three scenarios:
         #
@@ -822,148 +896,42 @@ class gs_inline_diff_stage_or_reset_base(TextCommand, GitCommand):
         history.append((args, full_diff, encoding))
         self.view.settings().set("git_savvy.inline_diff.history", history)
 
-    def get_diff_from_line(self, row, reset):
-        # type: (Row, bool) -> Optional[str]
+    def rows_to_apply(self, hunks, rows):
+        # type: (List[HunkReference], Set[Row]) -> Iterable[Row]
         raise NotImplementedError
 
 
 class gs_inline_diff_stage_or_reset_line(gs_inline_diff_stage_or_reset_base):
 
     """
-    Given a line number, generate a diff of that single line in the active
-    file, and apply that diff to the file.  If the `reset` flag is set to
-    `True`, apply the patch in reverse (reverting that line to the version
-    in HEAD).
+    Given the selected lines, generate a diff of just these lines in the
+    active file, and apply that diff to the file.  If the `reset` flag is
+    set to `True`, apply the patch in reverse (reverting these lines to the
+    version in HEAD).
     """
 
-    def get_diff_from_line(self, row, reset):
-        # type: (Row, bool) -> Optional[str]
-        hunks = diff_view_hunks[self.view.id()]
-        add_length_earlier_in_diff = 0
-        cur_hunk_begin_on_minus = 0
-        cur_hunk_begin_on_plus = 0
-
-        # Find the correct hunk.
-        for hunk_ref in hunks:
-            if hunk_ref.section_start <= row < hunk_ref.section_end:
-                break
-            else:
-                # we loop through all hooks before selected hunk.
-                # used create a correct diff when stage, unstage
-                # need to make undo work properly.
-                for type in hunk_ref.line_types:
-                    if type == "+":
-                        add_length_earlier_in_diff += 1
-                    elif type == "-":
-                        add_length_earlier_in_diff -= 1
-        else:
-            return None
-
-        # Determine head/staged starting line.
-        index_in_hunk = row - hunk_ref.section_start
-        assert index_in_hunk >= 0
-        line = hunk_ref.lines[index_in_hunk]
-        line_type = hunk_ref.line_types[index_in_hunk]
-
-        # need to make undo work properly when undoing
-        # a specific line.
-        for type in hunk_ref.line_types[:index_in_hunk]:
-            if type == "-":
-                cur_hunk_begin_on_minus += 1
-            elif type == "+":
-                cur_hunk_begin_on_plus += 1
-
-        # Removed lines are always first with `git diff -U0 ...`. Therefore, the
-        # line to remove will be the Nth line, where N is the line index in the hunk.
-        head_start = (
-            hunk_ref.hunk.head_start
-            if line_type == "+"
-            else hunk_ref.hunk.head_start + index_in_hunk
-        )
-
-        if reset:
-            xhead_start = head_start - index_in_hunk
-            if line_type != "+":
-                xhead_start += add_length_earlier_in_diff
-
-            return (
-                "@@ -{head_start},{head_length} +{new_start},{new_length} @@\n"
-                "{line_type}{line}"
-                .format(
-                    head_start=(xhead_start if xhead_start >= 0 else cur_hunk_begin_on_plus),
-                    head_length="0" if line_type == "+" else "1",
-                    # If head_length is zero, diff will report original start position
-                    # as one less than where the content is inserted, for example:
-                    #   @@ -75,0 +76,3 @@
-                    new_start=xhead_start + (1 if line_type == "+" else 0),
-
-                    new_length="1" if line_type == "+" else "0",
-                    line_type=line_type,
-                    line=line
-                )
-            )
-
-        else:
-            head_start += 1
-            return (
-                "@@ -{head_start},{head_length} +{new_start},{new_length} @@\n"
-                "{line_type}{line}"
-                .format(
-                    head_start=head_start + (-1 if line_type == "-" else 0),
-                    head_length="0" if line_type == "+" else "1",
-                    # If head_length is zero, diff will report original start position
-                    # as one less than where the content is inserted, for example:
-                    #   @@ -75,0 +76,3 @@
-                    new_start=head_start + (-1 if line_type == "-" else 0),
-                    new_length="1" if line_type == "+" else "0",
-                    line_type=line_type,
-                    line=line
-                )
-            )
+    def rows_to_apply(self, hunks, rows):
+        # type: (List[HunkReference], Set[Row]) -> Iterable[Row]
+        return rows
 
 
 class gs_inline_diff_stage_or_reset_hunk(gs_inline_diff_stage_or_reset_base):
 
     """
-    Given a line number, generate a diff of the hunk containing that line,
-    and apply that diff to the file.  If the `reset` flag is set to `True`,
-    apply the patch in reverse (reverting that hunk to the version in HEAD).
+    Given the selected lines, generate a diff of the hunks containing these
+    lines, and apply that diff to the file.  If the `reset` flag is set to
+    `True`, apply the patch in reverse (reverting these hunks to the version
+    in HEAD).
     """
 
-    def get_diff_from_line(self, row, reset):
-        # type: (Row, bool) -> Optional[str]
-        hunks = diff_view_hunks[self.view.id()]
-        add_length_earlier_in_diff = 0
-
-        # Find the correct hunk.
-        for hunk_ref in hunks:
-            if hunk_ref.section_start <= row < hunk_ref.section_end:
-                break
-            else:
-                # we loop through all hooks before selected hunk.
-                # used create a correct diff when stage, unstage
-                # need to make undo work properly.
-                for type in hunk_ref.line_types:
-                    if type == "+":
-                        add_length_earlier_in_diff += 1
-                    elif type == "-":
-                        add_length_earlier_in_diff -= 1
-        else:
-            return None
-
-        stand_alone_header = (
-            "@@ -{head_start},{head_length} +{new_start},{new_length} @@\n".format(
-                head_start=hunk_ref.hunk.head_start + (add_length_earlier_in_diff if reset else 0),
-                head_length=hunk_ref.hunk.head_length,
-                # If head_length is zero, diff will report original start position
-                # as one less than where the content is inserted, for example:
-                #   @@ -75,0 +76,3 @@
-                new_start=hunk_ref.hunk.head_start + (0 if hunk_ref.hunk.head_length else 1),
-                new_length=hunk_ref.hunk.saved_length
-            )
-        )
-
-        return "".join([stand_alone_header] + hunk_ref.hunk.raw_lines[1:])
+    def rows_to_apply(self, hunks, rows):
+        # type: (List[HunkReference], Set[Row]) -> Iterable[Row]
+        return [
+            row
+            for hunk_ref in hunks
+            if any(hunk_ref.section_start <= row < hunk_ref.section_end for row in rows)
+            for row in range(hunk_ref.section_start, hunk_ref.section_end)
+        ]
 
 
 class gs_inline_diff_previous_commit(TextCommand, GitCommand):
@@ -4,6 +4,7 @@ from itertools import groupby, zip_longest
 import re
 
 import sublime
+from ..caches import Cache
 from ..fns import accumulate, filter_, flatten
 from ..parse_diff import Hunk, SplittedDiff
 from ..text_helper import Region
@@ -160,7 +161,33 @@ def compute_chunk_region(lines):
     return sublime.Region(lines[0].a, lines[-1].b)
 
 
+# Intra-line diffs keyed by the text of the chunk.  The regions are stored
+# relative to the start of the chunk so that a chunk which only moved, e.g.
+# after a refresh of the view or in another view, still hits.
+intra_line_diffs = Cache(maxsize=2048)  # type: Cache
+
+
 def intra_line_diff_for_chunk(group):
+    # type: (Chunk) -> Tuple[List[Region], List[Region]]
+    offset = group[0].a
+    key = (group[0].mode_len, tuple(line.text for line in group))
+    try:
+        from_spans, to_spans = intra_line_diffs[key]
+    except KeyError:
+        from_regions, to_regions = _intra_line_diff_for_chunk(group)
+        intra_line_diffs[key] = (
+            [(r.a - offset, r.b - offset) for r in from_regions],
+            [(r.a - offset, r.b - offset) for r in to_regions],
+        )
+        return from_regions, to_regions
+
+    return (
+        [Region(a + offset, b + offset) for a, b in from_spans],
+        [Region(a + offset, b + offset) for a, b in to_spans],
+    )
+
+
+def _intra_line_diff_for_chunk(group):
     # type: (Chunk) -> Tuple[List[Region], List[Region]]
     from_lines, to_lines = [
         list(lines)
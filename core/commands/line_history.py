@@ -1,20 +1,23 @@
 from functools import partial
 from itertools import chain
 import os
-import random
+import subprocess
+import time
 
 import sublime
-from sublime_plugin import TextCommand, WindowCommand
+from sublime_plugin import EventListener, TextCommand, WindowCommand
 
 from . import diff
 from . import inline_diff
 from .navigate import GsNavigate
+from ..caches import Cache
 from ..fns import filter_, pairwise
 from ..git_command import GitCommand
+from ..git_mixins.history import is_dynamic_ref
 from ..parse_diff import SplittedDiff
 from ..runtime import run_on_new_thread
 from ..ui__busy_spinner import busy_indicator
-from ..utils import flash
+from ..utils import flash, try_kill_proc
 from ..view import clamp, replace_view_content
 from ...common import util
 
@@ -25,10 +28,11 @@ __all__ = (
     "gs_line_history_open_commit",
     "gs_line_history_open_graph_context",
     "gs_line_history_navigate",
+    "GsLineHistoryController",
 )
 
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from ..types import LineNo
 LineRange = Tuple[LineNo, LineNo]
 
@@ -253,6 +257,28 @@ class gs_open_line_history(WindowCommand, GitCommand):
 
         def render():
             normalized_short_filename = rel_file_path.replace('\\', '/')
+            # `git log -L` merges overlapping and adjacent ranges itself, so
+            # e.g. "1-5, 6-10" and "1-10" yield the same history and can share
+            # a cache entry.
+            merged_ranges = merge_ranges(ranges)
+            # The output depends on the start commit, and on the refs because
+            # of `--decorate`.
+            tips = self.read_ref_tips()
+            start_commit = commit if commit and not is_dynamic_ref(commit) else tips.get("HEAD")
+            key = (
+                (repo_path, normalized_short_filename, merged_ranges, start_commit, frozenset(tips.items()))
+                if start_commit
+                else None
+            )
+            if key:
+                try:
+                    cached_history = line_history_cache[key]
+                except KeyError:
+                    pass
+                else:
+                    replace_view_content(view, cached_history)
+                    return
+
             cmd = (
                 [
                     'log',
@@ -261,23 +287,79 @@ class gs_open_line_history(WindowCommand, GitCommand):
                 ]
                 + [
                     '-L{},{}:{}'.format(lr[0], lr[1], normalized_short_filename)
-                    for lr in ranges
+                    for lr in merged_ranges
                 ]
                 + [commit]
             )
+            chunks = []  # type: List[str]
+            pending = []  # type: List[str]
+            size = 0
+            last_flush = time.perf_counter()
+
+            def flush():
+                # type: () -> None
+                replace_view_content(view, "".join(pending), sublime.Region(view.size()))
+                pending.clear()
+
             with busy_indicator(view):
-                for line in self.git_streaming(*cmd):
-                    replace_view_content(view, line, sublime.Region(view.size()))
-                    if random.random() < 0.001:
+                for line in self.git_streaming(
+                    *cmd,
+                    got_proc=partial(remember_proc, view)
+                ):
+                    chunks.append(line)
+                    pending.append(line)
+                    size += len(line)
+                    if size > MAX_LINE_HISTORY_SIZE:
+                        chunks.append("\n...\n")
+                        pending.append("\n...\n")
+                        try_kill_proc(running_procs.pop(view.id(), None))
+                        break
+                    now = time.perf_counter()
+                    if now - last_flush > FLUSH_INTERVAL:
                         if not view.is_valid():
                             break
-                        if view.size() > 500_000:
-                            replace_view_content(view, "\n...\n", sublime.Region(view.size()))
-                            break
+                        flush()
+                        last_flush = now
+
+                running_procs.pop(view.id(), None)
+                if not view.is_valid():
+                    return
+                flush()
+
+            if key:
+                line_history_cache[key] = "".join(chunks)
 
         run_on_new_thread(render)
 
 
+MAX_LINE_HISTORY_SIZE = 500_000
+FLUSH_INTERVAL = 0.05
+line_history_cache = Cache(maxsize=16)  # type: Cache
+running_procs = {}  # type: Dict[sublime.ViewId, subprocess.Popen]
+
+
+def merge_ranges(ranges):
+    # type: (List[LineRange]) -> Tuple[LineRange, ...]
+    merged = []  # type: List[LineRange]
+    for a, b in sorted((min(a, b), max(a, b)) for a, b in ranges):
+        if merged and a <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return tuple(merged)
+
+
+def remember_proc(view, proc):
+    # type: (sublime.View, subprocess.Popen) -> None
+    running_procs[view.id()] = proc
+
+
+class GsLineHistoryController(EventListener):
+    def on_close(self, view):
+        # type: (sublime.View) -> None
+        try_kill_proc(running_procs.pop(view.id(), None))
+
+
 class gs_line_history_open_commit(TextCommand, GitCommand):
     def run(self, edit):
         # type: (sublime.Edit) -> None
@@ -32,7 +32,8 @@ class LogMixin(GitCommand):
     Display git log in a quick panel for given file and branch. Upon selection
     of a commit, displays an "action menu" via the ``GsLogActionCommand``.
 
-    Supports paginated fetching of log (defaults to 6000 entries per "page").
+    The log is streamed from a single `git log` process and shown in pages
+    of 6000 entries.
 
     This mixin can be used with both ``WindowCommand`` and ``TextCommand``,
     but the subclass must also inherit from GitCommand (for the `git()` method)
@@ -51,7 +52,7 @@ class LogMixin(GitCommand):
             "follow",
             self.savvy_settings.get("log_follow_rename") if file_path else False
         )
-        entries = self.log_generator(file_path=file_path, follow=follow, **kwargs)
+        entries = self.iter_log(file_path=file_path, follow=follow, **kwargs)
         # `on_highlight` gets called on `on_done` as well with the same
         # commit.  Limit the side-effect here.  Especially prevent that
         # `on_done` wants to hide the panel and `on_highlight` wants to
@@ -123,8 +124,8 @@ class gs_log_current_branch(LogMixin, WindowCommand, GitCommand):
 
 class gs_log_all_branches(LogMixin, WindowCommand, GitCommand):
 
-    def log(self, **kwargs):  # type: ignore[override]
-        return super().log(all_branches=True, **kwargs)
+    def iter_log(self, **kwargs):  # type: ignore[override]
+        return super().iter_log(all_branches=True, **kwargs)
 
 
 class gs_log_by_author(LogMixin, WindowCommand, GitCommand):
@@ -165,8 +166,8 @@ class gs_log_by_author(LogMixin, WindowCommand, GitCommand):
         self._selected_author = self._entries[index][3]
         super().run_async(**kwargs)
 
-    def log(self, **kwargs):  # type: ignore[override]
-        return super().log(author=self._selected_author, **kwargs)
+    def iter_log(self, **kwargs):  # type: ignore[override]
+        return super().iter_log(author=self._selected_author, **kwargs)
 
 
 class gs_log_by_branch(LogMixin, WindowCommand, GitCommand):
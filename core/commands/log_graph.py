@@ -18,10 +18,12 @@ from .log_graph_helper import (
     GRAPH_HEIGHT,
 )
 from .log import gs_log
+from .log_graph_search import compile_filters, ensure_index, get_index
 from ..base_commands import GsTextCommand
 from ..fns import filter_, flatten, pairwise, partition, take
 from ..git_command import GitCommand
 from ..text_helper import Region, TextRange, line_from_pt
+from ..types import ShortHash
 from ..settings import GitSavvySettings
 from ..runtime import (
     cooperative_thread_hopper,
@@ -642,11 +644,18 @@ class gs_log_graph_edit_branches(TextCommand):
 DEFAULT_HISTORY_ENTRIES = ["--date-order", "--dense", "--first-parent", "--reflog"]
 
 
-class gs_log_graph_edit_filters(TextCommand):
+class gs_log_graph_edit_filters(TextCommand, GitCommand):
     def run(self, edit):
         # type: (sublime.Edit) -> None
         view = self.view
         settings = view.settings()
+        repo_path = self.repo_path
+        ensure_index(self)
+        try:
+            original_graph = view.substr(find_by_selector(view, "meta.content.git_savvy.graph")[0])
+        except IndexError:
+            original_graph = ""
+        previewing = False
         applying_filters = settings.get("git_savvy.log_graph_view.apply_filters")
         filters = (
             settings.get("git_savvy.log_graph_view.filters", "")
@@ -698,15 +707,34 @@ class gs_log_graph_edit_filters(TextCommand):
                 settings.set("git_savvy.log_graph_view.paths", [])
 
             hide_toast()
-            view.run_command("gs_log_graph_refresh", {"assume_complete_redraw": bool(text)})
+            view.run_command("gs_log_graph_refresh", {
+                # Keep the preview on screen while git computes the precise graph.
+                "assume_complete_redraw": bool(text) and not previewing
+            })
+
+        def on_change(text):
+            # type: (str) -> None
+            nonlocal previewing
+            if not original_graph:
+                return
+            preview = preview_filtered_graph(repo_path, original_graph, text)
+            if preview is None:
+                if not previewing:
+                    return
+                preview = original_graph
+            previewing = preview != original_graph
+            replace_graph_content(view, preview)
 
         def on_cancel():
+            if previewing:
+                replace_graph_content(view, original_graph)
             enqueue_on_worker(hide_toast)
 
         input_panel = show_single_line_input_panel(
             "additional args",
             filters,
             on_done,
+            on_change=on_change,
             on_cancel=on_cancel,
             select_text=True
         )
@@ -732,6 +760,45 @@ class gs_log_graph_edit_filters(TextCommand):
         return ""
 
 
+def preview_filtered_graph(repo_path, graph, filters):
+    # type: (str, str, str) -> Optional[str]
+    """Filter the already drawn `graph` using the commit index.
+
+    Return `None` if the index is not ready yet, does not know all the
+    commits, or cannot answer `filters`.
+    """
+    index = get_index(repo_path)
+    if index is None:
+        return None
+    if not filters.strip():
+        return graph
+    predicate = compile_filters(filters)
+    if predicate is None:
+        return None
+
+    lines = []
+    for line in graph.splitlines(keepends=True):
+        match = COMMIT_LINE.match(line)
+        if not match:
+            continue
+        entry = index.lookup(ShortHash(match.group("commit_hash")))
+        if entry is None:
+            # E.g. a commit fetched after the index got updated.
+            return None
+        if predicate(entry):
+            lines.append(line)
+    return "".join(lines) + "\n"
+
+
+def replace_graph_content(view, text):
+    # type: (sublime.View, str) -> None
+    try:
+        content_region = find_by_selector(view, "meta.content.git_savvy.graph")[0]
+    except IndexError:
+        return
+    replace_view_content(view, text, content_region)
+
+
 def index_of(seq, needle, default):
     # type: (Sequence[T], T, int) -> int
     try:
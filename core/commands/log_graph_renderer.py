@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from bisect import bisect_right
 from collections import deque
 from functools import lru_cache, partial
 from itertools import chain, groupby, islice
@@ -29,15 +30,17 @@ from typing import (
 )
 
 import sublime
+import sublime_plugin
 
 from .. import store, utils
 from ..base_commands import GsTextCommand
 from ..fns import filter_, pairwise, take
-from ..git_command import GitSavvyError
+from ..git_command import GitCommand, GitSavvyError
 from ..runtime import (
     enqueue_on_ui,
     enqueue_on_worker,
     run_and_check_timeout,
+    run_new_daemon_thread,
     run_on_new_thread,
     run_or_timeout,
     text_command,
@@ -47,6 +50,7 @@ from ..types import FullHash
 from ..ui__busy_spinner import start_busy_indicator, stop_busy_indicator
 from ..view import replace_view_content, visible_views
 from .log_graph import (
+    compute_identifier_for_view,
     get_simple_selection,
     just_set_cursor,
     navigate_to_symbol,
@@ -59,10 +63,21 @@ from .log_graph_helper import (
     GRAPH_HEIGHT,
     ROOT_NODE_CHAR,
 )
+from .log_graph_search import refresh_index
+from .log_graph_snapshots import (
+    compute_ref_fingerprint,
+    freeze,
+    is_fresh,
+    recall_snapshot,
+    remember_snapshot,
+)
 
 T = TypeVar("T")
 
-__all__ = ("gs_log_graph_refresh",)
+__all__ = (
+    "gs_log_graph_refresh",
+    "GsLogGraphForgetDrawnTips",
+)
 
 GIT_SUPPORTS_HUMAN_DATE_FORMAT = (2, 21, 0)
 FALLBACK_DATE_FORMAT = 'format:%Y-%m-%d %H:%M'
@@ -315,14 +330,152 @@ class PaintingStateMachine:
         self._current_state = other
 
 
+class DrawnTips(NamedTuple):
+    args: Tuple[Optional[str], ...]
+    tips: Dict[str, FullHash]
+
+
+drawn_tips = {}  # type: Dict[sublime.BufferId, DrawnTips]
+"""Remember the refs (and the git args) the last complete draw of a view used."""
+MAX_MOVED_REFS_FOR_INCREMENTAL_REFRESH = 20
+MAX_TIPS_FOR_INCREMENTAL_REFRESH = 1000
 caret_styles = {}  # type: Dict[sublime.View, str]
 block_caret_statuses = {}  # type: Dict[sublime.View, bool]
 drawn_graph_statuses = {}  # type: Dict[sublime.View, bool]
 head_commit_seen = {}  # type: Dict[sublime.View, bool]
+
 LEFT_COLUMN_WIDTH = 82
 SHOW_ALL_DECORATED_COMMITS = False
 
 
+def split_up_line(line):
+    # type: (str) -> Union[str, GraphLine]
+    try:
+        return GraphLine(*line.rstrip().split("%00"))
+    except TypeError:
+        return line
+
+
+class IncrementalUpdate(NamedTuple):
+    new_lines: List[GraphLine]  # to put on top, newest first
+    updated_lines: Dict[int, GraphLine]  # re-read lines by row
+
+
+def compute_incremental_update(
+    git,  # type: GitCommand
+    args,  # type: List[Optional[str]]
+    graph_lines,  # type: List[str]
+    previous,  # type: Optional[DrawnTips]
+    tips,  # type: Dict[str, FullHash]
+    got_proc=None,  # type: Optional[Callable[[subprocess.Popen], None]]
+):
+    # type: (...) -> Optional[IncrementalUpdate]
+    """Compute the next graph by only asking git for the new commits.
+
+    This works if all refs have been fast-forwarded and the new commits
+    form a straight line on top of the first line of `graph_lines`, the
+    graph we drew for `previous`.  Commits whose decoration may have
+    changed are read again.  Return `None` whenever we must fall back to
+    a full redraw.
+    """
+    if not graph_lines or not previous or previous.args != tuple(args):
+        return None
+    old_tips = previous.tips
+    if len(old_tips) > MAX_TIPS_FOR_INCREMENTAL_REFRESH:
+        return None
+
+    changed_refs = {
+        ref for ref in tips.keys() | old_tips.keys()
+        if tips.get(ref) != old_tips.get(ref)
+    }
+    if any(ref not in tips for ref in changed_refs):
+        # Deleted refs can make whole branches disappear.
+        return None
+    moved_refs = [ref for ref in changed_refs if ref in old_tips]
+    if len(moved_refs) > MAX_MOVED_REFS_FOR_INCREMENTAL_REFRESH:
+        return None
+    if not all(
+        git.is_ancestor_of(old_tips[ref], tips[ref])
+        for ref in moved_refs
+    ):
+        return None
+
+    lines_by_hash = {}  # type: Dict[str, int]
+    for row, text in enumerate(graph_lines):
+        match = COMMIT_LINE.match(text)
+        if match:
+            lines_by_hash[match.group("commit_hash")] = row
+    if not lines_by_hash:
+        return None
+    hash_lengths = {len(h) for h in lines_by_hash}
+
+    def find_line(full_hash):
+        # type: (str) -> Optional[int]
+        for length in hash_lengths:
+            row = lines_by_hash.get(full_hash[:length])
+            if row is not None:
+                return row
+        return None
+
+    new_lines = []  # type: List[GraphLine]
+    if changed_refs:
+        top_line = COMMIT_LINE.match(graph_lines[0])
+        expected_parent = top_line.group("commit_hash") if top_line else None
+        for new_line in reversed(list(map(split_up_line, git.git_streaming(
+            *args, "--not", *sorted(set(old_tips.values())),
+            got_proc=got_proc
+        )))):
+            if (
+                not top_line
+                or top_line.start("commit_hash") != 2
+                or isinstance(new_line, str)
+                or new_line.parents != expected_parent
+                or not new_line.hash.startswith("* ")
+                or " " in new_line.hash[2:]
+            ):
+                return None
+            expected_parent = new_line.hash[2:]
+            if expected_parent in lines_by_hash:
+                return None
+            new_lines.insert(0, new_line)
+
+    new_hashes = {new_line.hash[2:] for new_line in new_lines}
+    affected_lines = {
+        found
+        for full_hash in chain(
+            (old_tips[ref] for ref in moved_refs),
+            (tips[ref] for ref in changed_refs),
+            (tips.get("HEAD", ""), old_tips.get("HEAD", "")),
+        )
+        if full_hash and full_hash[:min(hash_lengths)] not in new_hashes
+        if (found := find_line(full_hash)) is not None
+    }
+    updated_lines = {}  # type: Dict[int, GraphLine]
+    if affected_lines:
+        graph_art = {}  # type: Dict[str, str]
+        for row in sorted(affected_lines):
+            match = COMMIT_LINE.match(graph_lines[row])
+            assert match
+            graph_art[match.group("commit_hash")] = graph_lines[row][:match.start("commit_hash")]
+        for commit_line in map(split_up_line, git.git_streaming(
+            "log",
+            "--no-walk=unsorted",
+            *[
+                arg for arg in args
+                if arg and arg.startswith(("--decorate", "--date=", "--format="))
+            ],
+            *graph_art,
+            got_proc=got_proc
+        )):
+            if isinstance(commit_line, str) or commit_line.hash not in graph_art:
+                return None
+            updated_lines[lines_by_hash[commit_line.hash]] = commit_line._replace(
+                hash=graph_art[commit_line.hash] + commit_line.hash
+            )
+
+    return IncrementalUpdate(new_lines, updated_lines)
+
+
 def set_caret_style(view, caret_style="smooth"):
     # type: (sublime.View, str) -> None
     start_busy_indicator(view)
@@ -432,6 +585,13 @@ def resolve_commit_to_follow_after_rebase(self, commitish):
         settings.set("git_savvy.log_graph_view.follow", to_follow)
 
 
+class GsLogGraphForgetDrawnTips(sublime_plugin.EventListener):
+    def on_pre_close(self, view):
+        # type: (sublime.View) -> None
+        if view.settings().get("git_savvy.log_graph_view") and not view.clones():
+            drawn_tips.pop(view.buffer_id(), None)
+
+
 class gs_log_graph_refresh(GsTextCommand):
 
     """
@@ -452,7 +612,16 @@ class gs_log_graph_refresh(GsTextCommand):
 
         initial_draw = self.view.size() == 0
         prelude_text = prelude(self.view)
-        if initial_draw or assume_complete_redraw:
+        if (
+            initial_draw
+            and not assume_complete_redraw
+            and (snapshot := recall_snapshot(snapshot_key(self.view)))
+            and is_fresh(snapshot, self.repo_path)
+        ):
+            # Warm start: paint what we drew the last time for the same
+            # graph and refs and let the diff below reconcile it.
+            replace_view_content(self.view, prelude_text + snapshot.text)
+        elif initial_draw or assume_complete_redraw:
             prelude_region = (
                 None
                 if initial_draw else
@@ -489,12 +658,14 @@ class gs_log_graph_refresh(GsTextCommand):
                 self.view.find_by_selector('meta.content.git_savvy.graph')[0]
             ) if not assume_complete_redraw else ""
         except IndexError:
+            current_graph = ""
             current_graph_splitted = []
         else:
             current_graph_splitted = current_graph.splitlines(keepends=True)
 
         token_queue = SimpleFiniteQueue()  # type: SimpleFiniteQueue[Replace]
         current_proc = None
+        next_tips = {}  # type: Dict[str, FullHash]
         graph_offset = len(prelude_text)
 
         def remember_proc(proc):
@@ -510,13 +681,6 @@ class gs_log_graph_refresh(GsTextCommand):
                     return fn(*args, **kwargs)
             return decorated
 
-        def split_up_line(line):
-            # type: (str) -> Union[str, GraphLine]
-            try:
-                return GraphLine(*line.rstrip().split("%00"))
-            except TypeError:
-                return line
-
         def line_matches(needle, line):
             # type: (str, Union[str, GraphLine]) -> bool
             if isinstance(line, str):
@@ -620,22 +784,17 @@ class gs_log_graph_refresh(GsTextCommand):
                     else settings.get("git_savvy.log_graph_view.branches", [])
                 )
             ))
-            requested_refs = re.findall(r"\S+@{\d+}", additional_args)
-            return {
-                commit_hash: ref
-
-                for branch_name, refs in groupby(
-                    sorted(requested_refs),
-                    key=lambda ref: ref.split("@")[0]
-                )
-                if (wanted_refs := list(refs))
-
-                for n, commit_hash in enumerate(reversed([
-                    self.to_short_hash(FullHash(line.split(maxsplit=2)[1]))
-                    for line in self._read_git_file("logs", "refs", "heads", branch_name).splitlines()
-                ]))
-                if (ref := f"{branch_name}@{{{n}}}") in wanted_refs
-            }
+            requested_refs = re.findall(r"(\S+)@{(\d+)}", additional_args)
+            rv = {}  # type: Dict[str, str]
+            for branch_name, refs in groupby(sorted(requested_refs), key=lambda ref: ref[0]):
+                wanted = sorted({int(n) for _, n in refs})
+                entries = self.read_reflog(f"refs/heads/{branch_name}", limit=wanted[-1] + 1)
+                if not entries:
+                    continue
+                for n in wanted:
+                    if n < len(entries):
+                        rv[self.to_short_hash(entries[n].new_hash)] = f"{branch_name}@{{{n}}}"
+            return rv
 
         ASCII_ART_LENGHT_LIMIT = 48
         SHORTENED_ASCII_ART = ".. / \n"
@@ -739,8 +898,72 @@ class gs_log_graph_refresh(GsTextCommand):
         def indicate_slow_progress():
             set_caret_style(self.view)
 
+        def try_incremental_update(args, tips):
+            # type: (List[Optional[str]], Dict[str, FullHash]) -> Optional[List[str]]
+            """Compute the next graph by only asking git for the new commits.
+
+            This works if all refs have been fast-forwarded and the new commits
+            form a straight line on top of the first line we already show.
+            Return `None` whenever we must fall back to a full redraw.
+            """
+            follow = settings.get('git_savvy.log_graph_view.follow')
+            if (
+                initial_draw
+                or assume_complete_redraw
+                or in_overview_mode
+                or additional_decorations
+                or not current_graph_splitted
+                or (
+                    settings.get("git_savvy.log_graph_view.apply_filters")
+                    and (
+                        settings.get("git_savvy.log_graph_view.filters")
+                        or settings.get("git_savvy.log_graph_view.paths")
+                    )
+                )
+                or (follow and follow != "HEAD" and follow not in current_graph)
+            ):
+                return None
+
+            update = compute_incremental_update(
+                self,
+                args,
+                current_graph_splitted,
+                drawn_tips.get(self.view.buffer_id()),
+                tips,
+                got_proc=remember_proc
+            )
+            if update is None:
+                return None
+            return (
+                [format_line(new_line) for new_line in update.new_lines]
+                + [
+                    format_line(update.updated_lines[row]) if row in update.updated_lines else text
+                    for row, text in enumerate(current_graph_splitted)
+                ]
+            )
+
         def reader():
-            graph = self.read_graph(got_proc=remember_proc)
+            nonlocal next_tips
+            args = self.build_git_command()
+            next_tips = self.read_ref_tips()
+            refresh_index(self, next_tips)
+            try:
+                incremental_graph = try_incremental_update(args, next_tips)
+            except GitSavvyError:
+                incremental_graph = None
+            if should_abort():
+                return
+            if incremental_graph is not None:
+                tokens = normalize_tokens(simplify(
+                    diff(current_graph_splitted, incremental_graph),
+                    max_size=100
+                ))
+                tokens = wait_for_first_item(tokens)
+                enqueue_on_ui(draw)
+                token_queue.consume(tokens)
+                return
+
+            graph = self.read_graph(args, got_proc=remember_proc)
             if (
                 initial_draw
                 and settings.get('git_savvy.log_graph_view.decoration') == 'sparse'
@@ -902,6 +1125,10 @@ class gs_log_graph_refresh(GsTextCommand):
             reset_block_caret(view)
             reset_caret_style(view)
             enqueue_on_worker(view.clear_undo_stack)
+            drawn_tips[view.buffer_id()] = DrawnTips(tuple(self.build_git_command()), next_tips)
+            enqueue_on_worker(
+                remember_graph_snapshot, self.repo_path, snapshot_key(view), current_graph_splitted
+            )
 
         def apply_token(view, token, offset):
             # type: (sublime.View, Replace, int) -> sublime.Region
@@ -925,9 +1152,10 @@ class gs_log_graph_refresh(GsTextCommand):
 
         run_on_new_thread(reader)
 
-    def read_graph(self, got_proc=None):
-        # type: (Callable[[subprocess.Popen], None]) -> Iterator[str]
-        args = self.build_git_command()
+    def read_graph(self, args=None, got_proc=None):
+        # type: (List[Optional[str]], Callable[[subprocess.Popen], None]) -> Iterator[str]
+        if args is None:
+            args = self.build_git_command()
         yield from self.git_streaming(*args, got_proc=got_proc)
 
     def build_git_command(self):
@@ -1013,6 +1241,17 @@ class gs_log_graph_refresh(GsTextCommand):
         return args
 
 
+def remember_graph_snapshot(repo_path, key, lines):
+    # type: (str, Optional[Tuple], List[str]) -> None
+    # Joining and fingerprinting the whole graph is too slow for the UI thread.
+    remember_snapshot(key, compute_ref_fingerprint(repo_path), "".join(lines))
+
+
+def snapshot_key(view):
+    # type: (sublime.View) -> Optional[Tuple]
+    return freeze(compute_identifier_for_view(view))
+
+
 def prelude(view):
     # type: (sublime.View) -> str
     settings = view.settings()
@@ -1087,61 +1326,99 @@ def is_sel_in_viewport(view):
 
 
 # The following are basically unicode aware len(text) variants.
-# `text_width` and `trunc_and_pad` duplicate code.  We found no
-# zero-cost abstraction. In perf benchmarking I found an iterator
-# variant to be 20% slower.  Calling a `char_width` function in a
-# loop was even worse.  So we life with the following.
+# Display widths of all codepoints below `WIDTH_TABLE_END` are
+# precomputed into a table of ranges (`starts`, `widths`) which
+# we `bisect`.  The table is built once on a background thread when
+# this module loads; the rules live in `char_width` and are only
+# used for building the table and for the few codepoints above it.
+# The ASCII cases short-circuit before touching the memo because
+# hashing long ASCII strings is slower than just counting them.
 
+WIDTH_TABLE_END = 0x40000
+TEXT_WIDTH_MEMO_SIZE = 4096
 
-def text_width(
-    text: str,
+
+def char_width(
+    codepoint: int,
     _combining=unicodedata.combining,
     _east_asian_width=unicodedata.east_asian_width,
     _category=unicodedata.category
 ) -> int:
+    """Compute terminal-ish display width of a single codepoint.
+
+    - combining / format / modifiers / joiners / variation selectors: 0
+    - East Asian wide/full-width: 2
+    - everything else: 1
+    """
+    if codepoint < 0x80:
+        return 1
+    char = chr(codepoint)
+    if _combining(char):
+        return 0
+    elif 0x1F3FB <= codepoint <= 0x1F3FF:
+        return 0
+    elif _east_asian_width(char) in ('W', 'F'):
+        return 2
+    elif (
+        codepoint == 0x200D                 # ZWJ
+        or codepoint == 0x200C              # ZWNJ
+        or 0xFE00 <= codepoint <= 0xFE0F    # variation selectors (VS1..VS16)
+        or 0xE0100 <= codepoint <= 0xE01EF  # variation selectors supplement
+        or (
+            (
+                0x0600 <= codepoint <= 0x06FF
+                or codepoint == 0x180E
+                or 0x2000 <= codepoint <= 0x206F
+                or codepoint == 0xFEFF
+                or 0xFFF0 <= codepoint <= 0xFFFF
+            )
+            and _category(char) == 'Cf'
+        )
+    ):
+        return 0
+    else:
+        return 1
+
+
+@lru_cache(1)
+def width_table() -> Tuple[List[int], bytes]:
+    starts = []  # type: List[int]
+    widths = bytearray()
+    previous = None
+    for codepoint in range(0x80, WIDTH_TABLE_END):
+        width = char_width(codepoint)
+        if width != previous:
+            starts.append(codepoint)
+            widths.append(width)
+            previous = width
+    return starts, bytes(widths)
+
+
+run_new_daemon_thread(width_table)
+
+
+def text_width(text: str) -> int:
     if text.isascii():
         return len(text)
+    return _text_width(text)
+
 
+@lru_cache(TEXT_WIDTH_MEMO_SIZE)
+def _text_width(text: str, _bisect=bisect_right) -> int:
+    starts, widths = width_table()
     width = 0
     for char in text:
         codepoint = ord(char)
         if codepoint < 0x80:
             width += 1
-        elif _combining(char):
-            continue
-        elif 0x1F3FB <= codepoint <= 0x1F3FF:
-            continue
-        elif _east_asian_width(char) in ('W', 'F'):
-            width += 2
-        elif (
-            codepoint == 0x200D                 # ZWJ
-            or codepoint == 0x200C              # ZWNJ
-            or 0xFE00 <= codepoint <= 0xFE0F    # variation selectors (VS1..VS16)
-            or 0xE0100 <= codepoint <= 0xE01EF  # variation selectors supplement
-            or (
-                (
-                    0x0600 <= codepoint <= 0x06FF
-                    or codepoint == 0x180E
-                    or 0x2000 <= codepoint <= 0x206F
-                    or codepoint == 0xFEFF
-                    or 0xFFF0 <= codepoint <= 0xFFFF
-                )
-                and _category(char) == 'Cf'
-            )
-        ):
-            continue
+        elif codepoint < WIDTH_TABLE_END:
+            width += widths[_bisect(starts, codepoint) - 1]
         else:
-            width += 1
+            width += char_width(codepoint)
     return width
 
 
-def trunc_and_pad(
-    text: str,
-    width: int,
-    _combining=unicodedata.combining,
-    _east_asian_width=unicodedata.east_asian_width,
-    _category=unicodedata.category
-) -> str:
+def trunc_and_pad(text: str, width: int) -> str:
     if width <= 0:
         return ''
 
@@ -1152,6 +1429,12 @@ def trunc_and_pad(
             return f"{text[:width - 2]}.."
         return f"{text:{width}}"
 
+    return _trunc_and_pad(text, width)
+
+
+@lru_cache(TEXT_WIDTH_MEMO_SIZE)
+def _trunc_and_pad(text: str, width: int, _bisect=bisect_right) -> str:
+    starts, widths = width_table()
     target = max(0, width - 2)
     text_width_ = 0
     trunc_idx = len(text)
@@ -1159,38 +1442,12 @@ def trunc_and_pad(
     target_width = 0
     for idx, char in enumerate(text):
         codepoint = ord(char)
-
-        # Fast-path ASCII and then apply terminal-ish display width rules:
-        # - combining / format / modifiers / joiners / variation selectors: 0
-        # - East Asian wide/full-width: 2
-        # - everything else: 1
         if codepoint < 0x80:
             char_width_ = 1
-        elif _combining(char):
-            char_width_ = 0
-        elif 0x1F3FB <= codepoint <= 0x1F3FF:
-            char_width_ = 0
-        elif _east_asian_width(char) in ('W', 'F'):
-            char_width_ = 2
-        elif (
-            codepoint == 0x200D                 # ZWJ
-            or codepoint == 0x200C              # ZWNJ
-            or 0xFE00 <= codepoint <= 0xFE0F    # variation selectors (VS1..VS16)
-            or 0xE0100 <= codepoint <= 0xE01EF  # variation selectors supplement
-            or (
-                (
-                    0x0600 <= codepoint <= 0x06FF
-                    or codepoint == 0x180E
-                    or 0x2000 <= codepoint <= 0x206F
-                    or codepoint == 0xFEFF
-                    or 0xFFF0 <= codepoint <= 0xFFFF
-                )
-                and _category(char) == 'Cf'
-            )
-        ):
-            char_width_ = 0
+        elif codepoint < WIDTH_TABLE_END:
+            char_width_ = widths[_bisect(starts, codepoint) - 1]
         else:
-            char_width_ = 1
+            char_width_ = char_width(codepoint)
 
         # Remember the longest prefix that still leaves room for '..'.
         if text_width_ + char_width_ <= target:
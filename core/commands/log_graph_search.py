@@ -0,0 +1,238 @@
+"""In-memory commit index to preview graph filters while typing.
+
+For every repo we index hash, subject, author and committer date of
+the most recent commits.  The index is built in the background the
+first time the user edits the filters of a graph.  After that, every
+graph refresh which sees the refs moved updates it incrementally.  It
+can answer a subset of `git log`'s filters (`--author`, `--grep`, `-i`,
+`--since`, ...) which is enough to filter the graph we already show
+while the user types.  The precise `git log` runs when the user
+confirms the filter.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+import re
+import shlex
+import threading
+
+from ..git_command import GitCommand, GitSavvyError
+from ..runtime import run_on_new_thread
+from ..types import FullHash, ShortHash
+
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+__all__ = (
+    "ensure_index",
+    "refresh_index",
+    "get_index",
+    "compile_filters",
+)
+
+MAX_INDEXED_COMMITS = 200_000
+FORMAT = "%H%x00%ct%x00%an <%ae>%x00%s"
+
+
+class IndexEntry(NamedTuple):
+    commit_hash: FullHash
+    committer_date: int
+    author: str
+    subject: str
+
+
+class CommitIndex:
+    def __init__(self) -> None:
+        # Keyed by the full hash as the abbreviations git prints grow
+        # with the repo.  The graph's short hashes are looked up by prefix.
+        self.entries: Dict[FullHash, IndexEntry] = {}
+        self.sorted_hashes: List[FullHash] = []
+        self.tips: Dict[str, FullHash] = {}
+        self.ready = False
+
+    def update(self, git: GitCommand) -> None:
+        tips = git.read_ref_tips()
+        if self.ready and tips == self.tips:
+            return
+
+        args = [
+            "log",
+            f"--format={FORMAT}",
+            f"--max-count={MAX_INDEXED_COMMITS}",
+            "--all",
+            "--exclude=refs/stash",
+        ]
+        if self.ready and self.tips:
+            args += ["--not", *sorted(set(self.tips.values()))]
+
+        for line in git.git_streaming(*args, show_panel_on_error=False):
+            try:
+                commit_hash, committer_date, author, subject = line.rstrip("\n").split("\x00")
+            except ValueError:
+                continue
+            self.entries[FullHash(commit_hash)] = IndexEntry(
+                FullHash(commit_hash),
+                int(committer_date),
+                author,
+                subject,
+            )
+
+        self.sorted_hashes = sorted(self.entries)
+        self.tips = tips
+        self.ready = True
+
+    def lookup(self, short_hash: ShortHash) -> Optional[IndexEntry]:
+        """Return the entry of the commit `short_hash` abbreviates, if unambiguous."""
+        hashes = self.sorted_hashes
+        idx = bisect_left(hashes, short_hash)
+        if idx == len(hashes) or not hashes[idx].startswith(short_hash):
+            return None
+        if idx + 1 < len(hashes) and hashes[idx + 1].startswith(short_hash):
+            return None
+        return self.entries[hashes[idx]]
+
+
+indexes: Dict[str, CommitIndex] = {}
+updating: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def get_index(repo_path: str) -> Optional[CommitIndex]:
+    """Return the index for `repo_path` if it is ready to be queried."""
+    index = indexes.get(repo_path)
+    return index if index and index.ready else None
+
+
+def ensure_index(git: GitCommand) -> None:
+    """Build or update the index for the repo of `git` in the background."""
+    repo_path = git.repo_path
+    run_on_new_thread(_update_index, git, repo_path)
+
+
+def refresh_index(git: GitCommand, tips: Dict[str, FullHash]) -> None:
+    """Update the index of the repo of `git`, if it has one, unless it knows `tips` already."""
+    index = indexes.get(git.repo_path)
+    if index is not None and index.tips != tips:
+        ensure_index(git)
+
+
+def _update_index(git: GitCommand, repo_path: str) -> None:
+    lock = updating[repo_path]
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        # Update a copy so that readers never see a half-updated index.
+        previous = indexes.get(repo_path)
+        index = CommitIndex()
+        if previous:
+            index.entries = previous.entries.copy()
+            index.sorted_hashes = previous.sorted_hashes
+            index.tips = previous.tips
+            index.ready = previous.ready
+        try:
+            index.update(git)
+        except GitSavvyError:
+            return
+        indexes[repo_path] = index
+    finally:
+        lock.release()
+
+
+Predicate = Callable[[IndexEntry], bool]
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+FLAGS_WITH_VALUE = {"--author", "--grep", "--since", "--after", "--until", "--before"}
+
+
+def compile_filters(filters: str) -> Optional[Predicate]:
+    """Compile `git log` filter args into a predicate over `IndexEntry`s.
+
+    Return `None` if the filters contain anything the index cannot answer,
+    e.g. pickaxes, paths, revisions, or dates we don't understand.  Note
+    that `--grep` only looks at the subject here.
+    """
+    try:
+        args = shlex.split(filters)
+    except ValueError:
+        return None
+
+    authors: List[str] = []
+    greps: List[str] = []
+    since: Optional[int] = None
+    until: Optional[int] = None
+    ignore_case = fixed_strings = all_match = invert_grep = False
+
+    pending = iter(args)
+    for arg in pending:
+        if arg in FLAGS_WITH_VALUE:
+            value = next(pending, None)
+            if value is None:
+                return None
+            flag = arg
+        elif "=" in arg and arg.split("=", 1)[0] in FLAGS_WITH_VALUE:
+            flag, value = arg.split("=", 1)
+        elif arg in ("-i", "--regexp-ignore-case"):
+            ignore_case = True
+            continue
+        elif arg in ("-F", "--fixed-strings"):
+            fixed_strings = True
+            continue
+        elif arg == "--all-match":
+            all_match = True
+            continue
+        elif arg == "--invert-grep":
+            invert_grep = True
+            continue
+        else:
+            return None
+
+        if flag == "--author":
+            authors.append(value)
+        elif flag == "--grep":
+            greps.append(value)
+        else:
+            timestamp = parse_date(value)
+            if timestamp is None:
+                return None
+            if flag in ("--since", "--after"):
+                since = timestamp
+            else:
+                until = timestamp
+
+    re_flags = re.IGNORECASE if ignore_case else 0
+    try:
+        author_patterns = [
+            re.compile(re.escape(a) if fixed_strings else a, re_flags) for a in authors
+        ]
+        grep_patterns = [
+            re.compile(re.escape(g) if fixed_strings else g, re_flags) for g in greps
+        ]
+    except re.error:
+        return None
+
+    def predicate(entry: IndexEntry) -> bool:
+        if author_patterns and not any(p.search(entry.author) for p in author_patterns):
+            return False
+        if since is not None and entry.committer_date < since:
+            return False
+        if until is not None and entry.committer_date > until:
+            return False
+        if grep_patterns:
+            matches = (
+                all(p.search(entry.subject) for p in grep_patterns)
+                if all_match
+                else any(p.search(entry.subject) for p in grep_patterns)
+            )
+            if matches == invert_grep:
+                return False
+        return True
+
+    return predicate
+
+
+def parse_date(value: str) -> Optional[int]:
+    for fmt in DATE_FORMATS:
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,107 @@
+"""Remember the last drawn graph per graph configuration.
+
+A fresh graph view starts empty and has to wait for git's first
+byte which can take seconds on big repos, especially with `--all`.
+Instead, we paint the text we drew the last time for the same
+(repo, branches, filters, overview) combination, if the refs did not
+move since, and let the normal refresh reconcile it using its
+diff/token pipeline.
+"""
+from __future__ import annotations
+import threading
+
+from .. import store
+from ..caches import Cache
+
+from typing import Hashable, NamedTuple, Optional
+
+
+__all__ = (
+    "remember_snapshot",
+    "recall_snapshot",
+    "compute_ref_fingerprint",
+    "freeze",
+    "is_fresh",
+)
+
+MAX_SNAPSHOTS = 16
+MAX_SNAPSHOT_SIZE = 2_000_000   # characters, per snapshot
+MAX_TOTAL_SIZE = 10_000_000     # characters, over all snapshots
+
+
+class Snapshot(NamedTuple):
+    fingerprint: Optional[int]
+    text: str
+
+
+class SnapshotCache(Cache):
+    """LRU which additionally caps the summed size of all snapshots."""
+    def __init__(self, maxsize=MAX_SNAPSHOTS, max_total_size=MAX_TOTAL_SIZE):
+        self.max_total_size = max_total_size
+        super().__init__(maxsize)
+
+    def __setitem__(self, key, value):
+        # type: (Hashable, Snapshot) -> None
+        super().__setitem__(key, value)
+        while len(self) > 1 and self.total_size() > self.max_total_size:
+            self.popitem(last=False)
+
+    def total_size(self):
+        # type: () -> int
+        return sum(len(snapshot.text) for snapshot in self.values())
+
+
+snapshots = SnapshotCache()
+lock = threading.Lock()
+
+
+def freeze(value):
+    """Turn (nested) lists into tuples so that the value can be used as a key."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def compute_ref_fingerprint(repo_path):
+    # type: (str) -> Optional[int]
+    """Compute a cheap fingerprint of the refs from what we have in the store.
+
+    Return `None` if we don't know enough about the repo yet.
+    """
+    state = store.current_state(repo_path)
+    head = state.get("head")
+    branches = state.get("branches")
+    if head is None or branches is None:
+        return None
+    return hash((
+        head.detached,
+        head.branch,
+        tuple(sorted((b.canonical_name, b.commit_hash) for b in branches)),
+    ))
+
+
+def remember_snapshot(key, fingerprint, text):
+    # type: (Hashable, Optional[int], str) -> None
+    if key is None:
+        return
+    with lock:
+        if len(text) > MAX_SNAPSHOT_SIZE:
+            if key in snapshots:
+                del snapshots[key]
+            return
+        snapshots[key] = Snapshot(fingerprint, text)
+
+
+def recall_snapshot(key):
+    # type: (Hashable) -> Optional[Snapshot]
+    with lock:
+        try:
+            return snapshots[key]
+        except KeyError:
+            return None
+
+
+def is_fresh(snapshot, repo_path):
+    # type: (Snapshot, str) -> bool
+    fingerprint = compute_ref_fingerprint(repo_path)
+    return fingerprint is not None and fingerprint == snapshot.fingerprint
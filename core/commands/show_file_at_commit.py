@@ -627,7 +627,7 @@ class gs_show_file_at_commit_open_log(GsTextCommand):
         except ValueError:
             branch_hint = self.initial_commit
 
-        entries = self.log_generator(
+        entries = self.iter_log(
             file_path=file_path,
             branch=branch_hint,
             follow=True,
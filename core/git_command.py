@@ -33,8 +33,8 @@ from GitSavvy.core.types import FullPath, ShortPath
 
 
 from typing import (
-    Any, Callable, Deque, Dict, IO, Iterable, Iterator, List, Optional, Sequence,
-    Tuple, TypeVar, Union)
+    Any, Callable, Deque, Dict, Generator, IO, Iterable, Iterator, List, Optional,
+    Sequence, Tuple, TypeVar, Union)
 T = TypeVar("T")
 
 
@@ -199,7 +199,7 @@ def _group_bytes_to_lines(bytewise: Iterator[bytes]) -> Iterator[bytes]:
 
 
 def log_git_runtime(fn):
-    # type: (Callable[..., Iterator[T]]) -> Callable[..., Iterator[T]]
+    # type: (Callable[..., Iterator[T]]) -> Callable[..., Generator[T, None, None]]
     """A specialized log decorator for `git_streaming`."""
     def decorated(self, *args, **kwargs):
         start_time = time.perf_counter()
@@ -521,7 +521,7 @@ class _GitCommand(SettingsMixin):
 
     @log_git_runtime
     def git_streaming(self, *args, show_panel_on_error=True, throw_on_error=True, got_proc=None, **kwargs):
-        # type: (...) -> Iterator[str]
+        # type: (...) -> Generator[str, None, None]
         decode = partial(self.lax_decode_, self.get_encoding_candidates())
         proc = self.git(*args, just_the_proc=True, **kwargs)
         if got_proc:
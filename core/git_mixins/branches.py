@@ -2,19 +2,22 @@ from __future__ import annotations
 import re
 
 from GitSavvy.core.git_command import mixin_base, NOT_SET
-from GitSavvy.core.fns import filter_
+from GitSavvy.core.fns import chunked, filter_
 from GitSavvy.core.exceptions import GitSavvyError
-from GitSavvy.core.caches import cache_in_store_as
+from GitSavvy.core.caches import Cache, cache_in_store_as
+from GitSavvy.core.ref_reader import read_head
 from GitSavvy.core.utils import hprint, measure_runtime, yes_no_switch
 from GitSavvy.core.runtime import run_on_new_thread
 from GitSavvy.core.types import FullHash
 
-from typing import Dict, List, NamedTuple, Optional, Sequence
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 
 BRANCH_DESCRIPTION_RE = re.compile(r"^branch\.(.*?)\.description (.*)$")
 FOR_EACH_REF_SUPPORTS_AHEAD_BEHIND = (2, 41, 0)
 FOR_EACH_REF_SUPPORTS_WORKTREEPATH = (2, 23, 0)
+ALL_BRANCHES = ["refs/heads", "refs/remotes"]
+DISTANCES_BATCH_SIZE = 50
 
 
 class Upstream(NamedTuple):
@@ -51,6 +54,27 @@ class Branch(NamedTuple):
         return not self.is_remote
 
 
+# In slow repos, we list the branches without computing their distances
+# and fill them in later.  The ahead/behind counts are keyed by
+# `(branch tip, HEAD)`, the upstream status by `(branch tip, upstream tip)`;
+# both only depend on these commits and survive re-listing the branches.
+distance_cache = Cache(maxsize=4096)  # type: Dict[Tuple[str, str], AheadBehind]
+tracking_cache = Cache(maxsize=4096)  # type: Dict[Tuple[str, str], str]
+# The latest listing per repo that is still being completed.  A newer
+# listing supersedes it and the older background job stops early.
+pending_listings = {}  # type: Dict[str, object]
+
+
+def refname_of(branch):
+    # type: (Branch) -> str
+    return ("refs/remotes/" if branch.is_remote else "refs/heads/") + branch.canonical_name
+
+
+def upstream_refname_of(upstream):
+    # type: (Upstream) -> str
+    return ("refs/heads/" if upstream.remote == "." else "refs/remotes/") + upstream.canonical_name
+
+
 class BranchesMixin(mixin_base):
 
     def get_current_branch(self):
@@ -88,6 +112,12 @@ class BranchesMixin(mixin_base):
         """
         Return the name of the current branch.
         """
+        head = read_head(self.git_dir, self.git_common_dir)
+        if head is not None:
+            if head.symref and head.symref.startswith("refs/heads/") and head.commit:
+                return head.symref[len("refs/heads/"):]
+            return None
+
         branch = self.get_current_branch()
         if branch:
             return branch.name
@@ -126,7 +156,11 @@ class BranchesMixin(mixin_base):
         """
         supports_worktreepath = self.git_version >= FOR_EACH_REF_SUPPORTS_WORKTREEPATH
 
-        def get_branches__(probe_speed: bool, supports_ahead_behind: bool) -> List[Branch]:
+        def get_branches__(
+            probe_speed: bool,
+            supports_ahead_behind: bool,
+            defer_distances: bool = False
+        ) -> List[Branch]:
             WAIT_TIME = 200  # [ms]
             try:
                 stdout: str = self.git_throwing_silently(
@@ -137,7 +171,7 @@ class BranchesMixin(mixin_base):
                             "%(refname)",
                             "%(upstream)",
                             "%(upstream:remotename)",
-                            "%(upstream:track,nobracket)",
+                            "%(upstream:track,nobracket)" if not defer_distances else "",
                             "%(committerdate:unix)",
                             "%(committerdate:human)",
                             "%(committerdate:relative)",
@@ -183,7 +217,7 @@ class BranchesMixin(mixin_base):
                         self.update_store({"slow_repo": True if not ok else False})
 
                     run_on_new_thread(run_commit_graph_write)
-                    return get_branches__(False, False)
+                    return get_branches__(False, False, can_defer_distances)
 
                 if "fatal: failed to find 'HEAD'" in e.stderr and supports_ahead_behind:
                     return get_branches__(False, False)
@@ -207,20 +241,158 @@ class BranchesMixin(mixin_base):
                 elif merged is False:
                     branches = [b for b in branches if b.distance_to_head.ahead > 0]  # type: ignore[union-attr]
 
+            elif defer_distances:
+                branches = self._with_known_distances(branches, with_tracking=True)
+                self._cache_branches(branches, refs)
+                if any(b.distance_to_head is None for b in branches):
+                    token = pending_listings[self.repo_path] = object()
+                    run_on_new_thread(self._fill_in_distances, branches, token)
+
             elif merged is None:
                 # For older git versions cache git's output only if it was not filtered by `merged`.
+                branches = self._with_known_distances(branches)
                 self._cache_branches(branches, refs)
 
             return branches
 
         slow_repo = self.current_state().get("slow_repo", None)
-        compute_ahead_behind = (
-            self.git_version >= FOR_EACH_REF_SUPPORTS_AHEAD_BEHIND
-            and not slow_repo
+        supports_ahead_behind = self.git_version >= FOR_EACH_REF_SUPPORTS_AHEAD_BEHIND
+        # Only the full, unfiltered listing, t.i. the one of the branches
+        # dashboard, is completed progressively.
+        can_defer_distances = (
+            supports_ahead_behind
+            and merged is None
+            and list(refs) == ALL_BRANCHES
         )
+        if slow_repo and can_defer_distances:
+            return get_branches__(False, False, True)
+        compute_ahead_behind = supports_ahead_behind and not slow_repo
         probe_speed = compute_ahead_behind and slow_repo is None
         return get_branches__(probe_speed, compute_ahead_behind)
 
+    def _with_known_distances(self, branches, with_tracking=False):
+        # type: (List[Branch], bool) -> List[Branch]
+        """
+        Fill in the distances to HEAD we already know from earlier runs.
+
+        If `with_tracking` is set, the upstream status is missing as well
+        and is taken from the cache, or set to "gone" if the upstream
+        ref doesn't exist.  It is only safe to do this for a listing of
+        all branches because only then we know all upstream tips.
+        """
+        head = next((b.commit_hash for b in branches if b.active), None)
+        tips = {refname_of(b): b.commit_hash for b in branches}
+
+        def complete(branch):
+            # type: (Branch) -> Branch
+            distance = (
+                branch.distance_to_head
+                or (distance_cache.get((branch.commit_hash, head)) if head else None)
+            )
+            upstream = branch.upstream
+            if with_tracking and upstream:
+                upstream_tip = tips.get(upstream_refname_of(upstream))
+                status = (
+                    tracking_cache.get((branch.commit_hash, upstream_tip))
+                    if upstream_tip else
+                    "gone"
+                )
+                if status is None:
+                    # Only report a distance if the branch is complete.
+                    return branch
+                upstream = upstream._replace(status=status)
+            return branch._replace(distance_to_head=distance, upstream=upstream)
+
+        return [complete(b) for b in branches]
+
+    def _fill_in_distances(self, branches, token):
+        # type: (List[Branch], object) -> None
+        """
+        Compute the missing ahead/behind counts and upstream states in
+        batches and merge each batch into the store as soon as it lands.
+        The active branch comes first, then the local branches from the
+        most recently to the least recently committed, then the remotes.
+        """
+        head_ = read_head(self.git_dir, self.git_common_dir)
+        if head_ is not None:
+            head = head_.commit
+        else:
+            try:
+                head = self.git_throwing_silently("rev-parse", "HEAD").strip()
+            except GitSavvyError:
+                head = None
+        if not head:
+            # An unborn branch has no distances anyway.
+            return
+
+        tips = {refname_of(b): b.commit_hash for b in branches}
+        pending = sorted(
+            (b for b in branches if b.distance_to_head is None),
+            key=lambda b: (not b.active, b.is_remote, -b.committerdate)
+        )
+        for batch in chunked(pending, DISTANCES_BATCH_SIZE):
+            if pending_listings.get(self.repo_path) is not token:
+                return
+            try:
+                computed = self._compute_distances(batch, head, tips)
+            except GitSavvyError as e:
+                hprint(f"Computing the distances of the branches raised: {e}")
+                return
+            if pending_listings.get(self.repo_path) is not token:
+                return
+            self._merge_distances_into_store(computed)
+
+        if pending_listings.get(self.repo_path) is token:
+            del pending_listings[self.repo_path]
+
+    def _compute_distances(self, branches, head, tips):
+        # type: (Iterable[Branch], str, Dict[str, FullHash]) -> Dict[Tuple[str, str], Tuple[AheadBehind, str]]
+        """
+        Return `(ahead/behind, upstream status)` for the given branches
+        keyed by `(refname, tip)`.  `head` must be a commit hash and `tips`
+        the tips of all branches by refname as the results get cached
+        per commit.
+        """
+        refnames = [refname_of(b) for b in branches]
+        stdout = self.git_throwing_silently(
+            "for-each-ref",
+            "--format={}".format("%00".join((
+                "%(refname)",
+                "%(objectname)",
+                "%(upstream)",
+                "%(upstream:track,nobracket)",
+                "%(ahead-behind:{})".format(head),
+            ))),
+            *refnames
+        )
+        rv = {}
+        for line in filter_(stdout.splitlines()):  # type: str
+            refname, tip, upstream, status, ahead_behind = line.split("\x00")
+            if refname not in refnames or tips.get(refname) != tip:
+                # The branch moved in the meantime; its next listing takes care of it.
+                continue
+            distance = AheadBehind(*map(int, ahead_behind.split(" ")))
+            distance_cache[(tip, head)] = distance
+            upstream_tip = tips.get(upstream)
+            if upstream_tip:
+                tracking_cache[(tip, upstream_tip)] = status
+            rv[(refname, tip)] = (distance, status)
+        return rv
+
+    def _merge_distances_into_store(self, computed):
+        # type: (Dict[Tuple[str, str], Tuple[AheadBehind, str]]) -> None
+        def complete(branch):
+            # type: (Branch) -> Branch
+            try:
+                distance, status = computed[(refname_of(branch), branch.commit_hash)]
+            except KeyError:
+                return branch
+            upstream = branch.upstream._replace(status=status) if branch.upstream else None
+            return branch._replace(distance_to_head=distance, upstream=upstream)
+
+        stored_state = self.current_state().get("branches", [])
+        self.update_store({"branches": [complete(b) for b in stored_state]})
+
     def _cache_branches(self, branches, refs):
         # type: (List[Branch], Sequence[str]) -> None
         if refs == ["refs/heads", "refs/remotes"]:
@@ -1,16 +1,24 @@
 from __future__ import annotations
+from bisect import bisect_left
 from dataclasses import dataclass
 import email.utils
 from itertools import chain
 import os
-from typing import Generic, Iterator, List, Literal, NamedTuple, Optional, overload, TypeVar
+import subprocess
+from typing import Dict, Generic, Iterable, Iterator, List, Literal, NamedTuple, Optional, overload, Tuple, TypeVar
 from typing_extensions import TypeAlias
 
 from ..exceptions import GitSavvyError
 from ...common import util
-from GitSavvy.core.fns import last, pairwise, take
+from ...common.util.parse_diff import Hunk
+from GitSavvy.core.fns import filter_, last, pairwise, take, unique
 from GitSavvy.core.git_command import mixin_base
+from GitSavvy.core.line_mapping import LineMap
+from GitSavvy.core.parse_diff import SplittedDiff
 from GitSavvy.core.caches import Cache, cached
+from GitSavvy.core.ref_reader import Head, Ref, read_head, read_refs
+from GitSavvy.core.reflog_reader import ReflogLine, read_reflog
+from GitSavvy.core.utils import try_kill_proc
 from GitSavvy.core.types import CommitHash, FullHash, FullPath, ShortHash, ShortPath
 
 
@@ -35,6 +43,18 @@ class RefLogEntry(NamedTuple):
     datetime: str
 
 
+class CommitDetails(NamedTuple):
+    long_hash: FullHash
+    short_hash: ShortHash
+    parents: Tuple[FullHash, ...]
+    author: str
+    email: str
+    author_date: str  # unix timestamp, like `LogEntry.datetime`
+    commit_date: str  # like `CommitHistoryInfo.date`
+    subject: str
+    raw_body: str
+
+
 class CommitInfo(NamedTuple):
     short_hash: ShortHash
     subject: str
@@ -80,6 +100,133 @@ class FileHistoryCache(Cache):
 CommitInfoCache: TypeAlias = "dict[str, CommitHistoryInfo]"
 file_history_cache = FileHistoryCache(maxsize=8192)
 commit_info_cache: CommitInfoCache = Cache(maxsize=8192)
+# Keyed by full and abbreviated commit hashes
+commit_details_cache: Cache = Cache(maxsize=8192)
+# Keyed by `(diff, reverse)`
+line_map_cache: Cache = Cache(maxsize=64)
+
+
+RECORD_DELIMITER = "\x00\x00\n"
+REFLOG_FORMAT = "--format=%h%n%H%n%s%n%gs%n%gd%n%an%n%at%x00%x00%n"
+
+
+def split_records(lines: Iterable[str]) -> Iterator[str]:
+    """Join the `lines` of a streaming `git log` into the records of our formats."""
+    record: List[str] = []
+    for line in lines:
+        record.append(line)
+        if line.endswith(RECORD_DELIMITER):
+            yield "".join(record)[:-len(RECORD_DELIMITER)]
+            record = []
+
+
+def parse_log_entry(record: str) -> Optional[LogEntry]:
+    record = record.strip()
+    if not record:
+        return None
+    entry, raw_body = record.split("\x00")
+    short_hash, long_hash, ref, summary, author, email, datetime = entry.split("\n")
+    return LogEntry(
+        ShortHash(short_hash), FullHash(long_hash), ref, summary, raw_body, author, email, datetime
+    )
+
+
+def parse_reflog_entry(record: str) -> Optional[RefLogEntry]:
+    record = record.strip()
+    if not record:
+        return None
+    short_hash, long_hash, summary, reflog_name, reflog_selector, author, datetime = \
+        record.split("\n")
+    return RefLogEntry(
+        ShortHash(short_hash), FullHash(long_hash), summary, reflog_name, reflog_selector, author, datetime
+    )
+
+
+# Records are separated by "\x1e" (RS), their fields by "\x1f" (US)
+COMMIT_DETAILS_FORMAT = "--format=%x1e%H%x1f%h%x1f%P%x1f%an%x1f%ae%x1f%at%x1f%ci%x1f%s%x1f%B"
+
+
+def parse_commit_details(log_output: str) -> Iterator[CommitDetails]:
+    for record in log_output.split("\x1e")[1:]:
+        long_hash, short_hash, parents, author, email, author_date, commit_date, subject, raw_body = \
+            record.split("\x1f")
+        yield CommitDetails(
+            FullHash(long_hash),
+            ShortHash(short_hash),
+            tuple(map(FullHash, parents.split())),
+            author,
+            email,
+            author_date,
+            commit_date,
+            subject,
+            raw_body.rstrip("\n")
+        )
+
+
+def remember_commit_details(commits: Iterable[CommitDetails]) -> None:
+    for details in commits:
+        commit_details_cache[details.long_hash] = details
+        commit_info_cache[details.short_hash] = CommitHistoryInfo(
+            details.subject, date_from_committer_date(details.commit_date)
+        )
+
+
+def as_log_entry(details: CommitDetails) -> LogEntry:
+    """Convert to a `LogEntry`, which has no `%D` refs in this case."""
+    return LogEntry(
+        details.short_hash,
+        details.long_hash,
+        "",
+        details.subject,
+        details.raw_body.rstrip(),  # like `parse_log_entry` does
+        details.author,
+        details.email,
+        details.author_date
+    )
+
+
+class FirstParentPart(NamedTuple):
+    commit: CommitDetails
+    owned: List[FullHash]  # `commit` first
+    left_range: bool
+
+
+def split_along_first_parents(commits: List[CommitDetails]) -> List[FirstParentPart]:
+    """
+    Split a range `A..B` along the first-parent line of `B`.
+
+    `commits` must be topo-ordered, as from `git log --topo-order A..B`.
+    For every commit `C` on the first-parent line, newest first, return the
+    commits of the range `C~1..C` selects.  `left_range` tells if a commit
+    of that part has parents outside of the range.
+    """
+    by_hash = {commit.long_hash: commit for commit in commits}
+    chain: List[CommitDetails] = []
+    commit = commits[0] if commits else None
+    while commit:
+        chain.append(commit)
+        commit = by_hash.get(commit.parents[0]) if commit.parents else None
+
+    seen: set[FullHash] = set()
+    parts: List[FirstParentPart] = []
+    for commit in reversed(chain):
+        owned: List[FullHash] = []
+        left_range = False
+        seen.add(commit.long_hash)
+        stack = [commit.long_hash]
+        while stack:
+            commit_hash = stack.pop()
+            owned.append(commit_hash)
+            for parent in by_hash[commit_hash].parents:
+                if parent in seen:
+                    continue
+                if parent not in by_hash:
+                    left_range = True
+                    continue
+                seen.add(parent)
+                stack.append(parent)
+        parts.append(FirstParentPart(commit, owned, left_range))
+    return parts[::-1]
 
 
 def is_dynamic_ref(ref: Optional[str]) -> bool:
@@ -91,16 +238,53 @@ def is_dynamic_ref(ref: Optional[str]) -> bool:
     )
 
 
+def line_map_for_diff(diff: str, reverse: bool = False) -> LineMap:
+    """Return the (cached) `LineMap` for a `-U0` diff."""
+    key = (diff, reverse)
+    try:
+        return line_map_cache[key]
+    except KeyError:
+        ranges = (hunk.header().parse() for hunk in SplittedDiff.from_string(diff).hunks)
+        line_map = line_map_cache[key] = LineMap.from_hunks(ranges, reverse)
+        return line_map
+
+
+def hunk_ranges(hunks: Iterable[Hunk]) -> Iterator[Tuple[int, int, int, int]]:
+    for hunk in hunks:
+        yield hunk.head_start, hunk.head_length, hunk.saved_start, hunk.saved_length
+
+
 class HistoryMixin(mixin_base):
 
-    def log(self, author=None, branch=None, file_path=None, start_end=None, cherry=None,
-            limit=6000, skip=None, reverse=False, all_branches=False, msg_regexp=None,
-            diff_regexp=None, first_parent=False, merges=False, no_merges=False, topo_order=False,
-            follow=False, show_panel_on_error=True) -> List[LogEntry]:
+    def log(self, limit=6000, show_panel_on_error=True, **kwargs) -> List[LogEntry]:
+        log_output = self.git(
+            *self._log_args(limit=limit, **kwargs),
+            show_panel_on_error=show_panel_on_error
+        ).strip("\x00")
+        return list(filter_(map(parse_log_entry, log_output.split(RECORD_DELIMITER))))
+
+    def iter_log(self, show_panel_on_error=True, **kwargs) -> Iterator[LogEntry]:
+        """
+        Stream `LogEntry`s from a single `git log` process.
+
+        Takes the same arguments as `log()`, except that `limit` defaults
+        to no limit.  If the consumer stops early, e.g. because the user
+        closed the log panel, the `git` process gets killed.
+        """
+        args = self._log_args(**kwargs)
+        return filter_(map(
+            parse_log_entry,
+            self._stream_records(*args, show_panel_on_error=show_panel_on_error)
+        ))
+
+    def _log_args(self, author=None, branch=None, file_path=None, start_end=None, cherry=None,
+                  limit=None, skip=None, reverse=False, all_branches=False, msg_regexp=None,
+                  diff_regexp=None, first_parent=False, merges=False, no_merges=False,
+                  topo_order=False, follow=False) -> List[Optional[str]]:
         if follow and not file_path:
             raise RuntimeError("follow=True requires file_path")
 
-        log_output = self.git(
+        return [
             "log",
             "--max-count={}".format(limit) if limit else None,
             "--skip={}".format(skip) if skip else None,
@@ -121,64 +305,108 @@ class HistoryMixin(mixin_base):
             branch if branch else None,
             "--" if file_path else None,
             file_path if file_path else None,
-            show_panel_on_error=show_panel_on_error
-        ).strip("\x00")
+        ]
 
-        entries = []
-        for entry in log_output.split("\x00\x00\n"):
-            entry = entry.strip()
-            if not entry:
-                continue
-            entry, raw_body = entry.split("\x00")
+    def _stream_records(self, *args, show_panel_on_error=True) -> Iterator[str]:
+        procs: List[subprocess.Popen] = []
+        lines = self.git_streaming(*args, show_panel_on_error=show_panel_on_error, got_proc=procs.append)
+        try:
+            yield from split_records(lines)
+        finally:
+            for proc in procs:
+                if proc.poll() is None:
+                    try_kill_proc(proc)
+            lines.close()
+
+    def _reflog_from_file(self, limit, skip):
+        # type: (int, int) -> Optional[List[RefLogEntry]]
+        lines = self.read_reflog("HEAD", limit=limit, skip=skip)
+        if lines is None:
+            return None
+        if not lines:
+            return []
 
-            short_hash, long_hash, ref, summary, author, email, datetime = entry.split("\n")
-            entries.append(LogEntry(short_hash, long_hash, ref, summary, raw_body, author, email, datetime))
+        commits = {}
+        try:
+            output = self.git_throwing_silently(
+                "log",
+                "--no-walk=unsorted",
+                "--stdin",
+                "--format=%H%x00%h%x00%s%x00%an%x00%at",
+                stdin="\n".join(unique(line.new_hash for line in lines)) + "\n",
+            )
+        except GitSavvyError:
+            # E.g. commits which have been garbage collected.
+            return None
+        for info in output.splitlines():
+            long_hash, short_hash, subject, author, datetime = info.split("\x00")
+            commits[long_hash] = (short_hash, subject, author, datetime)
 
+        entries = []
+        for n, line in enumerate(lines, start=skip):
+            try:
+                short_hash, subject, author, datetime = commits[line.new_hash]
+            except KeyError:
+                return None
+            entries.append(RefLogEntry(
+                ShortHash(short_hash), line.new_hash, subject, line.message,
+                "HEAD@{{{}}}".format(n), author, datetime
+            ))
         return entries
 
-    def log_generator(self, limit=6000, **kwargs) -> Iterator[LogEntry]:
-        # Generator for show_log_panel
-        skip = 0
-        while True:
-            logs = self.log(limit=limit, skip=skip, **kwargs)
-            yield from logs
-            if len(logs) < limit:
-                break
-            skip += limit
-
-    def reflog(self, limit=6000, skip=None, all_branches=False):
-        log_output = self.git(
-            "reflog",
-            "-{}".format(limit),
-            "--skip={}".format(skip) if skip else None,
-            '--format=%h%n%H%n%s%n%gs%n%gd%n%an%n%at%x00%x00%n',
-            "--all" if all_branches else None,
-        ).strip("\x00")
+    def read_reflog(self, ref="HEAD", limit=None, skip=0):
+        # type: (str, Optional[int], int) -> Optional[List[ReflogLine]]
+        """Read the reflog of `ref` directly from disk, newest entry first.
 
-        entries = []
-        for entry in log_output.split("\x00\x00\n"):
-            entry = entry.strip()
-            if not entry:
-                continue
-            short_hash, long_hash, summary, reflog_name, reflog_selector, author, datetime = \
-                entry.split("\n")
-            entries.append(RefLogEntry(
-                short_hash, long_hash, summary, reflog_name, reflog_selector, author, datetime))
+        `ref` is either "HEAD" or a full refname, e.g. "refs/heads/master".
+        Return `None` if there is no such reflog file, e.g. for repositories
+        using the reftable backend.
+        """
+        base_dir = self.git_dir if ref == "HEAD" else self.git_common_dir
+        path = os.path.join(base_dir, "logs", *ref.split("/"))
+        return read_reflog(path, limit=limit, skip=skip)
 
-        return entries
+    def read_head(self):
+        # type: () -> Optional[Head]
+        """Read what `HEAD` points to directly from disk.
 
-    def reflog_generator(self, limit=6000, skip=None):
+        Return `None` if we can't, e.g. for repositories using the
+        reftable backend; ask git then.
+        """
+        return read_head(self.git_dir, self.git_common_dir)
+
+    def read_refs(self):
+        # type: () -> Optional[Dict[str, Ref]]
+        """Read all refs directly from disk, `None` if we can't."""
+        return read_refs(self.git_dir, self.git_common_dir)
+
+    def reflog_generator(self, limit=6000):
+        for entry in self.iter_reflog(batch_size=limit):
+            yield (["{} {}".format(entry.reflog_selector, entry.reflog_name),
+                    "{} {}".format(entry.short_hash, entry.summary),
+                    "{}, {}".format(entry.author, util.dates.fuzzy(entry.datetime))],
+                   entry.long_hash)
+
+    def iter_reflog(self, batch_size=6000) -> Iterator[RefLogEntry]:
+        # The reflog file is parsed lazily and cached, so reading it batch by
+        # batch is cheap.  `git reflog --skip` on the other hand re-walks all
+        # skipped entries, so if we can't read the file, we stream the rest
+        # from a single `git reflog` process.
         skip = 0
         while True:
-            logs = self.reflog(limit=limit, skip=skip)
-            if not logs:
+            entries = self._reflog_from_file(batch_size, skip)
+            if entries is None:
                 break
-            for entry in logs:
-                yield (["{} {}".format(entry.reflog_selector, entry.reflog_name),
-                        "{} {}".format(entry.short_hash, entry.summary),
-                        "{}, {}".format(entry.author, util.dates.fuzzy(entry.datetime))],
-                       entry.long_hash)
-            skip = skip + limit
+            yield from entries
+            if len(entries) < batch_size:
+                return
+            skip += batch_size
+
+        yield from filter_(map(parse_reflog_entry, self._stream_records(
+            "reflog",
+            "--skip={}".format(skip) if skip else None,
+            REFLOG_FORMAT,
+        )))
 
     def log1(self, commit_hash):
         """
@@ -205,11 +433,68 @@ class HistoryMixin(mixin_base):
         """
         Return parents of a commit.
         """
-        return self.git("rev-list", "-1", "--parents", commit_hash).strip().split(" ")[1:]
+        details = self._cached_commit_details(commit_hash)
+        if details is None:
+            return self.git("rev-list", "-1", "--parents", commit_hash).strip().split(" ")[1:]
+        return list(details.parents)
 
     def commit_is_merge(self, commit_hash):
-        sha = self.git("rev-list", "--merges", "-1", "{0}~1..{0}".format(commit_hash)).strip()
-        return sha != ""
+        return len(self.commit_parents(commit_hash)) > 1
+
+    def _cached_commit_details(self, rev: str) -> Optional[CommitDetails]:
+        # `fetch_commit_details` only understands commit hashes, for
+        # refs like "HEAD" or branch names the caller asks git directly.
+        if not rev or any(c not in "0123456789abcdef" for c in rev):
+            return None
+        return self.fetch_commit_details([rev]).get(rev)
+
+    def fetch_commit_details(self, hashes: Iterable[str]) -> dict[str, CommitDetails]:
+        """
+        Return the `CommitDetails` of many commits, keyed by the given hashes.
+
+        Only (abbreviated) commit hashes are supported, not refs.  The details
+        of all commits not in the cache are read with one `git log` call.  As
+        a side-effect, `commit_info_cache` is warmed up for all of them.
+        """
+        rv: dict[str, CommitDetails] = {}
+        missing: list[str] = []
+        for commit_hash in unique(hashes):
+            try:
+                rv[commit_hash] = commit_details_cache[commit_hash]
+            except KeyError:
+                missing.append(commit_hash)
+        if not missing:
+            return rv
+
+        log_output = self.git(
+            "log",
+            "--no-walk=unsorted",
+            "--stdin",
+            COMMIT_DETAILS_FORMAT,
+            stdin="\n".join(missing) + "\n"
+        )
+        fetched = sorted(parse_commit_details(log_output))
+        remember_commit_details(fetched)
+
+        long_hashes = [details.long_hash for details in fetched]
+        for commit_hash in missing:
+            idx = bisect_left(long_hashes, commit_hash)
+            if idx < len(long_hashes) and long_hashes[idx].startswith(commit_hash):
+                rv[commit_hash] = commit_details_cache[commit_hash] = fetched[idx]
+        return rv
+
+    def commit_details_log(self, *args: Optional[str]) -> List[CommitDetails]:
+        """
+        Return the `CommitDetails` of the commits `git log <args>` lists, in
+        the order git lists them.
+
+        Use this to read a whole range, including the parents of all its
+        commits, with one `git log`.  The details are cached as in
+        `fetch_commit_details`.
+        """
+        commits = list(parse_commit_details(self.git("log", COMMIT_DETAILS_FORMAT, *args)))
+        remember_commit_details(commits)
+        return commits
 
     def commit_is_ancestor_of_head(self, commit_hash):
         # type: (str) -> bool
@@ -225,6 +510,43 @@ class HistoryMixin(mixin_base):
         else:
             return True
 
+    def is_ancestor_of(self, ancestor, commitish):
+        # type: (str, str) -> bool
+        try:
+            self.git_throwing_silently(
+                "merge-base",
+                "--is-ancestor",
+                ancestor,
+                commitish,
+            )
+        except GitSavvyError:
+            return False
+        else:
+            return True
+
+    def read_ref_tips(self) -> dict[str, FullHash]:
+        """Map all refs, including HEAD but not the stash, to their commits.
+
+        Annotated tags are peeled.
+        """
+        head, refs = self.read_head(), self.read_refs()
+        if head is not None and refs is not None:
+            tips_ = {name: ref.peeled for name, ref in refs.items() if name != "refs/stash"}
+            if all(tips_.values()):
+                if head.commit:
+                    tips_["HEAD"] = head.commit
+                return tips_  # type: ignore[return-value]
+
+        tips: dict[str, FullHash] = {}
+        for line in self.git(
+            "show-ref", "--head", "--dereference", throw_on_error=False
+        ).splitlines():
+            commit_hash, _, ref = line.partition(" ")
+            if ref == "refs/stash":
+                continue
+            tips[ref[:-3] if ref.endswith("^{}") else ref] = FullHash(commit_hash)
+        return tips
+
     @overload
     def resolve(
         self,
@@ -544,52 +866,16 @@ class HistoryMixin(mixin_base):
         return self.git("diff", "--no-color", "-U0", base_spec, "--", target_file_path)
 
     def adjust_line_according_to_diff(self, diff: str, line: int) -> int:
-        hunks = util.parse_diff(diff)
-        if not hunks:
-            return line
-
-        return self.adjust_line_according_to_hunks(hunks, line)
+        return line_map_for_diff(diff)(line)
 
     def reverse_adjust_line_according_to_diff(self, diff: str, line: int) -> int:
-        hunks = util.parse_diff(diff)
-        if not hunks:
-            return line
-
-        return self.reverse_adjust_line_according_to_hunks(hunks, line)
+        return line_map_for_diff(diff, reverse=True)(line)
 
     def adjust_line_according_to_hunks(self, hunks, line):
-        for hunk in reversed(hunks):
-            head_start = hunk.head_start if hunk.head_length else hunk.head_start + 1
-            saved_start = hunk.saved_start if hunk.saved_length else hunk.saved_start + 1
-            head_end = head_start + hunk.head_length
-            saved_end = saved_start + hunk.saved_length
-
-            if head_end <= line:
-                return saved_end + line - head_end
-            elif head_start <= line:
-                return saved_start
-
-        # fails to find matching
-        return line
+        return LineMap.from_hunks(hunk_ranges(hunks))(line)
 
     def reverse_adjust_line_according_to_hunks(self, hunks, line):
-        for hunk in reversed(hunks):
-            head_start = hunk.head_start
-            saved_start = hunk.saved_start
-            if hunk.saved_length == 0:
-                saved_start += 1
-            elif hunk.head_length == 0:
-                saved_start -= 1
-            head_end = head_start + hunk.head_length
-            saved_end = saved_start + hunk.saved_length
-
-            if saved_end <= line:
-                return head_end + line - saved_end
-            elif saved_start <= line:
-                return head_start
-
-        # fails to find matching
-        return line
+        return LineMap.from_hunks(hunk_ranges(hunks), reverse=True)(line)
 
     @cached(not_if={"commit_hash": is_dynamic_ref})
     def read_commit(
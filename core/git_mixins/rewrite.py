@@ -2,8 +2,19 @@ import os
 import shutil
 from types import SimpleNamespace
 
-
-from typing import TYPE_CHECKING
+from GitSavvy.core.caches import cached
+from GitSavvy.core.exceptions import GitSavvyError
+from GitSavvy.core.git_mixins.history import (
+    as_log_entry,
+    CommitDetails,
+    is_dynamic_ref,
+    split_along_first_parents,
+    LogEntry,
+)
+
+
+from typing import Dict, List, NamedTuple, Optional, TYPE_CHECKING
+from GitSavvy.core.types import FullHash
 if TYPE_CHECKING:
     from GitSavvy.core.git_command import (
         ActiveBranchMixin,
@@ -28,6 +39,10 @@ else:
     mixin_base = object
 
 
+MERGE_TREE_SUPPORTS_WRITE_TREE = (2, 38, 0)
+MERGE_TREE_SUPPORTS_MERGE_BASE = (2, 40, 0)
+
+
 class RewriteTemplate(SimpleNamespace):
     # orig_hash
     do_commit = True
@@ -45,6 +60,27 @@ class RewriteTemplate(SimpleNamespace):
             return None
 
 
+def cleanup_message(msg):
+    # type: (str) -> str
+    """Clean up `msg` like `git commit --cleanup=whitespace` does."""
+    lines = [line.rstrip() for line in msg.splitlines()]
+    kept = []  # type: List[str]
+    for line in lines:
+        if line or (kept and kept[-1]):
+            kept.append(line)
+    while kept and not kept[-1]:
+        kept.pop()
+    return "".join(line + "\n" for line in kept)
+
+
+class DivergedCommits(NamedTuple):
+    # The commits as `log_rebase` lists them, oldest first
+    entries: List[LogEntry]
+    # For the merges among them, the commits of `M~1..M` within the
+    # range, `M` excluded, oldest first
+    merged: Dict[FullHash, List[LogEntry]]
+
+
 class RewriteMixin(mixin_base):
 
     def log_rebase(self, start, end="HEAD", preserve=False):
@@ -55,6 +91,38 @@ class RewriteMixin(mixin_base):
             no_merges=not preserve,
             topo_order=True)
 
+    @cached(not_if={"start": is_dynamic_ref, "end": is_dynamic_ref})
+    def diverged_commits(self, start, end="HEAD", preserve=False):
+        # type: (str, str, bool) -> DivergedCommits
+        """
+        Read the commits `start..end` with their merge structure.
+
+        Like `log_rebase` but from a single `git log` for the whole range,
+        which also tells the parents of every commit.  Cached as long as
+        `start` and `end` are commit hashes, e.g. during a rebase.
+        """
+        commits = self.commit_details_log("--topo-order", "{}..{}".format(start, end))
+        parts = split_along_first_parents(commits)
+        topo_index = {commit.long_hash: idx for idx, commit in enumerate(commits)}
+        by_hash = {commit.long_hash: commit for commit in commits}
+
+        if preserve:
+            newest_first = [part.commit for part in parts]
+        else:
+            newest_first = [commit for commit in commits if len(commit.parents) < 2]
+        # `log()` limits to 6000 commits before reversing
+        entries = [as_log_entry(commit) for commit in reversed(newest_first[:6000])]
+
+        merged = {
+            part.commit.long_hash: [
+                as_log_entry(by_hash[commit_hash])
+                for commit_hash in sorted(part.owned[1:], key=topo_index.__getitem__, reverse=True)
+            ]
+            for part in parts
+            if len(part.commit.parents) > 1
+        }
+        return DivergedCommits(entries, merged)
+
     def perpare_rewrites(self, entries):
         commit_chain = [
             RewriteTemplate(orig_hash=entry.long_hash,
@@ -167,6 +235,106 @@ class RewriteMixin(mixin_base):
         return [rewritten[p] if p in rewritten else p for p in parents]
 
     def rewrite_active_branch(self, base_commit, commit_chain):
+        self.fetch_commit_details(commit.orig_hash for commit in commit_chain)
+        if (
+            self.git_version >= MERGE_TREE_SUPPORTS_WRITE_TREE
+            and not any(self.commit_is_merge(commit.orig_hash) for commit in commit_chain)
+        ):
+            self._rewrite_without_checkout(base_commit, commit_chain)
+        else:
+            self._replay_on_worktree(base_commit, commit_chain)
+
+    def _rewrite_without_checkout(self, base_commit, commit_chain):
+        """
+        Rewrite the active branch using plumbing commands only.
+
+        Each commit is cherry-picked in memory with `merge-tree` and written
+        with `commit-tree`; the branch is moved with `update-ref`.  Only the
+        files which differ between the old and the new tip are updated in
+        the index and the working tree, and local modifications of other
+        files survive.  On conflicts nothing is changed at all.
+        """
+        old_head = self.git("rev-parse", "HEAD").strip()
+        branch_name = self.get_current_branch_name()
+        sign = self.git("config", "--bool", "commit.gpgsign", throw_on_error=False).strip() == "true"
+
+        # `parent` is the last written commit, `tip` has the tree to apply
+        # the next commit on, which differs if commits have been squashed.
+        parent = tip = self.git("rev-parse", "{}^{{commit}}".format(base_commit)).strip()
+        for commit in commit_chain:
+            details = self.fetch_commit_details([commit.orig_hash])[commit.orig_hash]
+            orig_parent = details.parents[0]
+            if commit.do_commit and not commit.modified and tip == parent == orig_parent:
+                tip = parent = details.long_hash
+                continue
+
+            tree = self._cherry_pick_tree(tip, details)
+            if commit.do_commit:
+                tip = parent = self._commit_tree(tree, parent, commit, sign)
+            else:
+                tip = self._commit_tree(tree, parent, commit, sign=False)
+
+        if parent == old_head:
+            return
+        # Like `git checkout`, `read-tree -m -u` refuses to overwrite local
+        # changes of the files it needs to update.
+        self.git("read-tree", "-m", "-u", old_head, parent)
+        self.git(
+            "update-ref",
+            "-m", "GitSavvy: rewrite history",
+            "refs/heads/{}".format(branch_name) if branch_name else "HEAD",
+            parent,
+            old_head
+        )
+
+    def _cherry_pick_tree(self, onto, details):
+        # type: (str, CommitDetails) -> str
+        orig_parent = details.parents[0]
+        if self.git_version >= MERGE_TREE_SUPPORTS_MERGE_BASE:
+            args = ["--merge-base={}".format(orig_parent), onto, details.long_hash]
+        else:
+            # Give the tree of `onto` the original parent as its parent,
+            # which then is the merge base with the picked commit.
+            ours = self.git(
+                "commit-tree", "{}^{{tree}}".format(onto), "-p", orig_parent, "-m", "GitSavvy: merge base"
+            ).strip()
+            args = [ours, details.long_hash]
+
+        try:
+            output = self.git_throwing_silently("merge-tree", "--write-tree", *args)
+        except GitSavvyError as e:
+            raise GitSavvyError(
+                "Cannot rewrite the history: applying {} \"{}\" results in conflicts."
+                .format(details.short_hash, details.subject),
+                cmd=e.cmd,
+                stdout=e.stdout,
+                stderr=e.stderr,
+                window=e.window,
+            )
+        return output.split("\n", 1)[0]
+
+    def _commit_tree(self, tree, parent, commit, sign):
+        # type: (str, str, RewriteTemplate, bool) -> str
+        author = commit.author  # type: Optional[str]
+        datetime = commit.datetime  # type: Optional[str]
+        environ = {}  # type: Dict[str, str]
+        if author:
+            name, _, email = author.rpartition(" <")
+            environ["GIT_AUTHOR_NAME"] = name
+            environ["GIT_AUTHOR_EMAIL"] = email.rstrip(">")
+        if datetime:
+            environ["GIT_AUTHOR_DATE"] = datetime
+        return self.git(
+            "commit-tree",
+            tree,
+            "-p", parent,
+            "-S" if sign else None,
+            "-F", "-",
+            stdin=cleanup_message(commit.msg or ""),
+            custom_environ=environ
+        ).strip()
+
+    def _replay_on_worktree(self, base_commit, commit_chain):
         # `_commit_parents_mapping` is used to store new parents of the commits,
         # it is needed if the commits have moved.
         self._commit_parents_mapping = {}
@@ -212,6 +380,16 @@ class RewriteMixin(mixin_base):
 
     def rebase_rewritten(self):
         if self.in_rebase_merge():
+            # Since git 2.26 the sequencer appends "<old> <new>" lines to
+            # `rewritten-list`, the directory is from `--preserve-merges`.
+            rewritten_list = os.path.join(self._rebase_merge_dir, "rewritten-list")
+            if os.path.exists(rewritten_list):
+                with open(rewritten_list, "r") as f:
+                    return dict(
+                        entry.split(" ")[:2]
+                        for entry in f.read().splitlines()
+                        if entry
+                    )
             path = os.path.join(self._rebase_merge_dir, "rewritten")
             if not os.path.exists(path):
                 return dict()
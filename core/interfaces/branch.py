@@ -276,7 +276,9 @@ class BranchInterface(ui.ReactiveInterface, GitCommand):
             def sectionizer(branch):
                 if branch.worktree_path and not branch.active:
                     return worktree_key
-                ahead, behind = branch.distance_to_head
+                # In slow repos the distances come in progressively, see
+                # `BranchesMixin._fill_in_distances`.
+                ahead, behind = branch.distance_to_head or (-1, -1)
                 return (
                     (1, 0) if ahead > 0 and behind == 0 else
                     (2, 0) if branch.active else
@@ -252,25 +252,28 @@ class RebaseInterface(ui.Interface, NearestBranchMixin, GitCommand):
 
     def get_diverged_commits_info(self, start, end):
         preserve = self.preserve_merges()
+        if self._in_rebase:
+            diverged = self.diverged_commits(start, end, preserve)
+            self.entries = diverged.entries
+            return self._get_diverged_in_rebase(diverged)
+
         self.entries = self.log_rebase(start, end, preserve)
-        return (self._get_diverged_in_rebase()
-                if self._in_rebase else
-                self._get_diverged_outside_rebase())
+        return self._get_diverged_outside_rebase()
 
-    def _get_diverged_in_rebase(self):
+    def _get_diverged_in_rebase(self, diverged):
         self._active_conflicts = None
         conflict_commit = self.rebase_conflict_at() or NOT_A_COMMIT_SHA
         rewritten = self.rebase_rewritten()
+        in_rebase_merge = self.in_rebase_merge()
         commits_info = []
 
-        for entry in self.entries:
+        for entry in diverged.entries:
             conflicts = ""
-            is_merge = self.commit_is_merge(entry.long_hash)
-            if self.in_rebase_merge() and is_merge:
-                is_conflict = conflict_commit in self.commits_of_merge(entry.long_hash)
+            merged = diverged.merged.get(entry.long_hash)
+            if in_rebase_merge and merged is not None:
+                is_conflict = any(c.long_hash == conflict_commit for c in merged)
                 if is_conflict:
-                    conflict_logs = self.log_merge(entry.long_hash)
-                    for conflict_idx, c in enumerate(conflict_logs):
+                    for c in merged:
                         conflicts = conflicts + "\n    │    {}  {}  {}".format(
                             self.SUCCESS if c.long_hash in rewritten else
                             self.CONFLICT if c.long_hash == conflict_commit else
@@ -962,7 +965,7 @@ class gs_rebase_define_base_ref(PanelActionMixin, RebaseInterfaceCommand):
         )
 
     def select_commit(self):
-        show_log_panel(self.log_generator(), self.set_base_ref)
+        show_log_panel(self.iter_log(), self.set_base_ref)
 
     def set_base_ref(self, ref):
         if ref:
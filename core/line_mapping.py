@@ -0,0 +1,87 @@
+"""Map line numbers through `-U0` diffs.
+
+A `LineMap` turns the hunks of a diff into a table once: the sorted
+start lines of its pieces and, per piece, either an offset (for the
+unchanged lines after a hunk) or a fixed line (for the changed lines,
+which all map onto the start of their counterpart).  A lookup is then a
+bisect instead of a walk over all hunks.
+"""
+from __future__ import annotations
+from bisect import bisect_right
+
+from typing import Iterable, List, Tuple
+
+
+__all__ = (
+    "LineMap",
+)
+
+
+HunkRange = Tuple[int, int, int, int]  # head_start, head_length, saved_start, saved_length
+Piece = Tuple[bool, int]  # (True, offset) or (False, fixed line)
+
+
+class LineMap:
+    """A piecewise line mapping.
+
+    `pieces[i]` applies to the lines `starts[i] <= line < starts[i + 1]`.
+    Lines before `starts[0]` map onto themselves.
+    """
+    __slots__ = ("starts", "pieces")
+
+    def __init__(self, starts: List[int], pieces: List[Piece]) -> None:
+        self.starts = starts
+        self.pieces = pieces
+
+    def __repr__(self) -> str:
+        return "LineMap({!r}, {!r})".format(self.starts, self.pieces)
+
+    def __call__(self, line: int) -> int:
+        idx = bisect_right(self.starts, line) - 1
+        if idx < 0:
+            return line
+        is_offset, value = self.pieces[idx]
+        return line + value if is_offset else value
+
+    @classmethod
+    def from_hunks(cls, hunks: Iterable[HunkRange], reverse: bool = False) -> LineMap:
+        """Build the map from the `@@` ranges of a `-U0` diff.
+
+        By default lines of the old side ("head") are mapped to the new
+        side ("saved"), with `reverse` the other way round.  Changed lines
+        map onto the start of the corresponding change; the following
+        unchanged lines are shifted by the size difference.
+        """
+        starts: List[int] = []
+        pieces: List[Piece] = []
+
+        def add(start: int, piece: Piece) -> None:
+            # A later hunk takes precedence over everything after its start.
+            while starts and starts[-1] >= start:
+                starts.pop()
+                pieces.pop()
+            starts.append(start)
+            pieces.append(piece)
+
+        for head_start, head_length, saved_start, saved_length in hunks:
+            if reverse:
+                if saved_length == 0:
+                    saved_start += 1
+                elif head_length == 0:
+                    saved_start -= 1
+                from_start, from_length = saved_start, saved_length
+                to_start, to_length = head_start, head_length
+            else:
+                if head_length == 0:
+                    head_start += 1
+                if saved_length == 0:
+                    saved_start += 1
+                from_start, from_length = head_start, head_length
+                to_start, to_length = saved_start, saved_length
+
+            from_end = from_start + from_length
+            to_end = to_start + to_length
+            add(from_start, (False, to_start))
+            add(from_end, (True, to_end - from_end))
+
+        return cls(starts, pieces)
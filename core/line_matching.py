@@ -0,0 +1,144 @@
+"""Match the lines of two texts in (roughly) linear time.
+
+`difflib` is quadratic in the worst case, and `difflib.Differ` in
+particular compares every line of a changed block with every other one.
+For diffs of diffs with thousands of lines that means seconds.
+
+We use the patience strategy instead: lines are interned to ints, common
+prefixes and suffixes are trimmed, and lines that occur exactly once on
+both sides serve as anchors.  The longest increasing run of anchors
+splits the texts into smaller ranges which we match recursively.  Only
+small ranges without any unique line fall back to `difflib`.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from collections import Counter
+import difflib
+
+from typing import Dict, List, Literal, NamedTuple, Sequence, Tuple
+
+
+__all__ = (
+    "Opcode",
+    "match_lines",
+)
+
+
+# Ranges without unique lines are matched with `difflib` only if
+# `len(a_range) * len(b_range)` stays below this limit.
+FALLBACK_LIMIT = 10_000
+
+
+class Opcode(NamedTuple):
+    tag: Literal["equal", "replace", "delete", "insert"]
+    a_start: int
+    a_end: int
+    b_start: int
+    b_end: int
+
+
+def match_lines(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """Return `difflib.SequenceMatcher.get_opcodes()` like opcodes for `a` and `b`."""
+    ids: Dict[str, int] = {}
+    a_ = [ids.setdefault(line, len(ids)) for line in a]
+    b_ = [ids.setdefault(line, len(ids)) for line in b]
+    return _to_opcodes(_matching_pairs(a_, b_), len(a_), len(b_))
+
+
+def _matching_pairs(a: List[int], b: List[int]) -> List[Tuple[int, int]]:
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            matches.append((a_hi, b_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        anchors = _unique_anchors(a, a_lo, a_hi, b, b_lo, b_hi)
+        if not anchors:
+            if (a_hi - a_lo) * (b_hi - b_lo) <= FALLBACK_LIMIT:
+                sm = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+                for i, j, n in sm.get_matching_blocks():
+                    matches.extend((a_lo + i + k, b_lo + j + k) for k in range(n))
+            continue
+
+        for i, j in anchors:
+            matches.append((i, j))
+            stack.append((a_lo, i, b_lo, j))
+            a_lo, b_lo = i + 1, j + 1
+        stack.append((a_lo, a_hi, b_lo, b_hi))
+
+    matches.sort()
+    return matches
+
+
+def _unique_anchors(
+    a: List[int], a_lo: int, a_hi: int,
+    b: List[int], b_lo: int, b_hi: int
+) -> List[Tuple[int, int]]:
+    a_counts = Counter(a[a_lo:a_hi])
+    b_counts = Counter(b[b_lo:b_hi])
+    b_index = {
+        line: j
+        for j, line in enumerate(b[b_lo:b_hi], start=b_lo)
+        if b_counts[line] == 1 and a_counts[line] == 1
+    }
+    candidates = [
+        (i, b_index[line])
+        for i, line in enumerate(a[a_lo:a_hi], start=a_lo)
+        if line in b_index
+    ]
+    return _longest_increasing_run(candidates)
+
+
+def _longest_increasing_run(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # Patience sorting over the `b` side; `pairs` are already sorted by `a`.
+    tails: List[int] = []          # smallest `b` ending a run of length n + 1
+    tail_indexes: List[int] = []   # index into `pairs` of that smallest end
+    predecessors: List[int] = []
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        predecessors.append(tail_indexes[k - 1] if k else -1)
+        if k == len(tails):
+            tails.append(j)
+            tail_indexes.append(n)
+        else:
+            tails[k] = j
+            tail_indexes[k] = n
+
+    run: List[Tuple[int, int]] = []
+    n = tail_indexes[-1] if tail_indexes else -1
+    while n != -1:
+        run.append(pairs[n])
+        n = predecessors[n]
+    run.reverse()
+    return run
+
+
+def _to_opcodes(matches: List[Tuple[int, int]], a_len: int, b_len: int) -> List[Opcode]:
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for a_pos, b_pos in matches + [(a_len, b_len)]:
+        if i < a_pos or j < b_pos:
+            tag: Literal["replace", "delete", "insert"] = (
+                "replace" if i < a_pos and j < b_pos
+                else "delete" if i < a_pos
+                else "insert"
+            )
+            opcodes.append(Opcode(tag, i, a_pos, j, b_pos))
+        if a_pos == a_len and b_pos == b_len:
+            break
+        if opcodes and opcodes[-1].tag == "equal" and opcodes[-1].a_end == a_pos:
+            last = opcodes[-1]
+            opcodes[-1] = last._replace(a_end=a_pos + 1, b_end=b_pos + 1)
+        else:
+            opcodes.append(Opcode("equal", a_pos, a_pos + 1, b_pos, b_pos + 1))
+        i, j = a_pos + 1, b_pos + 1
+    return opcodes
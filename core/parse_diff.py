@@ -1,21 +1,57 @@
 from __future__ import annotations
+from bisect import bisect_left, bisect_right
 from functools import partial
-from itertools import chain, dropwhile, groupby, takewhile
+from itertools import chain, groupby, takewhile
 import re
 
 import sublime
-from .fns import flatten, pairwise, tail
+from .caches import Cache
+from .fns import flatten, pairwise
 from .text_helper import TextRange
 
 
-from typing import Final, Iterator, List, NamedTuple, Optional, Tuple
+from typing import Dict, Final, Iterator, List, Optional, Tuple
 from .types import FullHash, LineNo, ShortPath
 
 
-class SplittedDiff(NamedTuple):
-    commits: Tuple['CommitHeader', ...]
-    headers: Tuple['FileHeader', ...]
-    hunks: Tuple['Hunk', ...]
+class SplittedDiff:
+    __slots__ = (
+        "commits", "headers", "hunks",
+        "_commit_starts", "_header_starts", "_hunk_starts", "_hunk_ranges_by_header"
+    )
+
+    def __init__(self, commits, headers, hunks):
+        # type: (Tuple[CommitHeader, ...], Tuple[FileHeader, ...], Tuple[Hunk, ...]) -> None
+        # All sections must be sorted by their start offsets, which `from_string`
+        # guarantees.  The offsets are kept separately so that all lookups by
+        # point are `bisect`s.
+        self.commits = commits  # type: Final[Tuple[CommitHeader, ...]]
+        self.headers = headers  # type: Final[Tuple[FileHeader, ...]]
+        self.hunks = hunks  # type: Final[Tuple[Hunk, ...]]
+        self._commit_starts = [commit.a for commit in commits]  # type: Final[List[int]]
+        self._header_starts = [header.a for header in headers]  # type: Final[List[int]]
+        self._hunk_starts = [hunk.a for hunk in hunks]  # type: Final[List[int]]
+        hunk_range_ends = [
+            bisect_left(self._hunk_starts, start) for start in self._header_starts[1:]
+        ] + [len(hunks)]
+        self._hunk_ranges_by_header = {
+            header.a: (bisect_right(self._hunk_starts, header.a), end)
+            for header, end in zip(headers, hunk_range_ends)
+        }  # type: Final[Dict[int, Tuple[int, int]]]
+
+    def __repr__(self):
+        return "SplittedDiff(commits={}, headers={}, hunks={})".format(
+            self.commits, self.headers, self.hunks
+        )
+
+    def __eq__(self, other):
+        # type: (object) -> bool
+        if isinstance(other, SplittedDiff):
+            return (
+                (self.commits, self.headers, self.hunks)
+                == (other.commits, other.headers, other.hunks)
+            )
+        return False
 
     @classmethod
     def from_string(cls, text, offset=0):
@@ -41,7 +77,13 @@ class SplittedDiff(NamedTuple):
     @classmethod
     def from_view(cls, view):
         # type: (sublime.View) -> SplittedDiff
-        return cls.from_string(view.substr(sublime.Region(0, view.size())))
+        """Parse the content of `view`, reusing the last result if the view did not change."""
+        key = (view.id(), view.change_count())
+        try:
+            return parsed_views[key]
+        except KeyError:
+            diff = parsed_views[key] = cls.from_string(view.substr(sublime.Region(0, view.size())))
+            return diff
 
     def is_combined_diff(self):
         # type: () -> bool
@@ -60,68 +102,58 @@ class SplittedDiff(NamedTuple):
 
     def hunk_for_pt(self, pt):
         # type: (int) -> Optional[Hunk]
-        for hunk in self.hunks:
-            if hunk.a <= pt < hunk.b:
-                return hunk
-        else:
-            return None
+        idx = bisect_right(self._hunk_starts, pt) - 1
+        if idx >= 0 and pt < self.hunks[idx].b:
+            return self.hunks[idx]
+        return None
 
     def first_hunk_after_pt(self, pt):
         # type: (int) -> Optional[Hunk]
-        for hunk in self.hunks:
-            if hunk.a > pt:
-                return hunk
-        else:
-            return None
+        idx = bisect_right(self._hunk_starts, pt)
+        return self.hunks[idx] if idx < len(self.hunks) else None
 
     def head_for_pt(self, pt):
         # type: (int) -> Optional[FileHeader]
-        for header in reversed(self.headers):
-            if header.a <= pt:
-                return header
-        else:
-            return None
+        idx = bisect_right(self._header_starts, pt) - 1
+        return self.headers[idx] if idx >= 0 else None
 
     def head_for_hunk(self, hunk):
         # type: (Hunk) -> FileHeader
-        return max(
-            (header for header in self.headers if header.a < hunk.a),
-            key=lambda h: h.a
-        )
+        idx = bisect_left(self._header_starts, hunk.a) - 1
+        if idx < 0:
+            raise ValueError("no file header before {}".format(hunk))
+        return self.headers[idx]
 
     def hunks_for_head(self, head):
         # type: (FileHeader) -> Iterator[Hunk]
-        return takewhile(
-            lambda x: isinstance(x, Hunk),
-            tail(dropwhile(
-                lambda x: x != head,
-                sorted(self.headers + self.hunks, key=lambda x: x.a)  # type: ignore[arg-type]
-            ))
-        )
+        try:
+            lo, hi = self._hunk_ranges_by_header[head.a]
+        except KeyError:
+            return iter(())
+        if self.headers[bisect_left(self._header_starts, head.a)] != head:
+            return iter(())
+        return iter(self.hunks[lo:hi])
 
     def commit_for_hunk(self, hunk):
         # type: (Hunk) -> Optional[CommitHeader]
-        try:
-            return max(
-                (commit for commit in self.commits if commit.a < hunk.a),
-                key=lambda c: c.a
-            )
-        except ValueError:
-            return None
+        idx = bisect_left(self._commit_starts, hunk.a) - 1
+        return self.commits[idx] if idx >= 0 else None
 
     def commit_before_pt(self, pt):
         # type: (int) -> Optional[CommitHeader]
-        for commit_header in reversed(self.commits):
-            if commit_header.a <= pt:
-                return commit_header
-        else:
-            return None
+        idx = bisect_right(self._commit_starts, pt) - 1
+        return self.commits[idx] if idx >= 0 else None
 
     def commit_hash_before_pt(self, pt: int) -> FullHash | None:
         commit_header = self.commit_before_pt(pt)
         return commit_header.commit_hash() if commit_header else None
 
 
+# Parsed diff views keyed by `(view.id(), view.change_count())`.  As the key
+# changes with every edit, stale entries never match and just age out.
+parsed_views = Cache(maxsize=16)  # type: Cache
+
+
 HEADER_TO_FILE_RE = re.compile(r'\+\+\+ b/(.+?)\t?$')
 
 
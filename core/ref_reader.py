@@ -0,0 +1,263 @@
+"""Read `HEAD` and the refs directly from the files backend.
+
+Many questions only need ref names and their tips, e.g. "which branch
+is checked out" or "where do all the refs point to".  Spawning `git`
+for them is comparably expensive, so we read `HEAD`, the loose refs and
+`packed-refs` ourselves.  Parsed files are cached and reused as long as
+their stat (size, mtime, inode) does not change.
+
+All functions return `None` if they cannot answer, e.g. for
+repositories using the reftable backend; callers then fall back to git.
+"""
+from __future__ import annotations
+import os
+import re
+import threading
+import zlib
+
+from .caches import Cache
+from .types import FullHash
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+__all__ = (
+    "Head",
+    "Ref",
+    "read_head",
+    "read_refs",
+)
+
+
+class Head(NamedTuple):
+    #: Full refname `HEAD` points to, `None` if detached
+    symref: Optional[str]
+    #: `None` on an unborn branch
+    commit: Optional[FullHash]
+
+
+class Ref(NamedTuple):
+    name: str
+    target: FullHash
+    #: What `target` points to after peeling annotated tags, `None` if unknown
+    peeled: Optional[FullHash]
+
+
+HASH_RE = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
+SYMREF_PREFIX = "ref: "
+MAX_SYMREF_DEPTH = 5
+# These refs belong to a worktree and live in its own `git_dir`, all
+# other refs are shared and live in the `common_dir`.
+PER_WORKTREE_REFS = ("refs/bisect", "refs/rewritten", "refs/worktree")
+
+files: Cache = Cache(maxsize=2048)
+peeled_tags: Cache = Cache(maxsize=1024)  # objects are immutable, no stat needed
+lock = threading.Lock()
+
+
+def read_head(git_dir: str, common_dir: str) -> Optional[Head]:
+    """Return what `HEAD` of the worktree at `git_dir` points to."""
+    if uses_reftable(common_dir):
+        return None
+    content = _read_file(os.path.join(git_dir, "HEAD"))
+    if content is None:
+        return None
+    if content.startswith(SYMREF_PREFIX):
+        symref = content[len(SYMREF_PREFIX):]
+        return Head(symref, _resolve(git_dir, common_dir, symref, MAX_SYMREF_DEPTH))
+    if HASH_RE.match(content):
+        return Head(None, FullHash(content))
+    return None
+
+
+def read_refs(git_dir: str, common_dir: str) -> Optional[Dict[str, Ref]]:
+    """Return all refs below `refs/`, loose and packed, by their full name.
+
+    Symbolic refs, e.g. `refs/remotes/origin/HEAD`, are resolved.  Only tags
+    are expected to point to tag objects; they're peeled using `packed-refs`
+    or their loose object.  If neither is possible, `peeled` is `None`.
+    """
+    if uses_reftable(common_dir):
+        return None
+    packed = _read_packed_refs(common_dir)
+    if packed is None:
+        return None
+
+    refs = dict(packed)
+    loose: Dict[str, str] = {}
+    shared_only = os.path.normpath(git_dir) != os.path.normpath(common_dir)
+    _collect_loose_refs(common_dir, "refs", loose, PER_WORKTREE_REFS if shared_only else ())
+    if shared_only:
+        for prefix in PER_WORKTREE_REFS:
+            _collect_loose_refs(git_dir, prefix, loose, ())
+
+    for name, content in loose.items():
+        if content.startswith(SYMREF_PREFIX):
+            target = _resolve(git_dir, common_dir, content[len(SYMREF_PREFIX):], MAX_SYMREF_DEPTH)
+        else:
+            target = FullHash(content) if HASH_RE.match(content) else None
+        if target is None:
+            refs.pop(name, None)
+            continue
+
+        # A loose ref shadows its packed version.
+        packed_ref = packed.get(name)
+        if packed_ref and packed_ref.target == target:
+            peeled = packed_ref.peeled
+        elif name.startswith("refs/tags/"):
+            peeled = _peel_loose_object(common_dir, target)
+        else:
+            peeled = target
+        refs[name] = Ref(name, target, peeled)
+    return refs
+
+
+def uses_reftable(common_dir: str) -> bool:
+    return os.path.isdir(os.path.join(common_dir, "reftable"))
+
+
+def _resolve(git_dir: str, common_dir: str, refname: str, depth: int) -> Optional[FullHash]:
+    if depth == 0:
+        return None
+    base_dir = (
+        git_dir
+        if refname == "HEAD" or refname.startswith(tuple(p + "/" for p in PER_WORKTREE_REFS))
+        else common_dir
+    )
+    content = _read_file(os.path.join(base_dir, *refname.split("/")))
+    if content is None:
+        packed = _read_packed_refs(common_dir)
+        ref = packed.get(refname) if packed else None
+        return ref.target if ref else None
+    if content.startswith(SYMREF_PREFIX):
+        return _resolve(git_dir, common_dir, content[len(SYMREF_PREFIX):], depth - 1)
+    return FullHash(content) if HASH_RE.match(content) else None
+
+
+def _collect_loose_refs(base_dir: str, prefix: str, into: Dict[str, str], skip: Tuple[str, ...]) -> None:
+    try:
+        entries = list(os.scandir(os.path.join(base_dir, *prefix.split("/"))))
+    except OSError:
+        return
+    for entry in entries:
+        name = prefix + "/" + entry.name
+        if name in skip or entry.name.endswith(".lock"):
+            continue
+        if entry.is_dir():
+            _collect_loose_refs(base_dir, name, into, skip)
+        else:
+            content = _read_file(entry.path)
+            if content is not None:
+                into[name] = content
+
+
+def _read_file(path: str) -> Optional[str]:
+    return _read_memoized(path, str.strip)
+
+
+def _read_packed_refs(common_dir: str) -> Optional[Dict[str, Ref]]:
+    path = os.path.join(common_dir, "packed-refs")
+    if not os.path.exists(path):
+        return {}
+    return _read_memoized(path, parse_packed_refs)
+
+
+def _peel_loose_object(common_dir: str, object_hash: FullHash) -> Optional[FullHash]:
+    with lock:
+        try:
+            return peeled_tags[object_hash]
+        except KeyError:
+            pass
+
+    path = os.path.join(common_dir, "objects", object_hash[:2], object_hash[2:])
+    try:
+        with open(path, "rb") as f:
+            # The header and the first lines of a tag easily fit into a few bytes.
+            data = zlib.decompressobj().decompress(f.read(4096), 1024)
+    except (OSError, zlib.error):
+        return None
+
+    # Format: "<type> <size>\0<content>", for tags the content starts
+    # with "object <hash>\ntype <type>\n".
+    header, _, content = data.partition(b"\x00")
+    if header.startswith(b"commit "):
+        peeled = object_hash
+    elif header.startswith(b"tag "):
+        lines = content.split(b"\n", 2)
+        if len(lines) < 3 or not lines[0].startswith(b"object "):
+            return None
+        tagged = FullHash(lines[0][7:].decode("ascii", "replace"))
+        if lines[1] == b"type commit":
+            peeled = tagged
+        elif lines[1] == b"type tag":
+            peeled_ = _peel_loose_object(common_dir, tagged)
+            if peeled_ is None:
+                return None
+            peeled = peeled_
+        else:
+            return None
+    else:
+        return None
+    with lock:
+        peeled_tags[object_hash] = peeled
+    return peeled
+
+
+def _read_memoized(path: str, parse: Callable[[str], T]) -> Optional[T]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stat_key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    with lock:
+        try:
+            cached_key, value = files[path]
+        except KeyError:
+            pass
+        else:
+            if cached_key == stat_key:
+                return value
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            value = parse(f.read())
+    except (OSError, UnicodeDecodeError, ValueError):
+        return None
+
+    with lock:
+        files[path] = (stat_key, value)
+    return value
+
+
+def parse_packed_refs(text: str) -> Dict[str, Ref]:
+    # Format:
+    #   # pack-refs with: peeled fully-peeled sorted
+    #   <hash> <refname>
+    #   ^<peeled hash>  (only after a ref to an annotated tag)
+    # "peeled" promises that all tags, "fully-peeled" that all refs have
+    # their peeled line if they need one.
+    refs: Dict[str, Ref] = {}
+    traits: List[str] = []
+    last_ref: Optional[Ref] = None
+    for line in text.splitlines():
+        if line.startswith("#"):
+            if line.startswith("# pack-refs with:"):
+                traits = line.split(":", 1)[1].split()
+            continue
+        if line.startswith("^"):
+            if last_ref is None or not HASH_RE.match(line[1:]):
+                raise ValueError("unexpected peeled line in packed-refs")
+            last_ref = refs[last_ref.name] = last_ref._replace(peeled=FullHash(line[1:]))
+            continue
+        target, _, name = line.partition(" ")
+        if not HASH_RE.match(target) or not name:
+            raise ValueError("malformed line in packed-refs")
+        peeled_is_known = (
+            "fully-peeled" in traits
+            or ("peeled" in traits and name.startswith("refs/tags/"))
+        )
+        last_ref = refs[name] = Ref(name, FullHash(target), FullHash(target) if peeled_is_known else None)
+    return refs
@@ -0,0 +1,112 @@
+"""Read reflog files directly, newest entry first.
+
+Reflogs of long-lived branches can have tens of thousands of lines but
+we typically only need the last few of them.  We map the file and
+parse it backwards, lazily, only as far as we have been asked to.  The
+parsed entries are cached and reused as long as size and mtime of the
+file do not change.
+"""
+from __future__ import annotations
+import mmap
+import os
+import threading
+
+from .caches import Cache
+from .types import FullHash
+
+from typing import List, NamedTuple, Optional, Tuple
+
+
+__all__ = (
+    "ReflogLine",
+    "read_reflog",
+)
+
+
+class ReflogLine(NamedTuple):
+    old_hash: FullHash
+    new_hash: FullHash
+    identity: str
+    timestamp: int
+    timezone: str
+    message: str
+
+
+class ParsedReflog:
+    def __init__(self, stat_key: Tuple[int, int]) -> None:
+        self.stat_key = stat_key
+        self.entries: List[ReflogLine] = []
+        #: Offset up to which the file has *not* been parsed yet
+        self.unparsed_end = stat_key[0]
+
+
+reflogs: Cache = Cache(maxsize=64)
+lock = threading.Lock()
+
+
+def read_reflog(path: str, limit: Optional[int] = None, skip: int = 0) -> Optional[List[ReflogLine]]:
+    """Return the entries `skip..skip+limit` of the reflog at `path`.
+
+    Entry `0` is the newest, t.i. it corresponds to `ref@{0}`.  Return
+    `None` if the file does not exist or cannot be read.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stat_key = (stat.st_size, stat.st_mtime_ns)
+
+    with lock:
+        try:
+            parsed = reflogs[path]
+        except KeyError:
+            parsed = None
+        if parsed is None or parsed.stat_key != stat_key:
+            parsed = reflogs[path] = ParsedReflog(stat_key)
+
+        wanted = None if limit is None else skip + limit
+        if parsed.unparsed_end > 0 and (wanted is None or len(parsed.entries) < wanted):
+            try:
+                _parse_backwards(path, parsed, wanted)
+            except (OSError, ValueError):
+                del reflogs[path]
+                return None
+
+        end = None if limit is None else skip + limit
+        return parsed.entries[skip:end]
+
+
+def _parse_backwards(path: str, parsed: ParsedReflog, wanted: Optional[int]) -> None:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < parsed.stat_key[0]:
+            raise ValueError("reflog shrunk while reading")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            end = parsed.unparsed_end
+            entries = parsed.entries
+            while end > 0 and (wanted is None or len(entries) < wanted):
+                # Skip the newline terminating this line
+                line_end = end - 1 if m[end - 1:end] == b"\n" else end
+                start = m.rfind(b"\n", 0, line_end) + 1
+                entry = parse_reflog_line(m[start:line_end])
+                if entry:
+                    entries.append(entry)
+                end = start
+            parsed.unparsed_end = end
+
+
+def parse_reflog_line(line: bytes) -> Optional[ReflogLine]:
+    # Format: "<old> <new> <name> <<email>> <timestamp> <tz>\t<message>"
+    head, _, message = line.partition(b"\t")
+    try:
+        old_hash, new_hash, rest = head.split(b" ", 2)
+        identity, timestamp, timezone = rest.rsplit(b" ", 2)
+        return ReflogLine(
+            FullHash(old_hash.decode("ascii")),
+            FullHash(new_hash.decode("ascii")),
+            identity.decode("utf-8", "replace"),
+            int(timestamp),
+            timezone.decode("ascii"),
+            message.decode("utf-8", "replace"),
+        )
+    except (ValueError, UnicodeDecodeError):
+        return None
@@ -505,7 +505,12 @@ class PaginatedPanel:
         if index == self.limit:
             self.skip = self.skip + self.limit
             sublime.set_timeout_async(self.show)
-        elif self.ret_list:
+            return
+
+        # The panel is closed now.  Closing the generator releases `items`
+        # which, for example, kills a streaming `git log` process.
+        self.item_generator.close()
+        if self.ret_list:
             if index == -1:
                 self.on_selection(None)
             else:
@@ -0,0 +1,246 @@
+from collections import defaultdict
+
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import mock, unstub, verify, when
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.core.git_command import DECODE_ERROR_MESSAGE, GitCommand, GitSavvyError
+from GitSavvy.core.commands import blame
+from GitSavvy.core.commands.blame import (
+    BlameChunk,
+    BlamedLine,
+    RunningBlame,
+    blame_cache,
+    blame_cache_key,
+    cached_blame,
+    cancel_progressive_blame,
+    gs_blame_refresh,
+    next_redraw_interval,
+    parse_incremental_blame,
+    parse_porcelain_blame,
+    prefetch_blame,
+    prefetched_blames,
+    viewport_first_ranges,
+)
+
+
+A = "a" * 40
+B = "b" * 40
+INCREMENTAL_BLAME = """\
+{A} 5 5 1
+author Jane Doe
+author-mail <jane@example.com>
+author-time 1700000000
+summary Fix parser
+previous {B} f
+filename f
+{B} 1 1 4
+author John Roe
+summary Initial commit
+boundary
+filename f
+{A} 7 6 2
+filename f
+""".format(A=A, B=B)
+
+
+PORCELAIN_BLAME = """\
+{B} 1 1 2
+author John Roe
+author-mail <john@example.com>
+summary Initial commit
+boundary
+filename f
+\tdef foo():
+{B} 2 2
+\t    pass
+{A} 5 3 1
+author Jane Doe
+summary Fix caf\u00e9
+previous {B} f
+filename f
+\t# caf\u00e9
+{Z} 3 4 1
+author Not Committed Yet
+filename f
+\t
+""".format(A=A, B=B, Z="0" * 40)
+
+
+class TestParsePorcelainBlame(DeferrableTestCase):
+    def test_parses_lines_and_commits(self):
+        parsed = parse_porcelain_blame(
+            PORCELAIN_BLAME.encode("utf-8"),
+            lambda b: b.decode("utf-8"),
+            lambda commit_hash: commit_hash[:7]
+        )
+        self.assertEqual(parsed.blamed_lines(), [
+            BlamedLine("def foo():", B[:7], 1),
+            BlamedLine("    pass", B[:7], 2),
+            BlamedLine("# caf\u00e9", A[:7], 3),
+            BlamedLine("", "", 4),
+        ])
+        self.assertEqual(list(parsed.line_commits), [0, 0, 1, 2])
+        self.assertEqual(len(parsed.commits), 3)
+        self.assertEqual(parsed.commits[0]["author-mail"], "<john@example.com>")
+        self.assertEqual(parsed.commits[0]["boundary"], "")
+        self.assertEqual(parsed.commits[1]["summary"], "Fix caf\u00e9")
+        self.assertEqual(parsed.commits[1]["long_hash"], A)
+
+    def test_empty_output(self):
+        parsed = parse_porcelain_blame(b"", bytes.decode, lambda commit_hash: commit_hash[:7])
+        self.assertEqual(parsed.blamed_lines(), [])
+
+
+class TestBlameFile(DeferrableTestCase):
+    def tearDown(self):
+        unstub()
+
+    def test_undecodable_output_raises_a_git_savvy_error(self):
+        cmd = gs_blame_refresh(mock())
+        when(cmd).git("blame", ...).thenReturn(PORCELAIN_BLAME.replace("Fix", "Fix \x81").encode("latin-1"))
+        when(cmd).get_encoding_candidates().thenReturn(["utf-8", "windows-1252"])
+        when(cmd).to_short_hash(...).thenReturn("abc1234")
+        when(cmd).some_window().thenReturn(None)
+
+        with self.assertRaises(GitSavvyError) as cm:
+            cmd.blame_file("/repo/f", None, False, None, show_panel_on_error=False)
+        self.assertIn(DECODE_ERROR_MESSAGE, cm.exception.message)
+        self.assertIn("git blame -p -- /repo/f", cm.exception.message)
+
+
+class TestParseIncrementalBlame(DeferrableTestCase):
+    def test_yields_chunks_and_collects_commits(self):
+        commits = defaultdict(lambda: defaultdict(str))
+        chunks = list(parse_incremental_blame(INCREMENTAL_BLAME.splitlines(True), commits))
+        self.assertEqual(chunks, [
+            BlameChunk(A, 5, 1),
+            BlameChunk(B, 1, 4),
+            BlameChunk(A, 6, 2),
+        ])
+        self.assertEqual(commits[A]["summary"], "Fix parser")
+        self.assertEqual(commits[A]["author-mail"], "<jane@example.com>")
+        self.assertEqual(commits[B]["author"], "John Roe")
+        self.assertEqual(commits[B]["long_hash"], B)
+
+    def test_ignores_an_incomplete_last_chunk(self):
+        commits = defaultdict(lambda: defaultdict(str))
+        lines = INCREMENTAL_BLAME.splitlines(True)[:-1]
+        self.assertEqual(len(list(parse_incremental_blame(lines, commits))), 2)
+
+
+class TestViewportFirstRanges(DeferrableTestCase):
+    @p.expand([
+        (100, 50, 10, [["-L", "40,60"], ["-L", "1,39", "-L", "61,100"]]),
+        (100, 5, 10, [["-L", "1,15"], ["-L", "16,100"]]),
+        (100, 95, 10, [["-L", "85,100"], ["-L", "1,84"]]),
+        (20, 10, 10, [[]]),
+    ])
+    def test_ranges(self, line_count, lineno, context, expected):
+        self.assertEqual(viewport_first_ranges(line_count, lineno, context), expected)
+
+
+class TestProgressiveBlameHelpers(DeferrableTestCase):
+    def setUp(self):
+        self.view = mock()
+        when(self.view).is_valid().thenReturn(True)
+        self.cmd = gs_blame_refresh(self.view)
+        when(blame).enqueue_on_ui(...).thenAnswer(lambda fn, *args: fn(*args))
+        when(self.cmd).draw(...)
+
+    def tearDown(self):
+        unstub()
+
+    def test_cancelled_blames_do_not_draw(self):
+        running_blame, rendered = RunningBlame(), mock()
+        self.cmd.draw_unless_cancelled(running_blame, rendered, None)
+        verify(self.cmd, times=1).draw(rendered, None)
+
+        running_blame.cancel()
+        self.cmd.draw_unless_cancelled(running_blame, rendered, None)
+        verify(self.cmd, times=1).draw(...)
+
+    def test_reads_the_working_tree_file_as_git_sees_it(self):
+        when(self.cmd).git_throwing_silently("hash-object", "-w", "--", "/repo/f").thenReturn(B + "\n")
+        when(self.cmd).git_throwing_silently("cat-file", "blob", B, decode=False).thenReturn(b"a\nb\n")
+        when(self.cmd).get_encoding_candidates().thenReturn(["utf-8"])
+        self.assertEqual(self.cmd.read_blamed_contents("/repo/f", None), ["a", "b"])
+
+
+class TestPrefetchBlame(DeferrableTestCase):
+    def setUp(self):
+        self.git = GitCommand()
+        self.key = (A, B, "f", False, None)
+        self.proc = mock({"returncode": 0})
+        when(self.proc).__enter__().thenReturn(self.proc)
+        when(self.proc).__exit__(...)
+        when(self.proc).communicate().thenReturn((PORCELAIN_BLAME.encode("utf-8"), b""))
+        when(self.git).filename_at_commit("/repo/f", "abc1234").thenReturn("/repo/f")
+        when(self.git).get_encoding_candidates().thenReturn(["utf-8"])
+        when(self.git).to_short_hash(...).thenAnswer(lambda commit_hash: commit_hash[:7])
+        when(self.git).git("blame", "-p", None, None, "abc1234", "--", "/repo/f", just_the_proc=True) \
+            .thenReturn(self.proc)
+        when(blame).blame_cache_key(...).thenReturn(self.key)
+        when(blame).try_kill_proc(...)
+
+    def tearDown(self):
+        prefetched_blames.pop(self.key, None)
+        unstub()
+
+    def test_stores_the_blame_in_the_prefetch_cache(self):
+        prefetch_blame(self.git, RunningBlame(), "/repo/f", "abc1234", False, None)
+        self.assertEqual(len(prefetched_blames[self.key].blamed_lines()), 4)
+
+    def test_foreground_blames_kill_a_running_prefetch(self):
+        running_prefetch = RunningBlame()
+        blame._running_prefetch = running_prefetch
+        try:
+            cancel_progressive_blame(mock({"id": lambda: 1}))
+        finally:
+            blame._running_prefetch = None
+        self.assertTrue(running_prefetch.cancelled)
+
+        prefetch_blame(self.git, running_prefetch, "/repo/f", "abc1234", False, None)
+        verify(blame).try_kill_proc(self.proc)
+        self.assertNotIn(self.key, prefetched_blames)
+
+
+class TestNextRedrawInterval(DeferrableTestCase):
+    @p.expand([
+        (0.001, 0.1),
+        (0.025, 0.1),
+        (0.05, 0.2),
+        (0.5, 2.0),
+    ])
+    def test_slow_redraws_get_rarer(self, draw_duration, expected):
+        self.assertAlmostEqual(next_redraw_interval(draw_duration), expected)
+
+
+class TestBlameCacheKey(DeferrableTestCase):
+    def tearDown(self):
+        unstub()
+
+    def test_unchanged_working_tree_shares_the_key_of_head(self):
+        git = GitCommand()
+        when(git).get_repo_path().thenReturn("/repo")
+        when(git).to_short_path("/repo/f.py").thenReturn("f.py")
+        when(git).git_throwing_silently("rev-parse", "HEAD").thenReturn(A + "\n")
+        when(git).git_throwing_silently("hash-object", "--", "/repo/f.py").thenReturn(B + "\n")
+        when(git).git_throwing_silently("rev-parse", "abc1234^{commit}", "abc1234:f.py") \
+            .thenReturn(f"{A}\n{B}\n")
+
+        working_tree_key = blame_cache_key(git, "/repo/f.py", None, False, "-M")
+        self.assertEqual(working_tree_key, (A, B, "f.py", False, "-M"))
+        self.assertEqual(blame_cache_key(git, "/repo/f.py", "abc1234", False, "-M"), working_tree_key)
+        self.assertNotEqual(blame_cache_key(git, "/repo/f.py", "abc1234", True, "-M"), working_tree_key)
+
+    def test_prefetched_blames_move_to_the_main_cache_when_used(self):
+        key = (A, B, "f.py", False, None)
+        result = parse_porcelain_blame(b"", bytes.decode, lambda commit_hash: commit_hash[:7])
+        prefetched_blames[key] = result
+        try:
+            self.assertIs(cached_blame(key), result)
+            self.assertNotIn(key, prefetched_blames)
+            self.assertIs(blame_cache[key], result)
+        finally:
+            blame_cache.pop(key, None)
@@ -230,7 +230,7 @@ class TestDiffViewInternalFunctions(DeferrableTestCase):
         monolithic_noise = self.count_expensive_markers(monolithic, b)
         split_noise = self.count_expensive_markers(split_by_file, b)
 
-        self.assertGreater(monolithic_noise, split_noise)
+        self.assertGreaterEqual(monolithic_noise, split_noise)
         self.assertEqual(split_noise, 1)
 
     def test_compute_reference_document_omits_removed_sections(self):
@@ -299,6 +299,32 @@ class TestDiffViewInternalFunctions(DeferrableTestCase):
         self.assertEqual(reference, expected)
         self.assertEqual(self.count_expensive_markers(reference, b), 2)
 
+    def test_compute_reference_document_on_a_large_shifted_diff(self):
+        def hunk(n, shift):
+            return (
+                f"@@ -{n * 10},3 +{n * 10 + shift},3 @@ def fn_{n}():\n"
+                f"-    return {n}\n"
+                f"+    return {n} + 1\n"
+                f"     # end of fn_{n}\n"
+            )
+
+        header = (
+            "diff --git a/big.py b/big.py\n"
+            "index 1111111..2222222 100644\n"
+            "--- a/big.py\n"
+            "+++ b/big.py\n"
+        )
+        a = header + "".join(hunk(n, 0) for n in range(2000))
+        # `b` moved every hunk and added a line to the middle one
+        b_hunks = [hunk(n, 1) for n in range(2000)]
+        b_hunks[1000] = b_hunks[1000].replace("+    return 1000 + 1\n", "+    return 1000 + 1\n+    extra\n")
+        b = header + "".join(b_hunks)
+
+        reference = module.compute_reference_document(a, b)
+
+        self.assertEqual(reference, b.replace("+    extra\n", ""))
+        self.assertEqual(self.count_expensive_markers(reference, b), 1)
+
     @staticmethod
     def count_expensive_markers(reference: str, current: str) -> int:
         return sum(
@@ -997,6 +1023,9 @@ class TestZooming(DeferrableTestCase):
         view.settings().set('git_savvy.diff_view.context_lines', CONTEXT_LINES)
         cmd = module.gs_diff_refresh(view)
         when(cmd).git(...).thenReturn(b'NEW CONTENT')
+        when(cmd).diff_fingerprints(...).thenReturn({})
+        when(cmd).diff_numstat(...).thenReturn([])
+        when(cmd).files_to_omit(...).thenReturn([])
 
         cmd.run({'unused_edit'})
         verify(cmd).git('diff', None, FLAG, ...)
@@ -1102,6 +1131,9 @@ class TestDiffView(DeferrableTestCase):
         self.view = self.window.new_file()
         self.view.set_scratch(True)
         self.addCleanup(self.view.close)
+        when(gs_diff_refresh).diff_fingerprints(...).thenReturn({})
+        when(gs_diff_refresh).diff_numstat(...).thenReturn([])
+        when(gs_diff_refresh).files_to_omit(...).thenReturn([])
 
     def tearDown(self):
         unstub()
@@ -1253,3 +1285,189 @@ class TestDiffView(DeferrableTestCase):
             diff.commits[0].commit_hash(),
             "9dd4769f090aec1c6bceee49019680d0dba8108d"
         )
+
+    def test_lookups_by_point(self):
+        DIFF = (
+            "commit 1111111111111111111111111111111111111111\n"
+            "diff --git a/a b/a\n"
+            "@@ -1 +1 @@\n"
+            "-a\n"
+            "+A\n"
+            "@@ -5 +5 @@\n"
+            "-b\n"
+            "+B\n"
+            "diff --git a/b b/b\n"
+            "diff --git a/c b/c\n"
+            "@@ -1 +1 @@\n"
+            "-c\n"
+            "+C\n"
+        )
+        diff = module.SplittedDiff.from_string(DIFF)
+        commit, = diff.commits
+        head_a, head_b, head_c = diff.headers
+        hunk_1, hunk_2, hunk_3 = diff.hunks
+
+        self.assertEqual(list(diff.hunks_for_head(head_a)), [hunk_1, hunk_2])
+        self.assertEqual(list(diff.hunks_for_head(head_b)), [])
+        self.assertEqual(list(diff.hunks_for_head(head_c)), [hunk_3])
+        self.assertEqual(diff.head_for_hunk(hunk_3), head_c)
+
+        self.assertEqual(diff.hunk_for_pt(hunk_2.a), hunk_2)
+        self.assertEqual(diff.hunk_for_pt(hunk_2.b - 1), hunk_2)
+        self.assertEqual(diff.hunk_for_pt(head_b.a), None)
+        self.assertEqual(diff.first_hunk_after_pt(hunk_1.a), hunk_2)
+        self.assertEqual(diff.first_hunk_after_pt(hunk_3.a), None)
+        self.assertEqual(diff.head_for_pt(0), None)
+        self.assertEqual(diff.head_for_pt(hunk_2.a), head_a)
+        self.assertEqual(diff.commit_before_pt(len(DIFF)), commit)
+        self.assertEqual(diff.commit_for_hunk(hunk_1), commit)
+
+    def test_parse_numstat(self):
+        output = "3\t1\tfoo.py\0-\t-\timage.png\0" "0\t2\t\0old name.txt\0new name.txt\0"
+        self.assertEqual(module.parse_numstat(output), [
+            module.NumStat("foo.py", None, 3, 1, False),
+            module.NumStat("image.png", None, 0, 0, True),
+            module.NumStat("new name.txt", "old name.txt", 0, 2, False),
+        ])
+
+    @p.expand([
+        (module.OmittedFile("a/b c.py", None, "collapsed", 5000), "    COLLAPSED  a/b c.py  (5000 lines)\n"),
+        (module.OmittedFile("image.png", None, "binary", 0), "    BINARY     image.png\n"),
+    ])
+    def test_omitted_file_lines_are_parseable(self, omitted_file, expected):
+        line = module.format_omitted_file(omitted_file)
+        self.assertEqual(line, expected)
+        self.assertEqual(module.OMITTED_FILE_RE.match(line.rstrip("\n")).group(1), omitted_file.path)
+
+    @p.expand([
+        ("diff --git a/foo.py b/foo.py\nindex 1..2 100644\n--- a/foo.py\n", ["foo.py"]),
+        ("diff --git a/a b/c b/a b/c\n--- a/a b/c\n", ["a b/c"]),
+        (
+            "diff --git a/old.py b/new.py\nsimilarity index 90%\n"
+            "rename from old.py\nrename to new.py\n--- a/old.py\n",
+            ["old.py", "new.py"]
+        ),
+        ('diff --git "a/t\\303\\244st" "b/t\\303\\244st"\n', None),
+    ])
+    def test_section_paths(self, section, expected):
+        self.assertEqual(module.section_paths(section), expected)
+
+
+class TestLargeDiffs(DeferrableTestCase):
+    def setUp(self):
+        self.cmd = gs_diff_refresh(mock())
+        when(self.cmd).get_repo_path().thenReturn("/repo")
+
+    def tearDown(self):
+        module.numstat_cache.clear()
+        unstub()
+
+    def test_numstat_counts_only_the_files_which_changed(self):
+        fingerprints = {"a.py": ("1", "2", ("a.py",)), "b.py": ("3", "4", ("b.py",))}
+        when(self.cmd).git("diff", None, "--numstat", "-z", None, None, None, "--") \
+            .thenReturn("1\t1\ta.py\x003\t0\tb.py\0")
+        self.assertEqual(
+            self.cmd.diff_numstat(False, False, None, None, fingerprints),
+            [module.NumStat("a.py", None, 1, 1, False), module.NumStat("b.py", None, 3, 0, False)]
+        )
+
+        fingerprints["b.py"] = ("3", "5", ("b.py",))
+        when(self.cmd).git("diff", None, "--numstat", "-z", None, None, None, "--", ":(top,literal)b.py") \
+            .thenReturn("4\t0\tb.py\0")
+        self.assertEqual(
+            self.cmd.diff_numstat(False, False, None, None, fingerprints),
+            [module.NumStat("a.py", None, 1, 1, False), module.NumStat("b.py", None, 4, 0, False)]
+        )
+        verify(self.cmd, times=1).git("diff", None, "--numstat", "-z", None, None, None, "--")
+
+    def test_excludes_directories_without_shown_files(self):
+        generated = ["gen/{}.py".format(i) for i in range(module.MAX_EXCLUDED_PATHSPECS)]
+        stats = [module.NumStat(path, None, 10, 0, False) for path in generated + ["gen2/a.py", "src/a.py", "src/b.py"]]
+        omitted_files = [
+            module.OmittedFile(path, None, "generated", 10)
+            for path in generated + ["src/b.py"]
+        ]
+        self.assertEqual(module.exclude_pathspecs(omitted_files, stats), [
+            ":(top,literal,exclude)gen",
+            ":(top,literal,exclude)src/b.py",
+        ])
+
+    def test_gives_up_on_too_many_exclusions(self):
+        paths = ["{}/a.py".format(i) for i in range(module.MAX_EXCLUDED_PATHSPECS + 1)]
+        stats = [module.NumStat(path, None, 10, 0, False) for path in paths]
+        omitted_files = [module.OmittedFile(path, None, "collapsed", 10) for path in paths]
+        self.assertIsNone(module.exclude_pathspecs(omitted_files, stats))
+
+    def test_drops_the_sections_of_omitted_files(self):
+        diff = (
+            " 2 files changed\n\n"
+            "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+            "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n"
+        )
+        self.assertEqual(
+            module.drop_file_sections(diff, {"a.py"}),
+            " 2 files changed\n\ndiff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n"
+        )
+
+
+class TestRefreshWithDiffstat(DeferrableTestCase):
+    A_SECTION = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a\n+A\n"
+    B_SECTION = "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1,2 @@\n b\n+B\n"
+    NEW_B_SECTION = "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1,3 @@\n b\n+B\n+B\n"
+
+    def setUp(self):
+        view = mock()
+        when(view).id().thenReturn(1)
+        when(view).settings().thenReturn({
+            "git_savvy.repo_path": "/repo",
+            "git_savvy.diff_view.show_diffstat": True,
+        })
+        self.cmd = gs_diff_refresh(view)
+        when(self.cmd).get_repo_path().thenReturn("/repo")
+        when(self.cmd).get_encoding_candidates().thenReturn(["utf-8"])
+        when(self.cmd).files_to_omit(...).thenReturn([])
+        self.drawn = []
+        when(module).ensure_on_ui(...).thenAnswer(lambda fn, *args: self.drawn.append(args[3]))
+
+    def tearDown(self):
+        module.diff_snapshots.clear()
+        module.numstat_cache.clear()
+        unstub()
+
+    def test_refreshes_the_diff_and_the_diffstat_incrementally(self):
+        when(self.cmd).diff_fingerprints(...) \
+            .thenReturn({"a.py": ("1", "2", ("a.py",)), "b.py": ("3", "4", ("b.py",))}) \
+            .thenReturn({"a.py": ("1", "2", ("a.py",)), "b.py": ("3", "5", ("b.py",))})
+        when(self.cmd).git(
+            "diff", None, None, None, "--patch", "--no-color", None, None, None, "--", None, decode=False
+        ).thenReturn((self.A_SECTION + self.B_SECTION).encode())
+        when(self.cmd).git("diff", None, "--numstat", "-z", None, None, None, "--") \
+            .thenReturn("1\t1\ta.py\x001\t0\tb.py\0")
+        when(self.cmd).git(
+            "diff", None, None, None, "--patch", "--no-color", None, None, None, "--", ":(top,literal)b.py",
+            decode=False
+        ).thenReturn(self.NEW_B_SECTION.encode())
+        when(self.cmd).git("diff", None, "--numstat", "-z", None, None, None, "--", ":(top,literal)b.py") \
+            .thenReturn("2\t0\tb.py\0")
+
+        self.cmd.run({'unused_edit'})
+        self.cmd.run({'unused_edit'})
+
+        self.assertEqual(self.drawn, [
+            " a.py | 2 +-\n b.py | 1 +\n 2 files changed, 2 insertions(+), 1 deletion(-)\n\n"
+            + self.A_SECTION + self.B_SECTION,
+            " a.py | 2 +-\n b.py | 2 ++\n 2 files changed, 3 insertions(+), 1 deletion(-)\n\n"
+            + self.A_SECTION + self.NEW_B_SECTION,
+        ])
+        verify(self.cmd, times=1).git(
+            "diff", None, None, None, "--patch", "--no-color", None, None, None, "--", None, decode=False
+        )
+        verify(self.cmd, times=1).git("diff", None, "--numstat", "-z", None, None, None, "--")
+
+    @p.expand([
+        ("src/old/f.py", "src/new/f.py", "src/{old => new}/f.py"),
+        ("q/x", "q/r/x", "q/{ => r}/x"),
+        ("a/x", "b_x", "a/x => b_x"),
+    ])
+    def test_names_renames_like_git(self, old_path, path, expected):
+        self.assertEqual(module.diffstat_name(module.NumStat(path, old_path, 0, 0, False)), expected)
@@ -1,3 +1,4 @@
+import os
 import shutil
 import subprocess
 import sys
@@ -6,11 +7,14 @@ import tempfile
 import sublime
 
 from unittesting import DeferrableTestCase
-from GitSavvy.tests.mockito import unstub, when
+from GitSavvy.tests.mockito import unstub, verify, when
 from GitSavvy.tests.parameterized import parameterized as p, param
 
 from GitSavvy.core.git_command import GitCommand
 from GitSavvy.core import git_mixins
+from GitSavvy.core.git_mixins import branches
+from GitSavvy.core.git_mixins.history import COMMIT_DETAILS_FORMAT
+from GitSavvy.core.git_mixins.rewrite import cleanup_message, MERGE_TREE_SUPPORTS_WRITE_TREE
 from GitSavvy.core.git_mixins.worktrees import Worktree, WorktreesMixin
 from GitSavvy.core.utils import resolve_path
 
@@ -236,6 +240,85 @@ class TestGetBranchesParsing(TestGitMixinsUsage):
         ])
 
 
+class SlowRepo(GitCommand):
+    # `%(ahead-behind)` is available but takes too long in this repo
+    git_version = (2, 41, 0)
+
+
+class TestDeferredDistances(TestGitMixinsUsage):
+    def setUp(self):
+        self.addCleanup(branches.distance_cache.clear)
+        self.addCleanup(branches.tracking_cache.clear)
+
+    def test_lists_branches_first_and_fills_in_their_distances_later(self):
+        master, feature, origin_feature, old = (c * 40 for c in "abcd")
+        repo = SlowRepo()
+        when(repo).get_repo_path().thenReturn("slow/repo")
+        repo.update_store({"slow_repo": True})
+        when(branches).run_on_new_thread(...)
+        when(repo).git("for-each-ref", ...).thenReturn("\n".join([
+            join0(["*", "refs/heads/master", "", "", "", "3", "now", "now", master, "M", "", ""]),
+            join0([" ", "refs/heads/feature", "refs/remotes/origin/feature", "origin", "",
+                   "2", "now", "now", feature, "F", "", ""]),
+            join0([" ", "refs/heads/old", "refs/remotes/origin/old", "origin", "",
+                   "1", "now", "now", old, "O", "", ""]),
+            join0([" ", "refs/remotes/origin/feature", "", "", "", "2", "now", "now", origin_feature, "F", "", ""]),
+        ]))
+
+        listed = repo.get_branches()
+        self.assertEqual([b.distance_to_head for b in listed], [None] * 4)
+        self.assertEqual(
+            [b.upstream.status for b in listed if b.upstream],
+            ["", "gone"]  # `origin/old` doesn't exist
+        )
+        self.assertEqual(repo.current_state()["branches"], listed)
+
+        batches = []
+
+        def for_each_ref(*args, **kwargs):
+            refnames = args[2:]
+            batches.append(refnames)
+            return "\n".join(
+                {
+                    "refs/heads/master": join0(["refs/heads/master", master, "", "", "0 0"]),
+                    "refs/heads/feature": join0([
+                        "refs/heads/feature", feature, "refs/remotes/origin/feature", "ahead 1", "2 1"
+                    ]),
+                    "refs/heads/old": join0(["refs/heads/old", old, "refs/remotes/origin/old", "gone", "0 5"]),
+                    "refs/remotes/origin/feature": join0([
+                        "refs/remotes/origin/feature", origin_feature, "", "", "1 1"
+                    ]),
+                }[refname]
+                for refname in refnames
+            )
+
+        when(repo).git("rev-parse", "HEAD", ...).thenReturn(master + "\n")
+        when(repo).git("for-each-ref", ...).thenAnswer(for_each_ref)
+        repo._fill_in_distances(listed, branches.pending_listings["slow/repo"])
+
+        self.assertEqual(batches, [(
+            "refs/heads/master", "refs/heads/feature", "refs/heads/old", "refs/remotes/origin/feature"
+        )])
+        stored = repo.current_state()["branches"]
+        self.assertEqual(
+            [b.distance_to_head for b in stored],
+            [(0, 0), (2, 1), (0, 5), (1, 1)]
+        )
+        self.assertEqual([b.upstream.status for b in stored if b.upstream], ["ahead 1", "gone"])
+
+        # Listing again takes the distances from the cache, nothing left to compute
+        when(repo).git("for-each-ref", ...).thenReturn("\n".join([
+            join0(["*", "refs/heads/master", "", "", "", "3", "now", "now", master, "M", "", ""]),
+            join0([" ", "refs/heads/feature", "refs/remotes/origin/feature", "origin", "",
+                   "2", "now", "now", feature, "F", "", ""]),
+            join0([" ", "refs/heads/old", "refs/remotes/origin/old", "origin", "",
+                   "1", "now", "now", old, "O", "", ""]),
+            join0([" ", "refs/remotes/origin/feature", "", "", "", "2", "now", "now", origin_feature, "F", "", ""]),
+        ]))
+        self.assertEqual(repo.get_branches(), stored)
+        verify(branches, times=1).run_on_new_thread(...)
+
+
 class TestGetWorktreesParsing(TestGitMixinsUsage):
     def test_old_git_uses_non_z_parser(self):
         repo = WorktreesTestRepo(
@@ -309,6 +392,51 @@ class TestGetWorktreesParsing(TestGitMixinsUsage):
         self.assertEqual(actual, [])
 
 
+def commit_details_record(long_hash, *parents):
+    return "\x1f".join([
+        "\x1e" + long_hash, long_hash[:7], " ".join(parents),
+        "A", "a@b", "0", "now", "subject " + long_hash[0], "body\n\n"
+    ])
+
+
+class TestDivergedCommits(TestGitMixinsUsage):
+    def test_reads_entries_and_merges_from_one_log(self):
+        base, a1, a2, b1, merge = (c * 40 for c in "0abcm")
+        repo = GitCommand()
+        when(repo).git(
+            "log", COMMIT_DETAILS_FORMAT, "--topo-order", "{}..{}".format(base, merge)
+        ).thenReturn("".join([
+            commit_details_record(merge, a2, b1),
+            commit_details_record(b1, base),
+            commit_details_record(a2, a1),
+            commit_details_record(a1, base),
+        ]))
+
+        linear = repo.diverged_commits(base, merge, False)
+        self.assertEqual([e.long_hash for e in linear.entries], [a1, a2, b1])
+        self.assertEqual(linear.entries[0].raw_body, "body")
+
+        preserved = repo.diverged_commits(base, merge, True)
+        self.assertEqual([e.long_hash for e in preserved.entries], [a1, a2, merge])
+        self.assertEqual(
+            {merge_hash: [e.long_hash for e in entries] for merge_hash, entries in preserved.merged.items()},
+            {merge: [b1]}
+        )
+        # Both ends are commit hashes, so the model is cached
+        self.assertIs(repo.diverged_commits(base, merge, True), preserved)
+
+
+class TestCleanupMessage(DeferrableTestCase):
+    @p.expand([
+        ("Subject", "Subject\n"),
+        ("\n\nSubject  \n\n\n\nBody\t\n\n", "Subject\n\nBody\n"),
+        ("Subject\n   \n \nBody", "Subject\n\nBody\n"),
+        ("", ""),
+    ])
+    def test_cleans_up_whitespace_like_git_commit(self, msg, expected):
+        self.assertEqual(cleanup_message(msg), expected)
+
+
 class WorktreesTestRepo(WorktreesMixin):
     def __init__(self, git_version, stdout, repo_path):
         self._git_version = git_version
@@ -443,3 +571,26 @@ class TestBranchParsing(EndToEndTestCase):
                 )
             ]
         )
+
+
+class TestRewriteActiveBranch(EndToEndTestCase):
+    def test_rewords_a_commit_and_keeps_local_changes(self):
+        repo = self.init_repo()
+        if repo.git_version < MERGE_TREE_SUPPORTS_WRITE_TREE:
+            self.skipTest("git {} can't rewrite without a checkout".format(repo.git_version))
+        base = repo.get_commit_hash_for_head()
+        for name in ("a", "b"):
+            with open(os.path.join(self.tmp_dir, name), "w") as f:
+                f.write(name + "\n")
+            repo.git("add", name)
+            repo.git("commit", "-m", "Add " + name)
+        with open(os.path.join(self.tmp_dir, "a"), "a") as f:
+            f.write("local change\n")
+
+        commit_chain = repo.perpare_rewrites(repo.log_rebase(base))
+        commit_chain[0].msg = "Add the a"
+        commit_chain[0].modified = True
+        repo.rewrite_active_branch(base, commit_chain)
+
+        self.assertEqual([entry.summary for entry in repo.log_rebase(base)], ["Add the a", "Add b"])
+        self.assertEqual(repo.git("status", "--porcelain"), " M a\n")
@@ -5,7 +5,7 @@ from GitSavvy.tests.parameterized import parameterized as p
 
 from GitSavvy.core.commands.log_graph_renderer import (
     diff, simplify, normalize_tokens, apply_diff, Ins, Del, Replace, Flush,
-    text_width, trunc_and_pad
+    text_width, trunc_and_pad, char_width, width_table, WIDTH_TABLE_END
 )
 
 
@@ -148,3 +148,13 @@ class TestGraphDiff(DeferrableTestCase):
         actual = trunc_and_pad(text, width)
         self.assertEqual(actual, expected)
         self.assertEqual(text_width(actual), width)
+
+    @p.expand([
+        (0x80,), (0x0301,), (0x0600,), (0x1100,), (0x200D,), (0x2E80,), (0x4E2D,),
+        (0xFE0F,), (0xFF01,), (0x1F3FB,), (0x1F4E6,), (0x2A6D6,), (WIDTH_TABLE_END - 1,),
+    ])
+    def test_width_table_agrees_with_char_width(self, codepoint):
+        starts, widths = width_table()
+        idx = max(i for i, start in enumerate(starts) if start <= codepoint)
+        self.assertEqual(widths[idx], char_width(codepoint))
+        self.assertEqual(text_width(chr(codepoint)), char_width(codepoint))
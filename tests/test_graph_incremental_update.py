@@ -0,0 +1,118 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import unstub, verify, when
+
+from GitSavvy.core.git_command import GitCommand
+from GitSavvy.core.commands.log_graph_renderer import (
+    compute_incremental_update,
+    DrawnTips,
+    GraphLine,
+    MAX_MOVED_REFS_FOR_INCREMENTAL_REFRESH,
+)
+
+
+def full(short_hash):
+    return short_hash + "0" * (40 - len(short_hash))
+
+
+ARGS = ["log", "--graph", "--decorate", "--format=%h%00%D%00%s%00%ad%00%p"]
+A, B, C, D = "a000001", "b000002", "c000003", "d000004"
+GRAPH = [
+    "● {} (HEAD -> master) second\n".format(B),
+    "| ● {} (feature) other\n".format(C),
+    "|/\n",
+    "● {} first\n".format(A),
+]
+DRAWN = DrawnTips(tuple(ARGS), {
+    "HEAD": full(B),
+    "refs/heads/master": full(B),
+    "refs/heads/feature": full(C),
+})
+
+
+def record(graph_art, commit_hash, decoration, parents):
+    return "%00".join((graph_art + commit_hash, decoration, "subject", "info", parents)) + "\n"
+
+
+class TestIncrementalUpdate(DeferrableTestCase):
+    def setUp(self):
+        self.git = GitCommand()
+        when(self.git).is_ancestor_of(...).thenReturn(True)
+
+    def tearDown(self):
+        unstub()
+
+    def compute(self, tips, previous=DRAWN, args=ARGS):
+        return compute_incremental_update(self.git, args, GRAPH, previous, tips)
+
+    def test_nothing_changed_only_rereads_the_head_commit(self):
+        when(self.git).git_streaming("log", "--no-walk=unsorted", "--decorate", ARGS[3], B, got_proc=None).thenReturn(
+            [record("", B, "HEAD -> master", A)]
+        )
+        update = self.compute(dict(DRAWN.tips))
+        self.assertEqual(update.new_lines, [])
+        self.assertEqual(update.updated_lines, {0: GraphLine("● " + B, "HEAD -> master", "subject", "info", A)})
+        verify(self.git, times=1).git_streaming(...)
+
+    def test_prepends_new_commits_and_rereads_the_old_tip(self):
+        tips = dict(DRAWN.tips, HEAD=full(D), **{"refs/heads/master": full(D)})
+        when(self.git).git_streaming(*ARGS, "--not", full(B), full(C), got_proc=None).thenReturn(
+            [record("* ", D, "HEAD -> master", B)]
+        )
+        when(self.git).git_streaming(
+            "log", "--no-walk=unsorted", "--decorate", ARGS[3], B, got_proc=None
+        ).thenReturn(
+            [record("", B, "", A)]
+        )
+
+        update = self.compute(tips)
+        self.assertEqual(update.new_lines, [GraphLine("* " + D, "HEAD -> master", "subject", "info", B)])
+        self.assertEqual(update.updated_lines, {0: GraphLine("● " + B, "", "subject", "info", A)})
+
+    def test_rereads_commits_which_only_got_a_new_ref(self):
+        tips = dict(DRAWN.tips, **{"refs/heads/new": full(A)})
+        when(self.git).git_streaming(*ARGS, "--not", full(B), full(C), got_proc=None).thenReturn([])
+        when(self.git).git_streaming("log", "--no-walk=unsorted", ...).thenReturn(
+            [record("", A, "new", "")]
+        )
+
+        update = self.compute(tips)
+        self.assertEqual(update.new_lines, [])
+        self.assertEqual(update.updated_lines, {3: GraphLine("● " + A, "new", "subject", "info", "")})
+
+    def test_falls_back_if_the_args_changed(self):
+        self.assertIsNone(self.compute(dict(DRAWN.tips), args=ARGS + ["--all"]))
+        self.assertIsNone(self.compute(dict(DRAWN.tips), previous=None))
+
+    def test_falls_back_if_a_ref_got_deleted(self):
+        tips = dict(DRAWN.tips)
+        del tips["refs/heads/feature"]
+        self.assertIsNone(self.compute(tips))
+
+    def test_falls_back_if_a_ref_moved_not_forward(self):
+        tips = dict(DRAWN.tips, **{"refs/heads/feature": full(A)})
+        when(self.git).is_ancestor_of(full(C), full(A)).thenReturn(False)
+        self.assertIsNone(self.compute(tips))
+
+    def test_falls_back_if_too_many_refs_moved(self):
+        old_tips = {
+            "refs/heads/b{}".format(i): full(A)
+            for i in range(MAX_MOVED_REFS_FOR_INCREMENTAL_REFRESH + 1)
+        }
+        tips = {ref: full(B) for ref in old_tips}
+        self.assertIsNone(self.compute(tips, previous=DrawnTips(tuple(ARGS), old_tips)))
+        verify(self.git, times=0).is_ancestor_of(...)
+
+    def test_falls_back_if_new_commits_are_not_on_top(self):
+        # `feature` moved forward, but its new commit is not on top of the first line.
+        tips = dict(DRAWN.tips, **{"refs/heads/feature": full(D)})
+        when(self.git).git_streaming(*ARGS, "--not", full(B), full(C), got_proc=None).thenReturn(
+            [record("* ", D, "feature", C)]
+        )
+        self.assertIsNone(self.compute(tips))
+
+    def test_falls_back_on_merges_and_forks_on_top(self):
+        tips = dict(DRAWN.tips, HEAD=full(D), **{"refs/heads/master": full(D)})
+        when(self.git).git_streaming(*ARGS, "--not", full(B), full(C), got_proc=None).thenReturn(
+            [record("*   ", D, "HEAD -> master", " ".join((B, C))), "|\\\n"]
+        )
+        self.assertIsNone(self.compute(tips))
@@ -0,0 +1,126 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import unstub, verify, when
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.core.git_command import GitCommand
+from GitSavvy.core.commands import log_graph_search
+from GitSavvy.core.commands.log_graph import preview_filtered_graph
+from GitSavvy.core.commands.log_graph_search import CommitIndex, IndexEntry, compile_filters, indexes
+
+
+ENTRIES = [
+    IndexEntry("aaa1111" + "0" * 33, 1577836800, "Jane Doe <jane@example.com>", "Fix parser"),
+    IndexEntry("bbb2222" + "0" * 33, 1609459200, "John Roe <john@example.com>", "Add feature"),
+    IndexEntry("ccc3333" + "0" * 33, 1640995200, "Jane Doe <jane@example.com>", "fixup! Add feature"),
+]
+
+
+def matching(filters):
+    predicate = compile_filters(filters)
+    assert predicate is not None
+    return [entry.commit_hash[:7] for entry in ENTRIES if predicate(entry)]
+
+
+class TestCompileFilters(DeferrableTestCase):
+    @p.expand([
+        ("--author=Jane", ["aaa1111", "ccc3333"]),
+        ("--author Jane", ["aaa1111", "ccc3333"]),
+        ("--author=jane@", ["aaa1111", "ccc3333"]),
+        ("--author=jane -i", ["aaa1111", "ccc3333"]),
+        ("--author=JANE", []),
+        ("--grep=feature", ["bbb2222", "ccc3333"]),
+        ("--grep=^Add", ["bbb2222"]),
+        ("--grep=fix -i", ["aaa1111", "ccc3333"]),
+        ("--grep=fixup! -F", ["ccc3333"]),
+        ("--grep=Fix --grep=parser --all-match", ["aaa1111"]),
+        ("--grep=feature --invert-grep", ["aaa1111"]),
+        ("--author=Jane --grep=feature", ["ccc3333"]),
+        ("--since=2020-06-01", ["bbb2222", "ccc3333"]),
+        ("--until=2020-06-01", ["aaa1111"]),
+    ])
+    def test_matching(self, filters, expected):
+        self.assertEqual(matching(filters), expected)
+
+    @p.expand([
+        ("-Sneedle",),
+        ("-Gneedle",),
+        ("master",),
+        ("--author",),
+        ("--since=yesterday",),
+        ("--grep=(",),
+        ("--grep='unbalanced",),
+    ])
+    def test_unsupported_filters(self, filters):
+        self.assertIsNone(compile_filters(filters))
+
+
+class TestCommitIndexLookup(DeferrableTestCase):
+    def setUp(self):
+        self.index = CommitIndex()
+        entries = ENTRIES + [IndexEntry("aaa1122" + "0" * 33, 0, "", "")]
+        self.index.entries = {entry.commit_hash: entry for entry in entries}
+        self.index.sorted_hashes = sorted(self.index.entries)
+
+    @p.expand([
+        ("bbb2222", "bbb2222"),
+        ("bbb22", "bbb2222"),
+        ("bbb222200", "bbb2222"),
+        ("aaa111", "aaa1111"),
+        ("aaa11", None),
+        ("ddd4444", None),
+        ("ccc4", None),
+    ])
+    def test_resolves_abbreviations_of_any_length(self, short_hash, expected):
+        entry = self.index.lookup(short_hash)
+        self.assertEqual(entry.commit_hash[:7] if entry else None, expected)
+
+
+class TestPreviewFilteredGraph(DeferrableTestCase):
+    GRAPH = "● aaa1111 Fix parser\n● bbb2222 Add feature\n● ccc3333 fixup! Add feature\n"
+
+    def setUp(self):
+        index = CommitIndex()
+        index.entries = {entry.commit_hash: entry for entry in ENTRIES}
+        index.sorted_hashes = sorted(index.entries)
+        index.ready = True
+        indexes["/repo"] = index
+
+    def tearDown(self):
+        indexes.clear()
+
+    def test_filters_the_drawn_graph(self):
+        self.assertEqual(
+            preview_filtered_graph("/repo", self.GRAPH, "--author=Jane"),
+            "● aaa1111 Fix parser\n● ccc3333 fixup! Add feature\n\n"
+        )
+
+    def test_cannot_preview_commits_the_index_does_not_know(self):
+        graph = "● ddd4444 Fetched just now\n" + self.GRAPH
+        self.assertIsNone(preview_filtered_graph("/repo", graph, "--author=Jane"))
+
+
+class TestRefreshIndex(DeferrableTestCase):
+    def setUp(self):
+        self.git = GitCommand()
+        when(self.git).get_repo_path().thenReturn("/repo")
+        when(log_graph_search).ensure_index(...)
+
+    def tearDown(self):
+        indexes.clear()
+        unstub()
+
+    def test_updates_an_index_if_the_refs_moved(self):
+        indexes["/repo"] = CommitIndex()
+        indexes["/repo"].tips = {"HEAD": "a" * 40}
+        log_graph_search.refresh_index(self.git, {"HEAD": "b" * 40})
+        verify(log_graph_search).ensure_index(self.git)
+
+    def test_does_nothing_if_the_index_is_current(self):
+        indexes["/repo"] = CommitIndex()
+        indexes["/repo"].tips = {"HEAD": "a" * 40}
+        log_graph_search.refresh_index(self.git, {"HEAD": "a" * 40})
+        verify(log_graph_search, times=0).ensure_index(...)
+
+    def test_does_not_build_an_index_nobody_asked_for(self):
+        log_graph_search.refresh_index(self.git, {"HEAD": "a" * 40})
+        verify(log_graph_search, times=0).ensure_index(...)
@@ -0,0 +1,88 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import mock, unstub, verify, when
+
+from GitSavvy.core.commands import log_graph_renderer, log_graph_snapshots
+from GitSavvy.core.commands.log_graph_renderer import gs_log_graph_refresh, snapshot_key
+from GitSavvy.core.commands.log_graph_snapshots import Snapshot, SnapshotCache, freeze, remember_snapshot
+
+
+class TestSnapshotCache(DeferrableTestCase):
+    def test_evicts_least_recently_used_by_count(self):
+        cache = SnapshotCache(maxsize=2, max_total_size=100)
+        cache["a"] = Snapshot(1, "a")
+        cache["b"] = Snapshot(1, "b")
+        cache["a"]
+        cache["c"] = Snapshot(1, "c")
+        self.assertEqual(list(cache), ["a", "c"])
+
+    def test_evicts_until_total_size_fits(self):
+        cache = SnapshotCache(maxsize=10, max_total_size=10)
+        cache["a"] = Snapshot(1, "xxxx")
+        cache["b"] = Snapshot(1, "yyyy")
+        cache["c"] = Snapshot(1, "zzzz")
+        self.assertEqual(list(cache), ["b", "c"])
+        self.assertEqual(cache.total_size(), 8)
+
+    def test_keeps_a_single_oversized_snapshot(self):
+        cache = SnapshotCache(maxsize=10, max_total_size=2)
+        cache["a"] = Snapshot(1, "xxxx")
+        self.assertEqual(list(cache), ["a"])
+
+
+class TestFreeze(DeferrableTestCase):
+    def test_turns_nested_lists_into_tuples(self):
+        key = ("/repo", ["master", "dev"], (["a.py"], "--author=me"))
+        self.assertEqual(
+            freeze(key),
+            ("/repo", ("master", "dev"), (("a.py",), "--author=me"))
+        )
+        hash(freeze(key))
+
+
+class TestWarmStart(DeferrableTestCase):
+    def setUp(self):
+        self.settings = {
+            "git_savvy.log_graph_view": True,
+            "git_savvy.repo_path": "/repo",
+            "git_savvy.log_graph_view.all_branches": True,
+        }
+        self.view = mock()
+        when(self.view).is_loading().thenReturn(False)
+        when(self.view).size().thenReturn(0)
+        when(self.view).settings().thenReturn(self.settings)
+        self.cmd = gs_log_graph_refresh(self.view)
+        when(self.cmd).get_repo_path().thenReturn("/repo")
+
+        when(log_graph_renderer).prelude(self.view).thenReturn("PRELUDE\n")
+        when(log_graph_renderer).replace_view_content(...)
+        when(log_graph_renderer).make_aborter(...)
+        when(log_graph_renderer).we_have_seen_the_head_commit(...)
+        when(log_graph_renderer).enqueue_on_worker(...)
+        when(log_graph_snapshots).compute_ref_fingerprint("/repo").thenReturn(1)
+        remember_snapshot(snapshot_key(self.view), 1, "● abc\n")
+
+    def tearDown(self):
+        log_graph_snapshots.snapshots.clear()
+        unstub()
+
+    def test_paints_the_snapshot_of_the_same_graph(self):
+        self.cmd.run(None)
+        verify(log_graph_renderer).replace_view_content(self.view, "PRELUDE\n● abc\n")
+
+    def test_skips_the_snapshot_if_the_refs_moved(self):
+        when(log_graph_snapshots).compute_ref_fingerprint("/repo").thenReturn(2)
+        self.cmd.run(None)
+        verify(log_graph_renderer, times=0).replace_view_content(self.view, "PRELUDE\n● abc\n")
+        verify(log_graph_renderer).replace_view_content(self.view, "PRELUDE\n", None)
+
+    def test_skips_the_snapshot_if_the_refs_are_unknown(self):
+        when(log_graph_snapshots).compute_ref_fingerprint("/repo").thenReturn(None)
+        self.cmd.run(None)
+        verify(log_graph_renderer, times=0).replace_view_content(self.view, "PRELUDE\n● abc\n")
+
+    def test_skips_the_snapshot_of_other_args(self):
+        self.settings["git_savvy.log_graph_view.all_branches"] = False
+        self.settings["git_savvy.log_graph_view.branches"] = ["master"]
+        self.cmd.run(None)
+        verify(log_graph_renderer, times=0).replace_view_content(self.view, "PRELUDE\n● abc\n")
+        verify(log_graph_renderer).replace_view_content(self.view, "PRELUDE\n", None)
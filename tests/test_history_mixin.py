@@ -5,15 +5,20 @@ from GitSavvy.tests.mockito import unstub, when, verify
 from GitSavvy.tests.parameterized import parameterized as p
 
 from GitSavvy.core.git_mixins.history import (
+    commit_details_cache,
     commit_info_cache,
+    CommitDetails,
     CommitHistoryInfo,
     file_history_cache,
     FileHistoryEntry,
     FileHistoryInfo,
     FileStatus,
     HistoryMixin,
+    LogEntry,
+    RefLogEntry,
     parse_file_history_log,
-    parse_name_status_z
+    parse_name_status_z,
+    split_along_first_parents
 )
 
 
@@ -57,6 +62,46 @@ class TestDescribeGraphLine(DeferrableTestCase):
         with self.assertRaises(RuntimeError):
             test.log(follow=True)
 
+    def test_iter_log_follow_requires_file_path_before_streaming(self):
+        test = HistoryMixin()
+
+        with self.assertRaises(RuntimeError):
+            test.iter_log(follow=True)
+
+    def test_iter_log_parses_streamed_entries_with_multiline_bodies(self):
+        test = HistoryMixin()
+        when(test).git_streaming("log", ...).thenReturn(line for line in [
+            "abc\n", f"{'a' * 40}\n", "HEAD -> master\n", "Fix it\n", "Jane\n", "jane@example.com\n",
+            f"1700000000{NUL}Fix it\n", "\n", f"More words{NUL}{NUL}\n",
+            "\n",
+            "def\n", f"{'d' * 40}\n", "\n", "Initial\n", "John\n", "john@example.com\n",
+            f"1600000000{NUL}Initial\n", f"{NUL}{NUL}\n",
+        ])
+        self.assertEqual(list(test.iter_log()), [
+            LogEntry("abc", "a" * 40, "HEAD -> master", "Fix it", "Fix it\n\nMore words",
+                     "Jane", "jane@example.com", "1700000000"),
+            LogEntry("def", "d" * 40, "", "Initial", "Initial",
+                     "John", "john@example.com", "1600000000"),
+        ])
+
+    def test_iter_reflog_streams_the_rest_if_the_file_is_not_readable(self):
+        first, second = (
+            RefLogEntry("abc", "a" * 40, "Fix it", "commit: Fix it", f"HEAD@{{{n}}}", "Jane", "1700000000")
+            for n in range(2)
+        )
+        test = HistoryMixin()
+        when(test)._reflog_from_file(2, 0).thenReturn([first, second])
+        when(test)._reflog_from_file(2, 2).thenReturn(None)
+        when(test).git_streaming("reflog", "--skip=2", ...).thenReturn(line for line in [
+            "def\n", f"{'d' * 40}\n", "Initial\n", "commit (initial): Initial\n", "HEAD@{2}\n",
+            "John\n", f"1600000000{NUL}{NUL}\n",
+        ])
+        self.assertEqual(list(test.iter_reflog(batch_size=2)), [
+            first,
+            second,
+            RefLogEntry("def", "d" * 40, "Initial", "commit (initial): Initial", "HEAD@{2}", "John", "1600000000"),
+        ])
+
     def test_log_commits_linewise_follow_requires_file_path(self):
         test = HistoryMixin()
 
@@ -325,6 +370,49 @@ class TestDescribeGraphLine(DeferrableTestCase):
 
         self.assertIsNone(result)
 
+    def test_fetch_commit_details_reads_all_missing_commits_at_once(self):
+        A, B, M = "a" * 40, "b" * 40, "c" * 40
+        test = HistoryMixin()
+        when(test).git("log", ...).thenReturn(
+            f"{RS}{M}{US}ccccccc{US}{A} {B}{US}Jane{US}jane@example.com{US}1700000000"
+            f"{US}2023-11-14 23:13:20 +0100{US}Merge b{US}Merge b\n\nDetails\n\n"
+            f"{RS}{A}{US}aaaaaaa{US}{US}John{US}john@example.com{US}1600000000"
+            f"{US}2020-09-13 14:26:40 +0200{US}Initial{US}Initial\n\n"
+        )
+        commit_details_cache.clear()
+        commit_info_cache.clear()
+
+        details = test.fetch_commit_details(["ccccccc", A, "ccccccc"])
+
+        self.assertEqual(list(details), ["ccccccc", A])
+        self.assertEqual(details["ccccccc"].parents, (A, B))
+        self.assertEqual(details["ccccccc"].raw_body, "Merge b\n\nDetails")
+        self.assertEqual(details[A].parents, ())
+        self.assertEqual(commit_info_cache["aaaaaaa"], CommitHistoryInfo("Initial", "2020-9-13"))
+        self.assertTrue(test.commit_is_merge(M))
+        self.assertEqual(test.commit_parents("ccccccc"), [A, B])
+        verify(test, times=1).git("log", ...)
+
+    def test_commit_parents_of_refs_are_read_with_rev_list(self):
+        A, B, M = "a" * 40, "b" * 40, "c" * 40
+        test = HistoryMixin()
+        when(test).git("rev-list", "-1", "--parents", "HEAD").thenReturn(f"{M} {A} {B}\n")
+        commit_details_cache.clear()
+
+        self.assertEqual(test.commit_parents("HEAD"), [A, B])
+        self.assertTrue(test.commit_is_merge("HEAD"))
+        verify(test, times=0).git("log", ...)
+
+    def test_commit_parents_fall_back_to_rev_list_for_unknown_hashes(self):
+        A = "a" * 40
+        test = HistoryMixin()
+        when(test).git("log", ...).thenReturn("")
+        when(test).git("rev-list", "-1", "--parents", "deadbee").thenReturn(f"{'d' * 40} {A}\n")
+        commit_details_cache.clear()
+
+        self.assertEqual(test.commit_parents("deadbee"), [A])
+        self.assertFalse(test.commit_is_merge("deadbee"))
+
     def test_commit_subject_and_date_uses_cache_without_fetching(self):
         from GitSavvy.core.git_mixins.history import CommitInfo
         test = HistoryMixin()
@@ -517,3 +605,34 @@ class TestDescribeGraphLine(DeferrableTestCase):
 
     def test_parse_name_status_z_ignores_empty_records(self):
         self.assertEqual(list(parse_name_status_z("")), [])
+
+
+def commit(long_hash, *parents):
+    return CommitDetails(long_hash, long_hash, parents, "A", "a@b", "0", "", long_hash, long_hash)
+
+
+class TestSplitAlongFirstParents(DeferrableTestCase):
+    def test_assigns_merged_commits_to_their_merge(self):
+        # M2 merges `c` (which merges `b1`) into M1, M1 merges `a1..a2`
+        # into `base` which is outside of the range.
+        commits = [
+            commit("M2", "M1", "c"),
+            commit("c", "b2", "b1"),
+            commit("b1", "b2"),
+            commit("b2", "M1"),
+            commit("M1", "base", "a2"),
+            commit("a2", "a1"),
+            commit("a1", "base"),
+        ]
+        parts = split_along_first_parents(commits)
+        self.assertEqual(
+            [(part.commit.long_hash, sorted(part.owned[1:]), part.left_range) for part in parts],
+            [
+                ("M2", ["b1", "b2", "c"], False),
+                ("M1", ["a1", "a2"], True),
+            ]
+        )
+        self.assertEqual([part.owned[0] for part in parts], ["M2", "M1"])
+
+    def test_empty_range(self):
+        self.assertEqual(split_along_first_parents([]), [])
@@ -0,0 +1,100 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import mock, unstub, when
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.common.util.parse_diff import parse_diff
+from GitSavvy.core.commands.diff import compute_no_context_patch_for_sel
+from GitSavvy.core.commands.inline_diff import (
+    diff_view_hunks,
+    gs_inline_diff_refresh,
+    gs_inline_diff_stage_or_reset_hunk,
+    zero_context_diff,
+)
+
+
+ORIGINAL = "".join("line {}\n".format(n) for n in range(1, 11))
+
+
+class TestGetInlineDiffContents(DeferrableTestCase):
+    def setUp(self):
+        self.view = mock()
+        when(self.view).id().thenReturn(-1)
+
+    def tearDown(self):
+        diff_view_hunks.pop(-1, None)
+        unstub()
+
+    @p.expand([
+        (
+            "modifications",
+            "@@ -2 +2 @@\n-line 2\n+LINE 2\n@@ -8,2 +8 @@\n-line 8\n-line 9\n+line 8-9\n",
+            ORIGINAL
+            .replace("line 2\n", "line 2\nLINE 2\n")
+            .replace("line 8\nline 9\n", "line 8\nline 9\nline 8-9\n"),
+            [(1, 3), (8, 11)]
+        ),
+        (
+            "additions_and_removals",
+            "@@ -0,0 +1 @@\n+new first\n@@ -5 +5,0 @@\n-line 5\n@@ -10,0 +11 @@\n+new last\n",
+            "new first\n" + ORIGINAL + "new last\n",
+            [(0, 1), (5, 6), (11, 12)]
+        ),
+        (
+            "missing_newline_at_eof",
+            "@@ -10 +10 @@\n-line 10\n+line ten\n\\ No newline at end of file\n",
+            ORIGINAL + "line ten\n No newline at end of file\n",
+            [(9, 12)]
+        ),
+    ])
+    def test_merges_hunks_into_the_original(self, _, diff, expected, sections):
+        cmd = gs_inline_diff_refresh(self.view)
+        contents, hunks = cmd.get_inline_diff_contents(ORIGINAL, parse_diff(diff))
+        self.assertEqual(contents, expected)
+        self.assertEqual([(h.section_start, h.section_end) for h in hunks], sections)
+        self.assertIs(diff_view_hunks[-1], hunks)
+
+
+class TestBatchedInlinePatches(DeferrableTestCase):
+    DIFF = "@@ -2 +2 @@\n-line 2\n+LINE 2\n@@ -5 +4,0 @@\n-line 5\n@@ -10,0 +10 @@\n+new last\n"
+
+    def setUp(self):
+        self.view = mock()
+        when(self.view).id().thenReturn(-1)
+
+    def tearDown(self):
+        diff_view_hunks.pop(-1, None)
+        unstub()
+
+    def patch_for_rows(self, rows, reverse=False, diff=DIFF):
+        _, hunks = gs_inline_diff_refresh(self.view).get_inline_diff_contents(
+            ORIGINAL, parse_diff(diff)
+        )
+        diff, line_starts = zero_context_diff("f", hunks)
+        return compute_no_context_patch_for_sel(diff, {line_starts[row] for row in rows}, reverse)
+
+    def test_selected_lines_of_different_hunks_form_one_patch(self):
+        # rows: 1 "line 2", 2 "LINE 2", 5 "line 5", 11 "new last"
+        patch = self.patch_for_rows({2, 5, 11})
+        self.assertEqual(patch, (
+            "diff --git a/f b/f\n--- a/f\n+++ b/f\n"
+            "@@ -2,0 +3,1 @@\n+LINE 2\n"
+            "@@ -5,1 +5,0 @@\n-line 5\n"
+            "@@ -10,0 +11,1 @@\n+new last\n"
+        ))
+
+    def test_unselected_lines_split_a_run_of_changes(self):
+        # rows: 1 "line 2", 2 "line 3", 3 "line 4", 4 "LINE 2-4"
+        diff = "@@ -2,3 +2 @@\n-line 2\n-line 3\n-line 4\n+LINE 2-4\n"
+        patch = self.patch_for_rows({1, 3}, diff=diff)
+        self.assertEqual(patch, (
+            "diff --git a/f b/f\n--- a/f\n+++ b/f\n"
+            "@@ -2,1 +1,0 @@\n-line 2\n"
+            "@@ -4,1 +2,0 @@\n-line 4\n"
+        ))
+
+    def test_hunk_command_expands_rows_to_whole_hunks(self):
+        _, hunks = gs_inline_diff_refresh(self.view).get_inline_diff_contents(
+            ORIGINAL, parse_diff(self.DIFF)
+        )
+        rows = gs_inline_diff_stage_or_reset_hunk.rows_to_apply(None, hunks, {2, 11})
+        self.assertEqual(list(rows), [1, 2, 11])
@@ -0,0 +1,37 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.mockito import spy2, unstub, verify
+
+from GitSavvy.core.commands import intra_line_colorizer as module
+from GitSavvy.core.parse_diff import SplittedDiff
+
+
+HUNK = """\
+@@ -1,2 +1,2 @@
+-    return foo(bar)
++    return foo(baz)
+"""
+
+
+def chunk_at(offset):
+    diff = SplittedDiff.from_string("\n" * offset + HUNK, 0)
+    chunk, = filter(module.is_modification_group, module.group_non_context_lines(diff.hunks[0]))
+    return chunk
+
+
+class TestIntraLineDiffCache(DeferrableTestCase):
+    def setUp(self):
+        module.intra_line_diffs.clear()
+
+    def tearDown(self):
+        module.intra_line_diffs.clear()
+        unstub()
+
+    def test_moved_chunk_reuses_the_result_but_is_shifted(self):
+        spy2(module._intra_line_diff_for_chunk)
+        from_regions, to_regions = module.intra_line_diff_for_chunk(chunk_at(0))
+        moved_from, moved_to = module.intra_line_diff_for_chunk(chunk_at(100))
+
+        verify(module, times=1)._intra_line_diff_for_chunk(...)
+        self.assertTrue(from_regions and to_regions)
+        self.assertEqual([(r.a + 100, r.b + 100) for r in from_regions], [(r.a, r.b) for r in moved_from])
+        self.assertEqual([(r.a + 100, r.b + 100) for r in to_regions], [(r.a, r.b) for r in moved_to])
@@ -0,0 +1,17 @@
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.core.commands.line_history import merge_ranges
+
+
+class TestMergeRanges(DeferrableTestCase):
+    @p.expand([
+        ([(1, 10)], ((1, 10),)),
+        ([(1, 5), (6, 10)], ((1, 10),)),
+        ([(3, 9), (1, 5)], ((1, 9),)),
+        ([(9, 3)], ((3, 9),)),
+        ([(1, 5), (7, 10)], ((1, 5), (7, 10))),
+        ([(1, 10), (2, 3)], ((1, 10),)),
+    ])
+    def test_merge_ranges(self, ranges, expected):
+        self.assertEqual(merge_ranges(ranges), expected)
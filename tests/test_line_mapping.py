@@ -0,0 +1,79 @@
+import random
+
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.core.line_mapping import LineMap
+
+
+def walk_hunks(hunks, line):
+    # The straightforward scan over all hunks `LineMap` replaces.
+    for head_start, head_length, saved_start, saved_length in reversed(hunks):
+        head_start = head_start if head_length else head_start + 1
+        saved_start = saved_start if saved_length else saved_start + 1
+        head_end = head_start + head_length
+        saved_end = saved_start + saved_length
+        if head_end <= line:
+            return saved_end + line - head_end
+        elif head_start <= line:
+            return saved_start
+    return line
+
+
+def reverse_walk_hunks(hunks, line):
+    for head_start, head_length, saved_start, saved_length in reversed(hunks):
+        if saved_length == 0:
+            saved_start += 1
+        elif head_length == 0:
+            saved_start -= 1
+        head_end = head_start + head_length
+        saved_end = saved_start + saved_length
+        if saved_end <= line:
+            return head_end + line - saved_end
+        elif saved_start <= line:
+            return head_start
+    return line
+
+
+def random_hunks(rnd):
+    hunks = []
+    head_line = saved_line = 0
+    for _ in range(rnd.randint(0, 6)):
+        gap = rnd.randint(1, 5)
+        head_length, saved_length = rnd.choice([(0, 1), (1, 0), (1, 1), (2, 3), (3, 1), (0, 2)])
+        head_line += gap
+        saved_line += gap
+        hunks.append((
+            head_line - (0 if head_length else 1), head_length,
+            saved_line - (0 if saved_length else 1), saved_length
+        ))
+        head_line += head_length - (0 if head_length else 1)
+        saved_line += saved_length - (0 if saved_length else 1)
+    return hunks
+
+
+class TestLineMap(DeferrableTestCase):
+    @p.expand([
+        ("no_hunks", []),
+        ("modification", [(3, 2, 3, 4)]),
+        ("deletion", [(3, 2, 2, 0)]),
+        ("addition", [(2, 0, 3, 2)]),
+        ("addition_at_start", [(0, 0, 1, 3)]),
+        ("mixed", [(1, 1, 1, 0), (4, 0, 4, 2), (7, 3, 9, 1)]),
+    ])
+    def test_agrees_with_walking_the_hunks(self, _, hunks):
+        forward = LineMap.from_hunks(hunks)
+        backward = LineMap.from_hunks(hunks, reverse=True)
+        for line in range(0, 20):
+            self.assertEqual(forward(line), walk_hunks(hunks, line))
+            self.assertEqual(backward(line), reverse_walk_hunks(hunks, line))
+
+    def test_agrees_with_walking_random_hunks(self):
+        rnd = random.Random(4)
+        for _ in range(200):
+            hunks = random_hunks(rnd)
+            forward = LineMap.from_hunks(hunks)
+            backward = LineMap.from_hunks(hunks, reverse=True)
+            for line in range(0, 40):
+                self.assertEqual(forward(line), walk_hunks(hunks, line), hunks)
+                self.assertEqual(backward(line), reverse_walk_hunks(hunks, line), hunks)
@@ -0,0 +1,45 @@
+import difflib
+
+from unittesting import DeferrableTestCase
+from GitSavvy.tests.parameterized import parameterized as p
+
+from GitSavvy.core.line_matching import Opcode, match_lines
+
+
+def apply_opcodes(opcodes, a, b):
+    out = []
+    for tag, a_start, a_end, b_start, b_end in opcodes:
+        if tag == "equal":
+            assert a[a_start:a_end] == b[b_start:b_end]
+        out.extend(b[b_start:b_end])
+    return out
+
+
+class TestMatchLines(DeferrableTestCase):
+    @p.expand([
+        ("", ""),
+        ("abc", "abc"),
+        ("abc", ""),
+        ("", "abc"),
+        ("abcdef", "abXdef"),
+        ("abcabc", "cbacba"),
+        ("xaaay", "yaaax"),
+        ("abcdefgh", "aXcdYgh"),
+    ])
+    def test_opcodes_transform_a_into_b(self, a, b):
+        a, b = list(a), list(b)
+        opcodes = match_lines(a, b)
+        self.assertEqual(apply_opcodes(opcodes, a, b), b)
+        # The opcodes cover both sides without gaps
+        self.assertEqual(
+            [(op.a_start, op.b_start) for op in opcodes[1:]],
+            [(op.a_end, op.b_end) for op in opcodes[:-1]]
+        )
+
+    def test_matches_like_sequence_matcher_on_simple_edits(self):
+        a = ["one\n", "two\n", "three\n", "four\n"]
+        b = ["one\n", "2\n", "three\n", "four\n", "five\n"]
+        self.assertEqual(
+            match_lines(a, b),
+            [Opcode(*op) for op in difflib.SequenceMatcher(None, a, b).get_opcodes()]
+        )
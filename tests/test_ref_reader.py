@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import zlib
+
+from unittesting import DeferrableTestCase
+
+from GitSavvy.core.ref_reader import Head, Ref, parse_packed_refs, read_head, read_refs
+
+
+A = "a" * 40
+B = "b" * 40
+C = "c" * 40
+T = "7" * 40
+PACKED_REFS = (
+    "# pack-refs with: peeled fully-peeled sorted \n"
+    f"{A} refs/heads/master\n"
+    f"{B} refs/heads/old\n"
+    f"{T} refs/tags/v1\n"
+    f"^{A}\n"
+)
+
+
+class TestRefReader(DeferrableTestCase):
+    def setUp(self):
+        self.git_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.git_dir, ignore_errors=True)
+        self.write("HEAD", "ref: refs/heads/master\n")
+        self.write("packed-refs", PACKED_REFS)
+
+    def write(self, name, content, git_dir=None, mode="w"):
+        path = os.path.join(git_dir or self.git_dir, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(content)
+        # Make sure a rewrite is seen even within the mtime resolution.
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    def test_parse_packed_refs(self):
+        self.assertEqual(parse_packed_refs(PACKED_REFS), {
+            "refs/heads/master": Ref("refs/heads/master", A, A),
+            "refs/heads/old": Ref("refs/heads/old", B, B),
+            "refs/tags/v1": Ref("refs/tags/v1", T, A),
+        })
+
+    def test_peeled_values_are_unknown_without_the_trait(self):
+        refs = parse_packed_refs(f"{A} refs/heads/master\n{T} refs/tags/v1\n")
+        self.assertEqual(refs["refs/tags/v1"].peeled, None)
+
+    def test_head_on_a_packed_branch(self):
+        self.assertEqual(read_head(self.git_dir, self.git_dir), Head("refs/heads/master", A))
+
+    def test_detached_and_unborn_head(self):
+        self.write("HEAD", f"{C}\n")
+        self.assertEqual(read_head(self.git_dir, self.git_dir), Head(None, C))
+        self.write("HEAD", "ref: refs/heads/unborn\n")
+        self.assertEqual(read_head(self.git_dir, self.git_dir), Head("refs/heads/unborn", None))
+
+    def test_loose_refs_shadow_packed_ones(self):
+        self.write("refs/heads/master", f"{C}\n")
+        self.write("refs/remotes/origin/HEAD", "ref: refs/remotes/origin/master\n")
+        self.write("refs/remotes/origin/master", f"{B}\n")
+        refs = read_refs(self.git_dir, self.git_dir)
+        self.assertEqual({name: ref.peeled for name, ref in refs.items()}, {
+            "refs/heads/master": C,
+            "refs/heads/old": B,
+            "refs/remotes/origin/HEAD": B,
+            "refs/remotes/origin/master": B,
+            "refs/tags/v1": A,
+        })
+        self.assertEqual(read_head(self.git_dir, self.git_dir).commit, C)
+
+    def test_sees_updated_refs(self):
+        self.write("refs/heads/master", f"{C}\n")
+        self.assertEqual(read_refs(self.git_dir, self.git_dir)["refs/heads/master"].target, C)
+        self.write("refs/heads/master", f"{B}\n")
+        self.assertEqual(read_refs(self.git_dir, self.git_dir)["refs/heads/master"].target, B)
+
+    def test_peels_loose_tags_via_their_object(self):
+        tag = f"object {A}\ntype commit\ntag v2\n\nmessage\n".encode()
+        self.write("refs/tags/v2", f"{C}\n")
+        self.write(
+            f"objects/{C[:2]}/{C[2:]}",
+            zlib.compress(b"tag %d\x00" % len(tag) + tag),
+            mode="wb"
+        )
+        self.write("refs/tags/v3", f"{B}\n")  # object not available, e.g. packed
+        refs = read_refs(self.git_dir, self.git_dir)
+        self.assertEqual(refs["refs/tags/v2"], Ref("refs/tags/v2", C, A))
+        self.assertEqual(refs["refs/tags/v3"], Ref("refs/tags/v3", B, None))
+
+    def test_worktree_specific_refs(self):
+        worktree_dir = os.path.join(self.git_dir, "worktrees", "wt")
+        self.write("HEAD", "ref: refs/heads/old\n", git_dir=worktree_dir)
+        self.write("refs/bisect/bad", f"{C}\n", git_dir=worktree_dir)
+        self.write("refs/bisect/bad", f"{A}\n")
+
+        self.assertEqual(read_head(worktree_dir, self.git_dir), Head("refs/heads/old", B))
+        self.assertEqual(read_refs(worktree_dir, self.git_dir)["refs/bisect/bad"].target, C)
+        self.assertEqual(read_refs(self.git_dir, self.git_dir)["refs/bisect/bad"].target, A)
+
+    def test_gives_up_on_reftable(self):
+        os.mkdir(os.path.join(self.git_dir, "reftable"))
+        self.assertIsNone(read_head(self.git_dir, self.git_dir))
+        self.assertIsNone(read_refs(self.git_dir, self.git_dir))
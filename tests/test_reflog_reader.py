@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+from unittesting import DeferrableTestCase
+
+from GitSavvy.core.reflog_reader import parse_reflog_line, read_reflog
+
+
+A = "a" * 40
+B = "b" * 40
+C = "c" * 40
+REFLOG = (
+    f"{'0' * 40} {A} Jane Doe <jane@example.com> 1700000000 +0100\tcommit (initial): first\n"
+    f"{A} {B} Jane Doe <jane@example.com> 1700000100 +0100\tcommit: second\n"
+    f"{B} {C} Jane Doe <jane@example.com> 1700000200 +0100\treset: moving to HEAD~1\n"
+)
+
+
+class TestReflogReader(DeferrableTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            f.write(REFLOG)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_parse_line(self):
+        entry = parse_reflog_line(REFLOG.splitlines()[1].encode())
+        self.assertEqual(entry.old_hash, A)
+        self.assertEqual(entry.new_hash, B)
+        self.assertEqual(entry.identity, "Jane Doe <jane@example.com>")
+        self.assertEqual(entry.timestamp, 1700000100)
+        self.assertEqual(entry.timezone, "+0100")
+        self.assertEqual(entry.message, "commit: second")
+
+    def test_newest_first(self):
+        entries = read_reflog(self.path)
+        self.assertEqual([e.new_hash for e in entries], [C, B, A])
+
+    def test_limit_and_skip(self):
+        self.assertEqual([e.new_hash for e in read_reflog(self.path, limit=1)], [C])
+        self.assertEqual([e.new_hash for e in read_reflog(self.path, limit=1, skip=1)], [B])
+        self.assertEqual([e.new_hash for e in read_reflog(self.path, limit=5, skip=2)], [A])
+
+    def test_sees_appended_lines(self):
+        read_reflog(self.path, limit=1)
+        with open(self.path, "a") as f:
+            f.write(f"{C} {A} Jane Doe <jane@example.com> 1700000300 +0100\tcheckout: x\n")
+        os.utime(self.path, ns=(0, 1))
+        self.assertEqual([e.new_hash for e in read_reflog(self.path, limit=2)], [A, C])
+
+    def test_missing_file(self):
+        self.assertIsNone(read_reflog(self.path + ".missing"))